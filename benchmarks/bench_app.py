@@ -0,0 +1,89 @@
+# Render cost of the Streamlit page
+#
+# Runs streamlit_app.py headlessly and reports what a rerun sends to the browser: the
+# number of elements (one websocket delta each) and their serialized bytes, split into
+# result outputs and input widgets, plus the median time the script itself takes on a
+# warm rerun (caches filled, executed in Streamlit's bare mode so AppTest's polling
+# doesn't swamp it).
+#
+#   python benchmarks/bench_app.py --runs 20
+#   python benchmarks/bench_app.py --app old_streamlit_app.py   # compare another version
+import argparse
+import json
+import logging
+import os
+import runpy
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "streamlit_app.py")
+
+
+def _elements(node):
+    children = getattr(node, "children", None)
+    if children:
+        for child in children.values():
+            yield from _elements(child)
+    else:
+        yield node
+
+
+def _is_input(element):
+    from streamlit.testing.v1.element_tree import Widget
+
+    # st.data_editor is an editable Arrow table rather than a Widget subclass
+    return isinstance(element, Widget) or bool(getattr(element.proto, "editing_mode", 0))
+
+
+def script_seconds(app, runs):
+    """Returns the median wall time of warm runs of the app script in bare mode."""
+    logging.disable(logging.WARNING)  # Bare mode warns about the missing runtime on every call
+    try:
+        runpy.run_path(app)
+        seconds = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            runpy.run_path(app)
+            seconds.append(time.perf_counter() - start)
+    finally:
+        logging.disable(logging.NOTSET)
+    return statistics.median(seconds)
+
+
+def measure(app=APP, runs=20):
+    """Returns element counts, delta bytes and warm script time for one page load."""
+    from streamlit.testing.v1 import AppTest
+
+    sys.path.insert(0, ROOT)
+    test = AppTest.from_file(os.path.abspath(app), default_timeout=120)
+    test.run()
+    if test.exception:
+        raise RuntimeError(f"App raised: {test.exception[0].value}")
+
+    result = {"output_elements": 0, "output_bytes": 0, "input_elements": 0, "input_bytes": 0}
+    for element in _elements(test._tree):
+        if getattr(element, "proto", None) is None:
+            continue
+        kind = "input" if _is_input(element) else "output"
+        result[f"{kind}_elements"] += 1
+        result[f"{kind}_bytes"] += len(element.proto.SerializeToString())
+    result["elements"] = result["output_elements"] + result["input_elements"]
+    result["bytes"] = result["output_bytes"] + result["input_bytes"]
+    # Bare-mode runs leave form state behind that AppTest trips over, so time them last
+    result["script_ms"] = script_seconds(app, runs) * 1000
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the Streamlit page's render cost.")
+    parser.add_argument("--app", default=APP, help="Streamlit script to measure")
+    parser.add_argument("--runs", type=int, default=20, help="warm reruns to time")
+    args = parser.parse_args(argv)
+    print(json.dumps(measure(args.app, args.runs), indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
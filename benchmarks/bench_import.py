@@ -0,0 +1,68 @@
+# Cold-start check for the core package
+#
+# Imports correct_score in fresh interpreters, reports the median import time, and
+# fails if it is over budget or if importing it dragged in a heavy dependency that
+# the core is meant to load lazily.
+#
+#   python benchmarks/bench_import.py --budget-ms 250
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the core must not import at package import time
+HEAVY_MODULES = ("scipy", "pandas", "streamlit", "pyarrow", "altair", "matplotlib")
+
+DEFAULT_BUDGET_MS = 250
+DEFAULT_RUNS = 7
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": sorted(sys.modules)}}))
+"""
+
+
+def import_once(module):
+    """Returns (seconds, loaded module names) for importing module in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module)],
+        cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    result = json.loads(output)
+    return result["seconds"], result["modules"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure and budget the import time of correct_score.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    args = parser.parse_args(argv)
+
+    numpy_ms = statistics.median(import_once("numpy")[0] for _ in range(args.runs)) * 1000
+    runs = [import_once("correct_score") for _ in range(args.runs)]
+    core_ms = statistics.median(seconds for seconds, _ in runs) * 1000
+    heavy = sorted({
+        name for name in runs[0][1] if name.split(".")[0] in HEAVY_MODULES
+    })
+
+    print(f"import numpy:         {numpy_ms:7.1f} ms", file=sys.stderr)
+    print(f"import correct_score: {core_ms:7.1f} ms (budget {args.budget_ms:.0f} ms)", file=sys.stderr)
+    failed = False
+    if heavy:
+        print(f"FAIL heavy modules loaded at import: {', '.join(heavy[:10])}", file=sys.stderr)
+        failed = True
+    if core_ms > args.budget_ms:
+        print("FAIL import time over budget", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# Benchmarks for the model stages
+#
+# Times the scoreline matrix, 1x2/OU/GG aggregation, HT/FT and value-bet stages over
+# synthetic slates, for both the vectorized engine and the original dict-and-loop
+# code path from streamlit_app.py (kept below as the reference), plus the adaptive
+# pricing the app, slate CLI and service run (engine only). Each result records
+# wall time, fixtures per second and peak traced memory.
+#
+#   python benchmarks/bench_model.py                      # run and print
+#   python benchmarks/bench_model.py --save-baseline      # write benchmarks/baseline.json
+#   python benchmarks/bench_model.py --check              # exit 1 if an engine stage regressed
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from correct_score import engine, htft, value  # noqa: E402
+
+FIXTURE_COUNTS = (1, 100, 10_000, 1_000_000)
+MAX_GOALS = (4, 8, 12)
+STAGES = ("score_matrix", "markets", "ht_ft", "value_scan", "adaptive")
+
+# These stages do not take max_goals (the adaptive grid is sized by epsilon), so they run
+# once per slate and record max_goals as None
+GRID_FREE_STAGES = ("value_scan", "adaptive")
+
+# Stages with a loop reference; the adaptive pricing is new and has none
+LOOP_STAGES = ("score_matrix", "markets", "ht_ft", "value_scan")
+BOOKMAKERS = 5
+
+# The loop reference is far too slow past this many fixtures
+LOOP_MAX_FIXTURES = 10_000
+
+# Engine stages run on chunks of this many fixtures, as the slate CLI does
+CHUNK_SIZE = 100_000
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+
+# Reference: the original per-fixture code path from streamlit_app.py
+
+
+def loop_poisson_prob(expected_goals, max_goals=3):
+    """Returns probabilities of scoring 0, 1, 2, 3+ goals."""
+    from scipy.stats import poisson
+
+    probs = [poisson.pmf(i, expected_goals) for i in range(max_goals)]
+    probs.append(1 - sum(probs))  # 3+ goals
+    return probs
+
+
+def loop_score_matrix(home_xg, away_xg, max_goals):
+    probs_A = loop_poisson_prob(home_xg, max_goals)
+    probs_B = loop_poisson_prob(away_xg, max_goals)
+    scoreline_probs = {}
+    for i in range(max_goals + 1):
+        for j in range(max_goals + 1):
+            scoreline_probs[(i, j)] = probs_A[i] * probs_B[j]
+    return scoreline_probs
+
+
+def loop_markets(scoreline_probs):
+    home_win_prob = sum(prob for (i, j), prob in scoreline_probs.items() if i > j)
+    draw_prob = sum(prob for (i, j), prob in scoreline_probs.items() if i == j)
+    away_win_prob = sum(prob for (i, j), prob in scoreline_probs.items() if i < j)
+    under_1_5 = sum(prob for (i, j), prob in scoreline_probs.items() if i + j < 2)
+    under_2_5 = sum(prob for (i, j), prob in scoreline_probs.items() if i + j < 3)
+    gg_prob = sum(prob for (i, j), prob in scoreline_probs.items() if i > 0 and j > 0)
+    labelled = {f"{i}-{j}": prob for (i, j), prob in scoreline_probs.items()}
+    sorted_scorelines = sorted(labelled.items(), key=lambda x: x[1], reverse=True)
+    return (home_win_prob, draw_prob, away_win_prob, under_1_5, under_2_5, gg_prob, sorted_scorelines[:12])
+
+
+def loop_ht_ft(home_xg, away_xg, half_goals, first_half_share=htft.FIRST_HALF_SHARE):
+    # calculate_ht_ft_probs only ever reached 1/1, X/X and 2/1, so this is the same
+    # dict-and-loop style carried through all nine outcomes on htft.ht_ft's half grids
+    from scipy.stats import poisson
+
+    halves = []
+    for share in (first_half_share, 1 - first_half_share):
+        probs_A = [poisson.pmf(i, home_xg * share) for i in range(half_goals + 1)]
+        probs_B = [poisson.pmf(j, away_xg * share) for j in range(half_goals + 1)]
+        halves.append({(i, j): probs_A[i] * probs_B[j] for i in range(half_goals + 1) for j in range(half_goals + 1)})
+
+    def result(i, j):
+        return "1" if i > j else "X" if i == j else "2"
+
+    ht_ft_probs = dict.fromkeys(htft.HT_FT_OUTCOMES, 0.0)
+    for (i, j), first in halves[0].items():
+        for (k, m), second in halves[1].items():
+            ht_ft_probs[f"{result(i, j)}/{result(i + k, j + m)}"] += first * second
+    return ht_ft_probs
+
+
+def loop_value_scan(probs, odds):
+    best = None
+    for fixture, fixture_odds in enumerate(odds):
+        for bookmaker, book_odds in enumerate(fixture_odds):
+            value_bets = {
+                outcome: prob for outcome, prob in enumerate(probs[fixture])
+                if prob * book_odds[outcome] > 1
+            }
+            for outcome, prob in value_bets.items():
+                ev = prob * book_odds[outcome]
+                if best is None or ev > best[0]:
+                    best = (ev, fixture, bookmaker, outcome)
+    return best
+
+
+def half_goals(max_goals):
+    """Returns the per-half cap that gives a full-time grid of max_goals per team."""
+    return max(1, max_goals // 2)
+
+
+def run_loop_stage(stage, slate, max_goals):
+    home_xg, away_xg, probs, odds = slate
+    if stage == "value_scan":
+        return loop_value_scan(probs.tolist(), odds.tolist())
+    for h, a in zip(home_xg.tolist(), away_xg.tolist()):
+        if stage == "ht_ft":
+            loop_ht_ft(h, a, half_goals(max_goals))
+            continue
+        scoreline_probs = loop_score_matrix(h, a, max_goals)
+        if stage == "markets":
+            loop_markets(scoreline_probs)
+
+
+def run_engine_stage(stage, slate, max_goals):
+    home_xg, away_xg, probs, odds = slate
+    for start in range(0, len(home_xg), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        if stage == "value_scan":
+            value.scan(probs[chunk], odds[chunk], k=10)
+            continue
+        if stage == "adaptive":
+            engine.price_markets_adaptive(home_xg[chunk], away_xg[chunk])
+            continue
+        if stage == "ht_ft":
+            htft.ht_ft(home_xg[chunk], away_xg[chunk], max_goals=half_goals(max_goals))
+            continue
+        matrix = engine.score_matrix(home_xg[chunk], away_xg[chunk], max_goals)
+        if stage == "markets":
+            engine.match_odds(matrix)
+            engine.over_under(matrix)
+            engine.both_teams_to_score(matrix)
+            engine.top_scorelines(matrix, 12)
+
+
+def synthetic_slate(n_fixtures, seed=0):
+    """Returns (home_xg, away_xg, 1x2 probs, (N, BOOKMAKERS, 3) odds) for a random slate."""
+    rng = np.random.default_rng(seed)
+    home_xg = rng.uniform(0.5, 2.5, n_fixtures)
+    away_xg = rng.uniform(0.4, 2.0, n_fixtures)
+    probs = rng.dirichlet([4, 3, 3], n_fixtures)
+    odds = 1 / probs[:, None, :] * rng.uniform(0.85, 1.1, (n_fixtures, BOOKMAKERS, 3))
+    return home_xg, away_xg, probs, odds
+
+
+def measure(func, *args, repeat=3):
+    """Returns (best wall seconds, peak traced bytes) for func(*args)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(fixture_counts=FIXTURE_COUNTS, max_goals=MAX_GOALS, stages=STAGES, loop_max=LOOP_MAX_FIXTURES):
+    """Returns a list of result dicts, one per stage, implementation, slate size and max goals."""
+    # Warm up the engine, and import scipy.stats for the loop reference, before timing
+    engine.score_matrix(1.0, 1.0)
+    loop_poisson_prob(1.0)
+    results = []
+    for n_fixtures in fixture_counts:
+        slate = synthetic_slate(n_fixtures)
+        for goals in max_goals:
+            for stage in stages:
+                if stage in GRID_FREE_STAGES and goals != max_goals[0]:
+                    continue
+                impls = [("engine", run_engine_stage)]
+                if n_fixtures <= loop_max and stage in LOOP_STAGES:
+                    impls.append(("loop", run_loop_stage))
+                for impl, func in impls:
+                    repeat = 1 if impl == "loop" or n_fixtures >= 1_000_000 else 3
+                    seconds, peak = measure(func, stage, slate, goals, repeat=repeat)
+                    result = {
+                        "stage": stage,
+                        "impl": impl,
+                        "fixtures": n_fixtures,
+                        "max_goals": None if stage in GRID_FREE_STAGES else goals,
+                        "seconds": seconds,
+                        "fixtures_per_second": n_fixtures / seconds if seconds else float("inf"),
+                        "peak_bytes": peak,
+                    }
+                    results.append(result)
+                    print(
+                        f"{stage:>12} {impl:>6} n={n_fixtures:>9} g={result['max_goals'] or '-':>2} "
+                        f"{seconds * 1000:10.2f} ms {result['fixtures_per_second']:14,.0f} fx/s "
+                        f"{peak / 2 ** 20:9.1f} MiB",
+                        file=sys.stderr,
+                    )
+    return results
+
+
+def _key(result):
+    return f"{result['stage']}/{result['impl']}/{result['fixtures']}/{result['max_goals']}"
+
+
+def regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Returns a message for every engine result slower than its baseline by more than threshold.
+
+    The loop reference is only there for the speed-ups and is not gated.
+    """
+    previous = {_key(result): result for result in baseline["results"]}
+    failures = []
+    for result in results:
+        base = previous.get(_key(result))
+        if base is None or result["impl"] != "engine":
+            continue
+        # Sub-millisecond timings are mostly noise
+        if result["seconds"] > max(base["seconds"], 1e-3) * (1 + threshold):
+            failures.append(
+                f"{_key(result)}: {result['seconds'] * 1000:.2f} ms vs baseline {base['seconds'] * 1000:.2f} ms"
+            )
+    return failures
+
+
+def speedups(results):
+    """Returns loop seconds / engine seconds for every stage that ran both implementations."""
+    by_key = {_key(result): result for result in results}
+    return {
+        key.replace("/engine/", "/"): by_key[key.replace("/engine/", "/loop/")]["seconds"] / result["seconds"]
+        for key, result in by_key.items()
+        if "/engine/" in key and key.replace("/engine/", "/loop/") in by_key and result["seconds"]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the model stages against the loop reference.")
+    parser.add_argument("--fixtures", type=int, nargs="+", default=FIXTURE_COUNTS)
+    parser.add_argument("--max-goals", type=int, nargs="+", default=MAX_GOALS)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--loop-max-fixtures", type=int, default=LOOP_MAX_FIXTURES,
+                        help="largest slate the loop reference runs on")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="fail if a stage regressed past the threshold")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction of the baseline time")
+    args = parser.parse_args(argv)
+
+    results = run(args.fixtures, args.max_goals, args.stages, args.loop_max_fixtures)
+    for key, speedup in speedups(results).items():
+        print(f"speed-up {key}: {speedup:,.1f}x", file=sys.stderr)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"results": results}, f, indent=1)
+            f.write("\n")
+    if args.check:
+        with open(args.baseline) as f:
+            failures = regressions(results, json.load(f), args.threshold)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""Correct score model: vectorized scoreline matrices and market pricing.
+
+Importing the package only needs NumPy and has no side effects. Modules with heavier
+dependencies (fitting uses scipy, slate uses pandas) load them when first used.
+"""
+from correct_score.engine import (
+    adjust_low_scores,
+    both_teams_to_score,
+    expected_goals,
+    goal_difference,
+    goal_probs,
+    match_odds,
+    over_under,
+    price_markets,
+    score_matrix,
+    scoreline_labels,
+    top_scorelines,
+    total_goals,
+)
+from correct_score.value import best_prices, best_value_outcome, expected_value, scan, scan_markets
+from correct_score.htft import HT_FT_OUTCOMES, convolve_scores, ht_ft, ht_ft_scores
+from correct_score.simulate import market_mask, simulate_slate
+from correct_score.store import ColumnStore
@@ -0,0 +1,269 @@
+# Backtesting the app's recommendation rules on historical fixtures
+#
+# Replays past fixtures with their closing odds through the model and bets one unit
+# on every pick the app would have made: the Over/Under 2.5 and GG/NG calls, the
+# prob * odds > 1 value bets, and the combined OU/GG correct score. Each league
+# season is evaluated as one vectorized slate and seasons run in parallel across a
+# process pool. Reports ROI, hit rate, drawdown and calibration per strategy.
+#
+#   python -m correct_score.backtest history.csv --workers 8 --output seasons.csv
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from correct_score import engine, recommend
+from correct_score.slate import STAT_COLUMNS, read_chunks
+
+RESULT_COLUMNS = ["home_goals", "away_goals"]
+DEFAULT_GROUP_COLUMNS = ("league", "season")
+CALIBRATION_BINS = 10
+
+
+def _cs_column(i, j):
+    return f"odds_cs_{i}_{j}"
+
+
+def _most_likely_value(probs, odds):
+    """Returns the index of the most likely outcome with prob * odds > 1, or -1, per row."""
+    with np.errstate(invalid="ignore"):
+        is_value = probs * odds > 1
+    best = np.where(is_value, probs, -1.0).argmax(axis=1)
+    return np.where(is_value.any(axis=1), best, -1)
+
+
+def _strategies(columns, home_goals, away_goals, markets, max_goals, tail=True):
+    """Yields (strategy, pick index or -1, probs, odds, outcome index) for every strategy with odds."""
+    n = len(home_goals)
+    total = home_goals + away_goals
+    ou = markets["over_under"]
+
+    def odds_of(*names):
+        if not all(name in columns for name in names):
+            return None
+        return np.stack([columns[name] for name in names], axis=1).astype(float)
+
+    over_under = odds_of("odds_over_2_5", "odds_under_2_5")
+    btts = odds_of("odds_btts_gg", "odds_btts_ng")
+    match = odds_of("odds_home", "odds_draw", "odds_away")
+    ou_probs = np.stack([ou["Over 2.5"], ou["Under 2.5"]], axis=1)
+    btts_probs = np.stack([markets["gg"], markets["ng"]], axis=1)
+    ou_outcome = np.where(total > 2.5, 0, 1)
+    btts_outcome = np.where((home_goals > 0) & (away_goals > 0), 0, 1)
+
+    if over_under is not None:
+        yield "over_under_2_5", np.where(recommend.over_under_pick(ou["Over 2.5"]) == "Over", 0, 1), \
+            ou_probs, over_under, ou_outcome
+        yield "value_over_under_2_5", _most_likely_value(ou_probs, over_under), ou_probs, over_under, ou_outcome
+    if btts is not None:
+        yield "gg_ng", np.where(recommend.gg_pick(markets["gg"]) == "GG", 0, 1), btts_probs, btts, btts_outcome
+        yield "value_gg_ng", _most_likely_value(btts_probs, btts), btts_probs, btts, btts_outcome
+    if match is not None:
+        outcome = np.where(home_goals > away_goals, 0, np.where(home_goals == away_goals, 1, 2))
+        yield "value_1x2", _most_likely_value(markets["1x2"], match), markets["1x2"], match, outcome
+
+    # Correct-score odds are optional odds_cs_<home>_<away> columns; a tail bucket has no price
+    size = max_goals + 1
+    priced = max_goals if tail else size
+    cs_odds = np.full((n, size * size), np.nan)
+    for i in range(priced):
+        for j in range(priced):
+            if _cs_column(i, j) in columns:
+                cs_odds[:, i * size + j] = columns[_cs_column(i, j)]
+    if not np.isnan(cs_odds).all():
+        cs_probs = markets["matrix"].reshape(n, -1)
+        if tail:
+            outcome = np.minimum(home_goals, max_goals) * size + np.minimum(away_goals, max_goals)
+        else:  # A score off the exact grid matches no pick
+            outcome = np.where((home_goals <= max_goals) & (away_goals <= max_goals),
+                               home_goals * size + away_goals, -1)
+        _, combined = recommend.combined_picks(markets["matrix"], ou["Over 2.5"], ou["Under 2.5"],
+                                               markets["gg"], markets["ng"])
+        yield "combined_correct_score", combined, cs_probs, cs_odds, outcome
+        yield "value_correct_score", _most_likely_value(cs_probs, cs_odds), cs_probs, cs_odds, outcome
+
+
+def _max_drawdown(pnl):
+    """Returns the largest fall from a running peak of cumulative profit (starting at 0)."""
+    if not len(pnl):
+        return 0.0
+    equity = np.cumsum(pnl)
+    return float((np.maximum.accumulate(np.maximum(equity, 0.0)) - equity).max())
+
+
+def backtest_season(columns, max_goals=None, epsilon=engine.DEFAULT_EPSILON):
+    """Backtests one slate of fixtures given as a dict of column arrays.
+
+    The slate is priced on one exact grid wide enough for all its fixtures (each leaves
+    out less than epsilon); an integer max_goals uses the fixed grid with a tail bucket.
+
+    Returns {strategy: stats}, where stats holds bet counts, profit, drawdown, the
+    calibration bin sums and the per-bet profit and order keys for merging seasons.
+    """
+    if "expected_goals_A" in columns and "expected_goals_B" in columns:
+        home_xg, away_xg = columns["expected_goals_A"], columns["expected_goals_B"]
+    else:
+        home_xg, away_xg = engine.expected_goals(*(columns[column] for column in STAT_COLUMNS))
+    home_goals = np.asarray(columns["home_goals"], dtype=np.int64)
+    away_goals = np.asarray(columns["away_goals"], dtype=np.int64)
+    tail = max_goals is not None
+    if not tail:
+        max_goals = int(engine.adaptive_max_goals(home_xg, away_xg, epsilon).max(initial=0))
+    markets = engine.price_markets(home_xg, away_xg, max_goals=max_goals, top_k=1, tail=tail)
+    order = np.asarray(columns["order"])
+
+    results = {}
+    strategies = _strategies(columns, home_goals, away_goals, markets, max_goals, tail)
+    for strategy, pick, probs, odds, outcome in strategies:
+        rows = np.flatnonzero(pick >= 0)
+        rows = rows[np.isfinite(odds[rows, pick[rows]])]
+        prob = probs[rows, pick[rows]]
+        price = odds[rows, pick[rows]]
+        won = pick[rows] == outcome[rows]
+        pnl = np.where(won, price - 1, -1.0)
+        bins = np.minimum((prob * CALIBRATION_BINS).astype(np.intp), CALIBRATION_BINS - 1)
+        results[strategy] = {
+            "fixtures": len(home_goals),
+            "bets": len(rows),
+            "wins": int(won.sum()),
+            "profit": float(pnl.sum()),
+            "expected_wins": float(prob.sum()),
+            "brier_sum": float(((prob - won) ** 2).sum()),
+            "max_drawdown": _max_drawdown(pnl[np.argsort(order[rows], kind="stable")]),
+            "bin_count": np.bincount(bins, minlength=CALIBRATION_BINS),
+            "bin_prob": np.bincount(bins, prob, minlength=CALIBRATION_BINS),
+            "bin_wins": np.bincount(bins, won, minlength=CALIBRATION_BINS),
+            "order": order[rows],
+            "pnl": pnl,
+        }
+    return results
+
+
+def _summarize(stats):
+    bets = stats["bets"]
+    return {
+        "fixtures": stats["fixtures"],
+        "bets": bets,
+        "wins": stats["wins"],
+        "hit_rate": stats["wins"] / bets if bets else np.nan,
+        "expected_hit_rate": stats["expected_wins"] / bets if bets else np.nan,
+        "profit": stats["profit"],
+        "roi": stats["profit"] / bets if bets else np.nan,
+        "max_drawdown": stats["max_drawdown"],
+        "brier": stats["brier_sum"] / bets if bets else np.nan,
+    }
+
+
+def _to_columns(frame, order_column):
+    columns = {column: frame[column].to_numpy() for column in frame.columns}
+    columns["order"] = frame[order_column].to_numpy() if order_column else frame.index.to_numpy()
+    return columns
+
+
+def backtest(fixtures, max_goals=None, group_columns=DEFAULT_GROUP_COLUMNS, order_column=None, workers=None,
+             epsilon=engine.DEFAULT_EPSILON):
+    """Backtests every group (by default each league season) and returns three DataFrames.
+
+    "summary" has one row per strategy over all groups, "groups" one row per group and
+    strategy, and "calibration" the mean predicted probability against the observed hit
+    rate per probability bin. Drawdowns are over bets in order_column order (file order
+    if None), seasons interleaved. workers=1 runs in-process; otherwise groups are spread
+    over a process pool. Each group is priced as in backtest_season().
+    """
+    required = RESULT_COLUMNS + (
+        ["expected_goals_A", "expected_goals_B"] if "expected_goals_A" in fixtures.columns else STAT_COLUMNS
+    )
+    group_columns = [column for column in group_columns if column in fixtures.columns]
+    missing = [column for column in required if column not in fixtures.columns]
+    if missing:
+        raise ValueError(f"Missing fixture columns: {', '.join(missing)}")
+
+    # Teams without history (e.g. a column store's first matches) have no expected goals
+    fixtures = fixtures.dropna(subset=required).reset_index(drop=True)
+    if fixtures.empty:
+        keys, frames = [], []  # Nothing to bet on: every table comes back empty
+    elif group_columns:
+        keys, frames = zip(*fixtures.groupby(group_columns, sort=True))
+    else:
+        keys, frames = [()], [fixtures]
+    tasks = [_to_columns(frame, order_column) for frame in frames]
+
+    if workers == 1:
+        seasons = [backtest_season(task, max_goals, epsilon) for task in tasks]
+    else:
+        import concurrent.futures
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count())))
+            seasons = list(pool.map(backtest_season, tasks, [max_goals] * len(tasks), [epsilon] * len(tasks),
+                                    chunksize=chunksize))
+
+    group_rows, totals = [], {}
+    for key, season in zip(keys, seasons):
+        key = key if isinstance(key, tuple) else (key,)
+        for strategy, stats in season.items():
+            group_rows.append({**dict(zip(group_columns, key)), "strategy": strategy, **_summarize(stats)})
+            total = totals.setdefault(strategy, {name: [] for name in ("order", "pnl")})
+            for name, item in stats.items():
+                if name in ("order", "pnl"):
+                    total[name].append(item)
+                elif name != "max_drawdown":
+                    total[name] = total.get(name, 0) + item
+
+    summary_rows, calibration_rows = [], []
+    for strategy, total in totals.items():
+        order = np.concatenate(total.pop("order"))
+        pnl = np.concatenate(total.pop("pnl"))
+        total["max_drawdown"] = _max_drawdown(pnl[np.argsort(order, kind="stable")])
+        summary_rows.append({"strategy": strategy, **_summarize(total)})
+        for b in range(CALIBRATION_BINS):
+            count = total["bin_count"][b]
+            calibration_rows.append({
+                "strategy": strategy,
+                "bin": f"{b / CALIBRATION_BINS:.1f}-{(b + 1) / CALIBRATION_BINS:.1f}",
+                "bets": int(count),
+                "predicted": total["bin_prob"][b] / count if count else np.nan,
+                "observed": total["bin_wins"][b] / count if count else np.nan,
+            })
+    return {
+        "summary": pd.DataFrame(summary_rows),
+        "groups": pd.DataFrame(group_rows),
+        "calibration": pd.DataFrame(calibration_rows),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the app's recommendation rules on historical fixtures.")
+    parser.add_argument("input", help="CSV or Parquet of fixtures with results and closing odds")
+    parser.add_argument("--output", help="write the per-group results to this CSV")
+    parser.add_argument("--calibration", help="write the calibration table to this CSV")
+    parser.add_argument("--epsilon", type=float, default=engine.DEFAULT_EPSILON,
+                        help="probability each group's exact grid may leave out")
+    parser.add_argument("--max-goals", type=int,
+                        help="price on a fixed grid with this many goals per team before a tail bucket")
+    parser.add_argument("--groups", nargs="*", default=list(DEFAULT_GROUP_COLUMNS),
+                        help="columns that split the data into independently evaluated groups")
+    parser.add_argument("--order", help="column giving the betting order for drawdowns, e.g. date")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    fixtures = pd.concat(read_chunks(args.input), ignore_index=True)
+    results = backtest(fixtures, args.max_goals, args.groups, args.order, args.workers, args.epsilon)
+    seconds = time.perf_counter() - start
+
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(results["summary"].to_string(index=False))
+    if args.output:
+        results["groups"].to_csv(args.output, index=False)
+    if args.calibration:
+        results["calibration"].to_csv(args.calibration, index=False)
+    print(f"{len(fixtures)} fixtures in {seconds:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+# Shared persistent prediction cache
+#
+# Predictions are stored in SQLite under a key that hashes the normalized fixture
+# inputs together with the model version, so any browser session, rerun or worker
+# process that asks for the same fixture gets the stored result instead of
+# re-pricing it. SQLite in WAL mode lets many processes read while one writes.
+# Entries expire after a TTL and the least recently used ones are evicted once the
+# store holds more than max_entries.
+#
+# Lookups only read. Hit/miss counters and access times are buffered per cache
+# object and written in one transaction every FLUSH_INTERVAL seconds (or on the
+# next put), so a warm cache doesn't serialize its readers on the write lock. A process
+# that exits may drop its last FLUSH_INTERVAL of bookkeeping.
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Bump whenever a change to the model changes its outputs for the same inputs
+MODEL_VERSION = "4"
+
+CACHE_DIR = os.environ.get(
+    "CORRECT_SCORE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "correct_score")
+)
+
+DEFAULT_PATH = os.path.join(CACHE_DIR, "predictions.sqlite")
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_TTL = 24 * 60 * 60
+# Seconds buffered lookup bookkeeping may wait before it is written
+FLUSH_INTERVAL = 1.0
+
+# Floats are rounded before hashing so 1.5 and 1.5000000001 share an entry
+_FLOAT_DIGITS = 9
+
+
+def _normalize(value):
+    if isinstance(value, float):
+        return round(value, _FLOAT_DIGITS)
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if hasattr(value, "tolist"):  # NumPy scalars and arrays
+        return _normalize(value.tolist())
+    return value
+
+
+def cache_key(inputs, model_version=MODEL_VERSION):
+    """Returns the hex digest identifying inputs under a model version."""
+    payload = json.dumps([model_version, _normalize(inputs)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PredictionCache:
+    """Content-addressed, size- and age-bounded store of model outputs.
+
+    Safe to share between threads (one connection per thread) and processes
+    (SQLite locking). Values are pickled, so only point it at a trusted file. If the
+    directory of path can't be created or written, the cache falls back to one in the
+    temp directory.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL,
+                 model_version=MODEL_VERSION):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.model_version = model_version
+        self._local = threading.local()
+        self._key_locks = {}
+        self._key_locks_guard = threading.Lock()
+        # Lookup bookkeeping not yet written: counter increments and key -> access time
+        self._pending_counts = {"hits": 0, "misses": 0}
+        self._pending_accessed = {}
+        self._pending_guard = threading.Lock()
+        self._flushed = time.monotonic()
+        try:
+            self._create()
+        except (OSError, sqlite3.Error):
+            if path == ":memory:":
+                raise
+            # Read-only or missing home directory: keep caching, just not across reboots
+            self.path = os.path.join(tempfile.gettempdir(), "correct_score", os.path.basename(path))
+            self._local = threading.local()
+            self._create()
+
+    def _create(self):
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS predictions_accessed ON predictions (accessed)")
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            db.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0), ('evictions', 0)")
+            # Running entry count, so puts don't have to count the table
+            db.execute("INSERT OR IGNORE INTO counters SELECT 'entries', COUNT(*) FROM predictions")
+
+    def _connection(self, write=True):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return _Transaction(db, "IMMEDIATE" if write else "DEFERRED")
+
+    def get(self, inputs, default=None):
+        """Returns the stored value for inputs, or default on a miss or expired entry."""
+        return self._get(cache_key(inputs, self.model_version), default)
+
+    def _get(self, key, default, count=True):
+        now = time.time()
+        with self._connection(write=False) as db:
+            row = db.execute("SELECT value, created FROM predictions WHERE key = ?", (key,)).fetchone()
+        # Expired entries are left for the next put of the key, eviction or purge_expired()
+        hit = row is not None and now - row[1] <= self.ttl
+        with self._pending_guard:
+            if hit:
+                self._pending_accessed[key] = now
+            if count:
+                self._pending_counts["hits" if hit else "misses"] += 1
+            due = time.monotonic() - self._flushed >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+        return pickle.loads(row[0]) if hit else default
+
+    def _take_pending(self):
+        with self._pending_guard:
+            counts, accessed = self._pending_counts, self._pending_accessed
+            self._pending_counts = {"hits": 0, "misses": 0}
+            self._pending_accessed = {}
+            self._flushed = time.monotonic()
+        return counts, accessed
+
+    def _write_pending(self, db, counts, accessed):
+        db.executemany("UPDATE counters SET value = value + ? WHERE name = ?",
+                       [(value, name) for name, value in counts.items() if value])
+        db.executemany("UPDATE predictions SET accessed = MAX(accessed, ?) WHERE key = ?",
+                       [(when, key) for key, when in accessed.items()])
+
+    def flush(self):
+        """Writes the buffered hit/miss counters and access times."""
+        counts, accessed = self._take_pending()
+        if any(counts.values()) or accessed:
+            with self._connection() as db:
+                self._write_pending(db, counts, accessed)
+
+    def put(self, inputs, value):
+        """Stores value for inputs and evicts the least recently used entries past max_entries."""
+        key = cache_key(inputs, self.model_version)
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        counts, accessed = self._take_pending()
+        with self._connection() as db:
+            self._write_pending(db, counts, accessed)
+            exists = db.execute("SELECT 1 FROM predictions WHERE key = ?", (key,)).fetchone()
+            db.execute("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)", (key, blob, now, now))
+            if exists:
+                return
+            db.execute("UPDATE counters SET value = value + 1 WHERE name = 'entries'")
+            excess = db.execute("SELECT value FROM counters WHERE name = 'entries'").fetchone()[0] - self.max_entries
+            if excess > 0:
+                evicted = db.execute(
+                    "DELETE FROM predictions WHERE key IN "
+                    "(SELECT key FROM predictions ORDER BY accessed LIMIT ?)",
+                    (excess,),
+                ).rowcount
+                db.execute("UPDATE counters SET value = value - ? WHERE name = 'entries'", (evicted,))
+                db.execute("UPDATE counters SET value = value + ? WHERE name = 'evictions'", (evicted,))
+
+    def get_or_compute(self, inputs, compute):
+        """Returns the cached value for inputs, calling compute() and storing it on a miss.
+
+        Threads asking for the same inputs wait for one computation instead of all
+        computing it.
+        """
+        sentinel = object()
+        key = cache_key(inputs, self.model_version)
+        value = self._get(key, sentinel)
+        if value is not sentinel:
+            return value
+        with self._key_locks_guard:
+            lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                # Another thread may have stored it while this one waited; a miss is already counted
+                value = self._get(key, sentinel, count=False)
+                if value is sentinel:
+                    value = compute()
+                    self.put(inputs, value)
+                return value
+        finally:
+            with self._key_locks_guard:
+                self._key_locks.pop(key, None)
+
+    def purge_expired(self):
+        """Deletes every entry older than the TTL and returns how many were removed."""
+        with self._connection() as db:
+            removed = db.execute("DELETE FROM predictions WHERE created < ?", (time.time() - self.ttl,)).rowcount
+            db.execute("UPDATE counters SET value = value - ? WHERE name = 'entries'", (removed,))
+        return removed
+
+    def clear(self):
+        self._take_pending()
+        with self._connection() as db:
+            db.execute("DELETE FROM predictions")
+            db.execute("UPDATE counters SET value = 0")
+
+    def stats(self):
+        """Returns entries plus the hit, miss and eviction counters shared by every process."""
+        self.flush()
+        with self._connection(write=False) as db:
+            counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+        return counters
+
+
+class _Transaction:
+    """Runs a block as one SQLite transaction on an autocommit connection.
+
+    Writers begin IMMEDIATE to take the write lock up front; readers begin DEFERRED.
+    """
+
+    def __init__(self, db, mode="IMMEDIATE"):
+        self.db = db
+        self.mode = mode
+
+    def __enter__(self):
+        self.db.execute(f"BEGIN {self.mode}")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
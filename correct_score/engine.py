@@ -0,0 +1,278 @@
+# Vectorized scoreline-matrix engine
+#
+# Every function here takes arrays of expected goals for N fixtures and works on
+# an (N, G, G) probability tensor, where G = max_goals + 1 and the last row and
+# column hold the "max_goals+" tail, the same bucket poisson_prob() used.
+#
+# price_markets_adaptive() drops the tail bucket instead: each fixture gets the
+# smallest grid whose omitted probability is below epsilon, so every cell is an
+# exact scoreline and fixtures are priced in groups of equal grid size.
+import numpy as np
+
+from correct_score import poisson, profiling
+
+# Over/Under lines shown in the app
+DEFAULT_OU_LINES = (1.5, 2.5)
+
+# Every half-goal line the adaptive pricer quotes, and the Asian total lines
+ALL_OU_LINES = tuple(np.arange(0.5, 7.0, 1.0).tolist())
+ASIAN_TOTAL_LINES = tuple(np.arange(0.5, 6.75, 0.25).tolist())
+
+# Probability an adaptive grid may leave out
+DEFAULT_EPSILON = 1e-6
+
+
+@profiling.staged("expected_goals")
+def expected_goals(home_goals_scored, away_goals_conceded, away_goals_scored, home_goals_conceded):
+    """Returns (home_xg, away_xg) as the mean of each side's attack and the opponent's defence."""
+    home_xg = (np.asarray(home_goals_scored, dtype=float) + np.asarray(away_goals_conceded, dtype=float)) / 2
+    away_xg = (np.asarray(away_goals_scored, dtype=float) + np.asarray(home_goals_conceded, dtype=float)) / 2
+    return home_xg, away_xg
+
+
+def goal_probs(expected_goals, max_goals=3, tail=True):
+    """Returns an (N, max_goals + 1) array of P(0), P(1), ... P(max_goals+) per fixture.
+
+    With tail=False the last column is P(max_goals) and the mass beyond it is dropped.
+    """
+    lam = np.atleast_1d(np.asarray(expected_goals, dtype=float))
+    if not tail:
+        return poisson.pmf(lam, max_goals)
+    probs = np.empty((lam.shape[0], max_goals + 1))
+    probs[:, :max_goals] = poisson.pmf(lam, max_goals - 1)
+    probs[:, max_goals] = 1 - probs[:, :max_goals].sum(axis=1)  # max_goals+ goals
+    return probs
+
+
+@profiling.staged("score_matrix")
+def score_matrix(home_xg, away_xg, max_goals=3, tail=True):
+    """Returns the (N, G, G) scoreline tensor; [n, i, j] is P(home i, away j)."""
+    probs_home = goal_probs(home_xg, max_goals, tail)
+    probs_away = goal_probs(away_xg, max_goals, tail)
+    return probs_home[:, :, None] * probs_away[:, None, :]
+
+
+def adjust_low_scores(matrix, home_xg, away_xg, rho):
+    """Applies the Dixon-Coles correction to the 0-0, 1-0, 0-1 and 1-1 cells of an (N, G, G) matrix."""
+    home_xg = np.atleast_1d(np.asarray(home_xg, dtype=float))
+    away_xg = np.atleast_1d(np.asarray(away_xg, dtype=float))
+    adjusted = matrix.copy()
+    adjusted[:, 0, 0] *= 1 - home_xg * away_xg * rho
+    adjusted[:, 0, 1] *= 1 + home_xg * rho
+    adjusted[:, 1, 0] *= 1 + away_xg * rho
+    adjusted[:, 1, 1] *= 1 - rho
+    return adjusted
+
+
+def match_odds(matrix):
+    """Returns an (N, 3) array of home win, draw and away win probabilities."""
+    size = matrix.shape[-1]
+    home = np.tril(np.ones((size, size)), -1)
+    away = np.triu(np.ones((size, size)), 1)
+    return np.stack([
+        np.einsum("nij,ij->n", matrix, home),
+        np.trace(matrix, axis1=1, axis2=2),
+        np.einsum("nij,ij->n", matrix, away),
+    ], axis=1)
+
+
+def total_goals(matrix):
+    """Returns an (N, 2G - 1) array with the probability of each total goals count."""
+    size = matrix.shape[-1]
+    totals = np.zeros((matrix.shape[0], 2 * size - 1))
+    # Row i holds totals i..i+G-1
+    for i in range(size):
+        totals[:, i:i + size] += matrix[:, i, :]
+    return totals
+
+
+def goal_difference(matrix):
+    """Returns an (N, 2G - 1) array of P(home - away == d), for d = -(G-1)..G-1."""
+    size = matrix.shape[-1]
+    diffs = np.zeros((matrix.shape[0], 2 * size - 1))
+    # Row i holds differences i-(G-1)..i, i.e. the row reversed
+    for i in range(size):
+        diffs[:, i:i + size] += matrix[:, i, ::-1]
+    return diffs
+
+
+def over_under(matrix, lines=DEFAULT_OU_LINES):
+    """Returns a dict of "Over x.5"/"Under x.5" arrays for each goal line."""
+    return _over_under_from_cdf(np.cumsum(total_goals(matrix), axis=1), lines)
+
+
+def _over_under_from_cdf(totals, lines):
+    result = {}
+    for line in lines:
+        # Lines past the grid's largest total leave only the omitted tail over
+        under = totals[:, min(int(np.floor(line)), totals.shape[1] - 1)]
+        result[f"Over {line}"] = 1 - under
+        result[f"Under {line}"] = under
+    return result
+
+
+def _over_settlement(cdf, line):
+    """Returns (win, push, lose) arrays for an Over bet on a half or whole goal line."""
+    last = cdf.shape[1] - 1
+
+    def at_most(goals):
+        return cdf[:, min(goals, last)] if goals >= 0 else np.zeros(len(cdf))
+
+    if line % 1 == 0:
+        lose, push = at_most(int(line) - 1), at_most(int(line)) - at_most(int(line) - 1)
+    else:
+        lose, push = at_most(int(np.floor(line))), np.zeros(len(cdf))
+    return cdf[:, last] - lose - push, push, lose
+
+
+def asian_totals(matrix, lines=ASIAN_TOTAL_LINES):
+    """Returns {"Over x"/"Under x": {"win", "push", "lose", "fair_odds"}} for Asian total lines.
+
+    Quarter lines (2.25, 2.75, ...) split the stake over the two neighbouring lines, so
+    win, push and lose are stake-weighted. fair_odds = 1 + lose / win is the price with
+    zero expected value.
+    """
+    return _asian_totals_from_cdf(np.cumsum(total_goals(matrix), axis=1), lines)
+
+
+def _asian_totals_from_cdf(cdf, lines):
+    result = {}
+    for line in lines:
+        if line % 0.5:
+            parts = [_over_settlement(cdf, line - 0.25), _over_settlement(cdf, line + 0.25)]
+            over = tuple((a + b) / 2 for a, b in zip(*parts))
+        else:
+            over = _over_settlement(cdf, line)
+        for side, (win, push, lose) in (("Over", over), ("Under", over[::-1])):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                fair_odds = 1 + lose / win
+            result[f"{side} {line}"] = {"win": win, "push": push, "lose": lose, "fair_odds": fair_odds}
+    return result
+
+
+def both_teams_to_score(matrix):
+    """Returns (gg, ng) arrays: both teams score / at least one team doesn't."""
+    gg = matrix[:, 1:, 1:].sum(axis=(1, 2))
+    return gg, 1 - gg
+
+
+def scoreline_labels(max_goals=3):
+    """Returns the flattened "i-j" labels matching a (G, G) score matrix."""
+    goals = range(max_goals + 1)
+    return np.array([f"{i}-{j}" for i in goals for j in goals])
+
+
+def top_scorelines(matrix, k=12):
+    """Returns (indices, probs), both (N, k), for the k most likely scorelines, best first.
+
+    Indices point into the flattened G*G grid; use scoreline_labels() to name them.
+    """
+    flat = matrix.reshape(matrix.shape[0], -1)
+    k = min(k, flat.shape[1])
+    top = np.argpartition(-flat, k - 1, axis=1)[:, :k]
+    top_probs = np.take_along_axis(flat, top, axis=1)
+    order = np.argsort(-top_probs, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_probs, order, axis=1)
+
+
+@profiling.staged("markets")
+def price_markets(home_xg, away_xg, max_goals=3, ou_lines=DEFAULT_OU_LINES, top_k=12, rho=0.0, tail=True):
+    """Prices the whole slate in one pass and returns every market as arrays.
+
+    A non-zero rho applies the Dixon-Coles low-score correction from a fitted model.
+    With tail=False the grid is exact and drops the mass beyond max_goals; pick
+    max_goals with adaptive_max_goals() for one grid that suits the whole slate.
+    """
+    matrix = score_matrix(home_xg, away_xg, max_goals, tail)
+    if rho:
+        matrix = adjust_low_scores(matrix, home_xg, away_xg, rho)
+    gg, ng = both_teams_to_score(matrix)
+    top_idx, top_probs = top_scorelines(matrix, top_k)
+    return {
+        "matrix": matrix,
+        "1x2": match_odds(matrix),
+        "over_under": over_under(matrix, ou_lines),
+        "gg": gg,
+        "ng": ng,
+        "top_scorelines": scoreline_labels(max_goals)[top_idx],
+        "top_probs": top_probs,
+    }
+
+
+def adaptive_max_goals(home_xg, away_xg, epsilon=DEFAULT_EPSILON):
+    """Returns per-fixture max goals so the (G, G) grid leaves out less than epsilon."""
+    # Each team may drop epsilon / 2, so together they drop less than epsilon
+    return np.maximum(poisson.truncation(home_xg, epsilon / 2), poisson.truncation(away_xg, epsilon / 2))
+
+
+@profiling.staged("markets")
+def price_markets_adaptive(home_xg, away_xg, epsilon=DEFAULT_EPSILON, ou_lines=ALL_OU_LINES,
+                           asian_lines=ASIAN_TOTAL_LINES, top_k=12, rho=0.0):
+    """Prices every fixture on its own exact grid and returns every market as arrays.
+
+    Besides the keys of price_markets(), the result has "max_goals" and "tail_mass" (the
+    probability the grid leaves out) per fixture and "asian_totals". Instead of one
+    "matrix" there are "groups", a list of (fixture indices, (n, G, G) matrix) with one
+    entry per grid size; use fixture_matrix() to get a single fixture's grid. Top
+    scorelines are padded with "" and 0 when a grid has fewer than top_k cells. A fixture
+    with NaN, infinite or negative expected goals gets NaN probabilities, no top
+    scorelines and a 1x1 grid, as on the fixed grid.
+    """
+    home_xg = np.atleast_1d(np.asarray(home_xg, dtype=float))
+    away_xg = np.atleast_1d(np.asarray(away_xg, dtype=float))
+    invalid = ~(np.isfinite(home_xg) & np.isfinite(away_xg) & (home_xg >= 0) & (away_xg >= 0))
+    if invalid.any():
+        home_xg = np.where(invalid, np.nan, home_xg)
+        away_xg = np.where(invalid, np.nan, away_xg)
+    n = len(home_xg)
+    max_goals = adaptive_max_goals(home_xg, away_xg, epsilon)
+    largest = int(max_goals.max(initial=0))
+    totals = np.zeros((n, 2 * largest + 1))
+    match = np.empty((n, 3))
+    gg = np.empty(n)
+    top_cells = np.zeros((n, top_k), dtype=np.intp)
+    top_probs = np.zeros((n, top_k))
+    groups = []
+
+    # Grid-dependent work runs per grid size; totals are padded so the lines price in one pass
+    for goals in np.unique(max_goals):
+        goals = int(goals)
+        rows = np.flatnonzero(max_goals == goals)
+        matrix = score_matrix(home_xg[rows], away_xg[rows], goals, tail=False)
+        if rho:
+            matrix = adjust_low_scores(matrix, home_xg[rows], away_xg[rows], rho)
+        groups.append((rows, matrix))
+        totals[rows, :2 * goals + 1] = total_goals(matrix)
+        match[rows] = match_odds(matrix)
+        gg[rows] = matrix[:, 1:, 1:].sum(axis=(1, 2))
+        idx, probs = top_scorelines(matrix, top_k)
+        # Cells renumbered on the largest grid so one label table serves every group
+        top_cells[rows, :idx.shape[1]] = idx // (goals + 1) * (largest + 1) + idx % (goals + 1)
+        top_probs[rows, :idx.shape[1]] = probs
+
+    cdf = np.cumsum(totals, axis=1)
+    tail_mass = 1 - cdf[:, -1]
+    labels = np.append(scoreline_labels(largest), "")
+    gg[invalid] = top_probs[invalid] = np.nan  # A 1x1 grid has no GG cells to carry the NaN
+    top_cells[(top_probs == 0) | invalid[:, None]] = len(labels) - 1
+    return {
+        "max_goals": max_goals,
+        "tail_mass": tail_mass,
+        "1x2": match,
+        "over_under": _over_under_from_cdf(cdf, ou_lines),
+        "asian_totals": _asian_totals_from_cdf(cdf, asian_lines),
+        "gg": gg,
+        "ng": 1 - tail_mass - gg,
+        "top_scorelines": labels[top_cells],
+        "top_probs": top_probs,
+        "groups": groups,
+    }
+
+
+def fixture_matrix(markets, fixture):
+    """Returns one fixture's (G, G) score matrix from price_markets_adaptive() output."""
+    for rows, matrix in markets["groups"]:
+        position = np.searchsorted(rows, fixture)
+        if position < len(rows) and rows[position] == fixture:
+            return matrix[position]
+    raise IndexError(f"No fixture {fixture}")
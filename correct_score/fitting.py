@@ -0,0 +1,221 @@
+# Team-strength fitting (Dixon-Coles)
+#
+# Fits per-team attack and defence strengths, a home advantage and the Dixon-Coles
+# low-score correction rho by weighted maximum likelihood over past results:
+#
+#   log(home_xg) = home_advantage + attack[home] + defence[away]
+#   log(away_xg) = attack[away] + defence[home]
+#
+# The two log-rates are sparse design matrices times the parameter vector, so the
+# log-likelihood and its analytic gradient are a handful of sparse mat-vecs per
+# evaluation. Older matches are down-weighted by exp(-xi * age_in_days), and a refit
+# after a new matchday starts from the previous strengths.
+#
+#   python -m correct_score.fitting results.csv strengths.npz --init strengths.npz
+import argparse
+import sys
+import time
+
+import numpy as np
+
+# Dixon & Coles (1997) time-decay rate per day (a half-life of about a year)
+DEFAULT_XI = 0.0019
+
+# rho is kept in a range where the correction factors stay positive for normal rates
+RHO_BOUNDS = (-0.2, 0.2)
+
+
+class TeamStrengths:
+    """Fitted attack/defence strengths; plugs into engine as an expected-goals source."""
+
+    def __init__(self, teams, attack, defence, home_advantage, rho):
+        self.teams = np.asarray(teams)
+        self.attack = np.asarray(attack, dtype=float)
+        self.defence = np.asarray(defence, dtype=float)
+        self.home_advantage = float(home_advantage)
+        self.rho = float(rho)
+        self._index = {team: i for i, team in enumerate(self.teams.tolist())}
+
+    def team_index(self, teams):
+        """Returns the integer index of each team name; raises KeyError for unknown teams."""
+        return np.array([self._index[team] for team in np.atleast_1d(teams).tolist()], dtype=np.intp)
+
+    def expected_goals(self, home_teams, away_teams):
+        """Returns (home_xg, away_xg) arrays, the same pair engine.expected_goals() gives."""
+        home = self.team_index(home_teams)
+        away = self.team_index(away_teams)
+        home_xg = np.exp(self.home_advantage + self.attack[home] + self.defence[away])
+        away_xg = np.exp(self.attack[away] + self.defence[home])
+        return home_xg, away_xg
+
+    def save(self, path):
+        np.savez(
+            path, teams=self.teams.astype(str), attack=self.attack, defence=self.defence,
+            home_advantage=self.home_advantage, rho=self.rho,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["teams"], data["attack"], data["defence"], data["home_advantage"], data["rho"])
+
+
+def time_weights(match_dates, reference_date=None, xi=DEFAULT_XI):
+    """Returns exp(-xi * days since each match), measured back from reference_date."""
+    dates = np.asarray(match_dates, dtype="datetime64[D]")
+    if reference_date is None:
+        reference_date = dates.max()
+    age = (np.datetime64(reference_date, "D") - dates).astype(float)
+    return np.exp(-xi * np.clip(age, 0, None))
+
+
+def _design_matrices(home, away, n_teams):
+    """Returns sparse (M, 2T + 1) matrices mapping parameters to home and away log-rates."""
+    import scipy.sparse
+
+    n = len(home)
+    shape = (n, 2 * n_teams + 1)
+    # Columns: attack 0..T-1, defence T..2T-1, home advantage 2T
+    home_cols = np.column_stack([home, n_teams + away, np.full(n, 2 * n_teams)])
+    away_cols = np.column_stack([away, n_teams + home])
+    home_x = scipy.sparse.csr_matrix((np.ones(3 * n), home_cols.ravel(), np.arange(0, 3 * n + 1, 3)), shape=shape)
+    away_x = scipy.sparse.csr_matrix((np.ones(2 * n), away_cols.ravel(), np.arange(0, 2 * n + 1, 2)), shape=shape)
+    return home_x, away_x
+
+
+def _negative_log_likelihood(params, home_x, away_x, home_goals, away_goals, weights, low_scores, n_teams):
+    """Returns (-loglik, gradient) for the Dixon-Coles model; params end with rho."""
+    theta, rho = params[:-1], params[-1]
+    log_home = home_x @ theta
+    log_away = away_x @ theta
+    home_xg = np.exp(log_home)
+    away_xg = np.exp(log_away)
+
+    # Poisson terms (the log(k!) constants are dropped)
+    loglik = weights * (home_goals * log_home - home_xg + away_goals * log_away - away_xg)
+    d_log_home = weights * (home_goals - home_xg)
+    d_log_away = weights * (away_goals - away_xg)
+
+    # Low-score correction factors tau and their derivatives
+    s00, s01, s10, s11 = low_scores
+    tau00 = 1 - home_xg[s00] * away_xg[s00] * rho
+    tau01 = 1 + home_xg[s01] * rho
+    tau10 = 1 + away_xg[s10] * rho
+    tau11 = 1 - rho
+    if (tau00 <= 0).any() or (tau01 <= 0).any() or (tau10 <= 0).any() or tau11 <= 0:
+        return np.inf, np.zeros_like(params)
+    loglik[s00] += weights[s00] * np.log(tau00)
+    loglik[s01] += weights[s01] * np.log(tau01)
+    loglik[s10] += weights[s10] * np.log(tau10)
+    loglik[s11] += weights[s11] * np.log(tau11)
+
+    term00 = weights[s00] * home_xg[s00] * away_xg[s00] / tau00
+    d_log_home[s00] -= term00 * rho
+    d_log_away[s00] -= term00 * rho
+    d_log_home[s01] += weights[s01] * home_xg[s01] * rho / tau01
+    d_log_away[s10] += weights[s10] * away_xg[s10] * rho / tau10
+    d_rho = (
+        -term00.sum()
+        + (weights[s01] * home_xg[s01] / tau01).sum()
+        + (weights[s10] * away_xg[s10] / tau10).sum()
+        - weights[s11].sum() / tau11
+    )
+
+    grad_theta = home_x.T @ d_log_home + away_x.T @ d_log_away
+
+    # Attack strengths are only identified up to a constant; pin their sum at zero
+    attack_sum = theta[:n_teams].sum()
+    value = -loglik.sum() + attack_sum ** 2
+    grad_theta[:n_teams] -= 2 * attack_sum
+    return value, -np.append(grad_theta, d_rho)
+
+
+def fit_team_strengths(home_teams, away_teams, home_goals, away_goals, match_dates=None,
+                       reference_date=None, xi=DEFAULT_XI, init=None):
+    """Fits a TeamStrengths model from past results.
+
+    match_dates enable time-decay weighting (no weighting without them). Pass the
+    previous fit as init to warm-start a refit after a new matchday; teams it doesn't
+    know start at zero strength.
+    """
+    home_teams = np.asarray(home_teams)
+    away_teams = np.asarray(away_teams)
+    home_goals = np.asarray(home_goals, dtype=float)
+    away_goals = np.asarray(away_goals, dtype=float)
+
+    teams, codes = np.unique(np.concatenate([home_teams, away_teams]), return_inverse=True)
+    n_teams = len(teams)
+    home, away = codes[:len(home_teams)], codes[len(home_teams):]
+    home_x, away_x = _design_matrices(home, away, n_teams)
+
+    if match_dates is None:
+        weights = np.ones(len(home_goals))
+    else:
+        weights = time_weights(match_dates, reference_date, xi)
+
+    low_scores = (
+        np.flatnonzero((home_goals == 0) & (away_goals == 0)),
+        np.flatnonzero((home_goals == 0) & (away_goals == 1)),
+        np.flatnonzero((home_goals == 1) & (away_goals == 0)),
+        np.flatnonzero((home_goals == 1) & (away_goals == 1)),
+    )
+
+    params = np.zeros(2 * n_teams + 2)
+    params[2 * n_teams] = 0.25  # Typical home advantage on the log scale
+    if init is not None:
+        for i, team in enumerate(teams.tolist()):
+            if team in init._index:
+                params[i] = init.attack[init._index[team]]
+                params[n_teams + i] = init.defence[init._index[team]]
+        params[2 * n_teams] = init.home_advantage
+        params[-1] = init.rho
+
+    import scipy.optimize
+
+    bounds = [(None, None)] * (2 * n_teams + 1) + [RHO_BOUNDS]
+    result = scipy.optimize.minimize(
+        _negative_log_likelihood, params, jac=True, method="L-BFGS-B", bounds=bounds,
+        args=(home_x, away_x, home_goals, away_goals, weights, low_scores, n_teams),
+    )
+    if not result.success:
+        raise RuntimeError(f"Team strength fit did not converge: {result.message}")
+
+    fitted = result.x
+    return TeamStrengths(
+        teams, fitted[:n_teams], fitted[n_teams:2 * n_teams], fitted[2 * n_teams], fitted[-1]
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit team strengths from a CSV of past results.")
+    parser.add_argument("results", help="CSV, Parquet or column store with home_team, away_team, home_goals, "
+                                        "away_goals and optional date")
+    parser.add_argument("output", help=".npz file to save the fitted strengths to")
+    parser.add_argument("--init", help="previous strengths .npz to warm-start from")
+    parser.add_argument("--xi", type=float, default=DEFAULT_XI, help="time-decay rate per day")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    from correct_score.slate import read_chunks
+
+    results = pd.concat(read_chunks(args.results), ignore_index=True)
+    start = time.perf_counter()
+    strengths = fit_team_strengths(
+        results["home_team"].to_numpy(str), results["away_team"].to_numpy(str),
+        results["home_goals"].to_numpy(), results["away_goals"].to_numpy(),
+        match_dates=results["date"].to_numpy("datetime64[D]") if "date" in results else None,
+        xi=args.xi,
+        init=TeamStrengths.load(args.init) if args.init else None,
+    )
+    strengths.save(args.output)
+    print(
+        f"Fitted {len(strengths.teams)} teams from {len(results)} matches in {time.perf_counter() - start:.2f}s "
+        f"(home advantage {strengths.home_advantage:.3f}, rho {strengths.rho:.3f})",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# Half-time/full-time model
+#
+# Each side's expected goals are split into first- and second-half rates. The two
+# halves are independent Poisson score matrices, and the full-time matrix is their
+# 2-D convolution: FT[c, d] = sum over a, b of HT[a, b] * SH[c - a, d - b]. With
+# independent teams both half matrices are outer products, so the 2-D convolution
+# separates into one 1-D convolution per team. HT/FT results only depend on the goal
+# difference at half time and in the second half, so the nine outcomes come from the
+# two difference distributions and a cumulative sum, without building the joint grid.
+# Like the full-time pricer, each half's grid is cut where the omitted Poisson tail
+# drops below epsilon.
+import numpy as np
+
+from correct_score import engine, poisson, profiling
+
+# Share of goals scored before half time; roughly 45% across the major leagues
+FIRST_HALF_SHARE = 0.45
+
+# Result classes in the order of the app's labels: 1 = home, X = draw, 2 = away
+RESULTS = ("1", "X", "2")
+HT_FT_OUTCOMES = tuple(f"{ht}/{ft}" for ht in RESULTS for ft in RESULTS)
+
+
+def half_rates(home_xg, away_xg, first_half_share=FIRST_HALF_SHARE):
+    """Returns ((home_1st, away_1st), (home_2nd, away_2nd)) expected goals per half."""
+    home_xg = np.asarray(home_xg, dtype=float)
+    away_xg = np.asarray(away_xg, dtype=float)
+    first = (home_xg * first_half_share, away_xg * first_half_share)
+    second = (home_xg * (1 - first_half_share), away_xg * (1 - first_half_share))
+    return first, second
+
+
+def convolve_goals(first, second):
+    """Returns the (N, G1 + G2 - 1) batched 1-D convolution of two goal distributions."""
+    size_1 = first.shape[-1]
+    size_2 = second.shape[-1]
+    result = np.zeros((first.shape[0], size_1 + size_2 - 1))
+    for a in range(size_1):
+        result[:, a:a + size_2] += first[:, a, None] * second
+    return result
+
+
+def convolve_scores(first, second):
+    """Returns the (N, G1 + G2 - 1, G1 + G2 - 1) batched 2-D convolution of two score tensors.
+
+    Use this when either matrix is not an outer product (e.g. a low-score correction);
+    it costs O(G^4) per fixture against O(G^2) for the separable path in ht_ft().
+    """
+    n, size_1, _ = first.shape
+    size_2 = second.shape[-1]
+    result = np.zeros((n, size_1 + size_2 - 1, size_1 + size_2 - 1))
+    # One shifted, scaled copy of the second-half matrix per half-time score
+    for a in range(size_1):
+        for b in range(size_1):
+            result[:, a:a + size_2, b:b + size_2] += first[:, a, b, None, None] * second
+    return result
+
+
+def _ht_ft_from_differences(ht_diff, second_diff):
+    """Returns the (N, 9) HT/FT probabilities from half-time and second-half goal differences."""
+    mid = ht_diff.shape[-1] // 2  # Column of a zero difference
+    # Column a of the reversed arrays is the second-half difference that levels HT difference a
+    level = second_diff[:, ::-1]
+    at_most_level = np.cumsum(second_diff, axis=1)[:, ::-1]
+    total = at_most_level[:, :1]
+    given_ht = (total - at_most_level, level, at_most_level - level)  # FT 1, X, 2
+
+    ht_classes = (slice(mid + 1, None), slice(mid, mid + 1), slice(None, mid))  # HT 1, X, 2
+    return np.stack(
+        [(ht_diff[:, ht] * ft[:, ht]).sum(axis=1) for ht in ht_classes for ft in given_ht],
+        axis=1,
+    )
+
+
+def half_max_goals(home_xg, away_xg, epsilon=engine.DEFAULT_EPSILON, first_half_share=FIRST_HALF_SHARE):
+    """Returns the goals per team per half that leave out less than epsilon for every fixture."""
+    rates = np.concatenate([np.atleast_1d(rate) for half in half_rates(home_xg, away_xg, first_half_share)
+                            for rate in half])
+    # Four distributions are truncated, each to a quarter of epsilon
+    return int(poisson.truncation(rates, epsilon / 4).max(initial=0))
+
+
+@profiling.staged("ht_ft")
+def ht_ft(home_xg, away_xg, first_half_share=FIRST_HALF_SHARE, max_goals=None, epsilon=engine.DEFAULT_EPSILON):
+    """Prices HT/FT for a batch of fixtures.
+
+    Each half's grid has max_goals per team, by default enough to leave out less than
+    epsilon for every fixture; the mass beyond it is dropped. Returns a dict with
+    "ht_ft" (N, 9) in HT_FT_OUTCOMES order, plus the half-time correct-score matrix
+    "ht" (N, G, G) and the full-time matrix "ft" (N, 2G-1, 2G-1).
+    """
+    if max_goals is None:
+        max_goals = half_max_goals(home_xg, away_xg, epsilon, first_half_share)
+    (home_1st, away_1st), (home_2nd, away_2nd) = half_rates(home_xg, away_xg, first_half_share)
+    home_1st = engine.goal_probs(home_1st, max_goals, tail=False)
+    away_1st = engine.goal_probs(away_1st, max_goals, tail=False)
+    home_2nd = engine.goal_probs(home_2nd, max_goals, tail=False)
+    away_2nd = engine.goal_probs(away_2nd, max_goals, tail=False)
+    first = home_1st[:, :, None] * away_1st[:, None, :]
+    second = home_2nd[:, :, None] * away_2nd[:, None, :]
+    home_ft = convolve_goals(home_1st, home_2nd)
+    away_ft = convolve_goals(away_1st, away_2nd)
+
+    probs = _ht_ft_from_differences(engine.goal_difference(first), engine.goal_difference(second))
+    return {"ht_ft": probs, "ht": first, "ft": home_ft[:, :, None] * away_ft[:, None, :]}
+
+
+def ht_ft_scores(home_xg, away_xg, max_goals, first_half_share=FIRST_HALF_SHARE):
+    """Returns the (N, 3, G, G) joint probabilities of the HT result and the FT score.
+
+    Axis 1 follows RESULTS; the full-time grid stops at max_goals per team with the mass
+    beyond it left out, so every market settled on the half-time result and the final
+    score (HT/FT, 1x2, totals, BTTS, correct score) can be read off one tensor.
+    """
+    (home_1st, away_1st), (home_2nd, away_2nd) = half_rates(home_xg, away_xg, first_half_share)
+    first = engine.score_matrix(np.atleast_1d(home_1st), np.atleast_1d(away_1st), max_goals, tail=False)
+    second = engine.score_matrix(np.atleast_1d(home_2nd), np.atleast_1d(away_2nd), max_goals, tail=False)
+    size = max_goals + 1
+    result = np.zeros((first.shape[0], 3, size, size))
+    for a in range(size):
+        for b in range(size):
+            ht = 0 if a > b else 1 if a == b else 2
+            result[:, ht, a:, b:] += first[:, a, b, None, None] * second[:, :size - a, :size - b]
+    return result
@@ -0,0 +1,327 @@
+# Fractional-Kelly staking over every bet offered on a fixture at once
+#
+# The bets on one fixture are correlated: a 2-1 correct score, home win, Over 2.5, GG
+# and 1/1 HT/FT all land together. Sizing each one alone with the single-bet Kelly
+# formula overstakes the fixture. Here every bet is settled on the same outcome space,
+# the half-time result x the full-time score (see htft.ht_ft_scores()), and the stakes
+# maximise the expected log growth of the bankroll over that joint distribution.
+# Outcomes every bet settles alike are merged first, leaving a few dozen per fixture.
+#
+# With the unstaked bankroll as cash that returns 1 everywhere, this is the
+# log-optimal portfolio. It is solved for a whole block of fixtures at once by damped,
+# projected Newton ascent, batched as stacked (B+1, B+1) systems, so the stakes stay
+# non-negative and never exceed the bankroll. A fixture stops once its growth is
+# provably within tol of the optimum.
+#
+# Fixtures are sized independently with the whole bankroll, then scaled by the Kelly
+# fraction; max_exposure (one bankroll by default) caps what the slate stakes in total,
+# so a long slate can't add up to more than is there to stake.
+#
+#   probs = kelly.slate_probs(home_xg, away_xg)
+#   result = kelly.optimize(probs, odds, ["1", "X", "2", "Over 2.5", "1/1", "2-1"], fraction=0.25)
+#   result["stakes"]  # (N, B) bankroll fractions
+#
+#   python -m correct_score.kelly fixtures.csv stakes.csv --fraction 0.25 --max-exposure 0.5
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from correct_score import engine, htft, profiling
+from correct_score.simulate import market_mask
+
+DEFAULT_FRACTION = 0.25
+# Cap on a slate's total stake as a bankroll fraction; None leaves it uncapped
+DEFAULT_MAX_EXPOSURE = 1.0
+DEFAULT_TOL = 1e-6
+DEFAULT_MAX_ITER = 100
+# Fixtures solved together; memory grows with block_size * (B + 1)**2
+DEFAULT_BLOCK_SIZE = 2048
+# Full-Kelly stakes below this are solver residue and are zeroed
+MIN_STAKE = 1e-6
+
+
+def payoff_masks(markets, max_goals):
+    """Returns a (B, 3, G, G) 0/1 mask of the joint outcomes that win each market.
+
+    markets are the names market_mask() takes, or HT/FT outcomes such as "1/X".
+    """
+    size = max_goals + 1
+    masks = np.zeros((len(markets), 3, size, size), dtype=bool)
+    for b, market in enumerate(markets):
+        if "/" in market:
+            ht, ft = market.split("/")
+            masks[b, htft.RESULTS.index(ht)] = market_mask(ft, max_goals)
+        else:
+            masks[b] = market_mask(market, max_goals)
+    return masks
+
+
+def _outcome_classes(masks, probs):
+    """Returns the (B, K) payoff pattern of each class of outcomes and their (N, K) probabilities.
+
+    Outcomes that every bet settles the same way are merged, which shrinks the hundreds
+    of grid cells to the few dozen the solver has to work with.
+    """
+    patterns, inverse = np.unique(masks.reshape(len(masks), -1).T, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind="stable")
+    starts = np.searchsorted(inverse[order], np.arange(len(patterns)))
+    flat = probs.reshape(len(probs), -1)[:, order]
+    class_probs = np.add.reduceat(flat, starts, axis=1)
+    # Normalised so the mass outside the grid doesn't count as a loss for every bet
+    class_probs /= class_probs.sum(axis=1, keepdims=True)
+    return patterns.T.astype(float), class_probs
+
+
+def _evaluate(weights, odds, patterns, probs):
+    """Returns the (n,) objective and the (n, K) ratios p / wealth and p / wealth**2."""
+    wealth = weights[:, :1] + (weights[:, 1:] * odds) @ patterns
+    # Outcomes that can't happen don't count, even where they'd leave nothing
+    possible = probs > 0
+    with np.errstate(divide="ignore"):  # Unpaid possible outcomes with nothing held back score -inf
+        log_wealth = np.log(wealth, out=np.zeros_like(wealth), where=possible)
+        ratio = np.divide(probs, wealth, out=np.zeros_like(wealth), where=possible)
+        squared = np.divide(ratio, wealth, out=np.zeros_like(wealth), where=possible)
+    return (probs * log_wealth).sum(axis=1) - weights.sum(axis=1), ratio, squared
+
+
+def _gradient(odds, patterns, ratio):
+    """Returns the (n, B + 1) gradient of the growth against cash and each bet."""
+    return np.concatenate([ratio.sum(axis=1, keepdims=True), odds * (ratio @ patterns.T)], axis=1)
+
+
+def _solve(odds, patterns, probs, tol, max_iter):
+    """Returns the (N, B) full-Kelly stakes, the iterations and the per-fixture shortfall bound.
+
+    Maximises sum(p log(wealth)) - sum(weights) over weights >= 0 (cash first), whose
+    optimum sums to 1 and is the log-optimal portfolio, so only the bounds remain for
+    projected Newton. Rescaled to sum to 1, a point's growth is within
+    max(sum(weights) * gradient) - 1 of the optimum, which is the stopping rule.
+    """
+    n, n_bets = odds.shape
+    payouts = np.concatenate([np.ones((n, 1)), odds], axis=1)  # Cash returns 1 in every outcome
+    offered = payouts > 0
+    cash_patterns = np.concatenate([np.ones((1, patterns.shape[1])), patterns])
+    # Hessian from one product: -sum_k p_k / wealth_k**2 * a_ik * a_jk, with a_ik = payout_i * pattern_ik
+    pairs = (cash_patterns[:, None, :] * cash_patterns[None, :, :]).reshape(-1, patterns.shape[1]).T
+    weights = np.zeros((n, n_bets + 1))
+    weights[:, 0] = 1
+    objective, ratio, squared = _evaluate(weights, odds, patterns, probs)
+    gradient = _gradient(odds, patterns, ratio)
+    gap = gradient.max(axis=1) - 1
+    active = np.flatnonzero(gap > tol)
+    iterations = 0
+    while len(active) and iterations < max_iter:
+        iterations += 1
+        a, w, g = payouts[active], weights[active], gradient[active] - 1
+        curvature = a[:, :, None] * a[:, None, :] * (squared[active] @ pairs).reshape(-1, n_bets + 1, n_bets + 1)
+        # Newton step over the weights that are positive or would gain from growing; the rest stay at 0
+        free = offered[active] & ((w > 0) | (g > 0))
+        curvature[~(free[:, :, None] & free[:, None, :])] = 0
+        # Damped in proportion to the gradient: a full Newton step near the optimum, while
+        # flat directions (e.g. bets that together pay out like cash) can't blow the step up
+        diagonal = np.einsum("nii->ni", curvature)
+        diagonal += np.where(free, np.abs(g * free).max(axis=1, keepdims=True), 1.0)
+        direction = np.linalg.solve(curvature, (g * free)[:, :, None])[:, :, 0]
+
+        # Projected backtracking: halve the step until the objective doesn't drop
+        step = 1.0
+        pending = np.arange(len(active))
+        for _ in range(40):
+            rows = active[pending]
+            trial = np.maximum(w[pending] + step * direction[pending], 0)
+            trial_objective, trial_ratio, trial_squared = _evaluate(trial, odds[rows], patterns, probs[rows])
+            better = trial_objective >= objective[rows]
+            done = rows[better]
+            weights[done] = trial[better]
+            objective[done] = trial_objective[better]
+            ratio[done] = trial_ratio[better]
+            squared[done] = trial_squared[better]
+            pending = pending[~better]
+            if not len(pending):
+                break
+            step *= 0.5
+        gradient[active] = _gradient(odds[active], patterns, ratio[active])
+        gap[active] = weights[active].sum(axis=1) * gradient[active].max(axis=1) - 1
+        # A fixture whose line search found nothing better is as good as it gets
+        stalled = np.zeros(len(active), dtype=bool)
+        stalled[pending] = True
+        active = active[(gap[active] > tol) & ~stalled]
+    return weights[:, 1:] / weights.sum(axis=1, keepdims=True), iterations, gap
+
+
+def _prepare(probs, odds, markets):
+    """Returns the cleaned (N, B) odds, the (B, K) payoff patterns and the (N, K) class probabilities."""
+    probs = np.asarray(probs, dtype=float)
+    if probs.ndim == 3:
+        if any("/" in market for market in markets):
+            raise ValueError("HT/FT markets need the (N, 3, G, G) probabilities from slate_probs()")
+        probs = probs[:, None]
+    odds = np.atleast_2d(np.asarray(odds, dtype=float))
+    if odds.shape != (len(probs), len(markets)):
+        raise ValueError(f"odds must be (N, B) = {(len(probs), len(markets))}, got {odds.shape}")
+    odds = np.where(odds > 1, odds, 0.0)  # NaN compares False, so unoffered markets drop out too
+
+    masks = payoff_masks(markets, probs.shape[-1] - 1)
+    if probs.shape[1] == 1:
+        masks = masks.any(axis=1, keepdims=True)  # Full-time markets don't depend on the HT axis
+    return (odds, *_outcome_classes(masks, probs))
+
+
+def _growth(stakes, odds, patterns, probs):
+    weights = np.concatenate([1 - stakes.sum(axis=1, keepdims=True), stakes], axis=1)
+    return _evaluate(weights, odds, patterns, probs)[0] + 1  # The objective subtracts sum(weights) = 1
+
+
+@profiling.staged("kelly")
+def optimize(probs, odds, markets, fraction=DEFAULT_FRACTION, max_exposure=DEFAULT_MAX_EXPOSURE, tol=DEFAULT_TOL,
+             max_iter=DEFAULT_MAX_ITER, block_size=DEFAULT_BLOCK_SIZE):
+    """Sizes fractional-Kelly stakes for every fixture's bets jointly.
+
+    probs is (N, 3, G, G) from slate_probs(), or an (N, G, G) score matrix when no HT/FT
+    market is offered; odds is (N, B) decimal odds for the B markets, with NaN (or
+    anything up to 1) where a fixture doesn't offer one. Stakes are scaled down together
+    if they add up to more than max_exposure over all fixtures. Returns a dict with "stakes"
+    (N, B) as bankroll fractions, "full_kelly" (N, B), "growth" (N,) the expected log
+    growth at the stakes, "ev" (N, B), "gap" (N,) the bound on the solver's shortfall
+    in full-Kelly growth, and "iterations", the most any block of fixtures took.
+    """
+    odds, patterns, class_probs = _prepare(probs, odds, markets)
+    full_kelly = np.zeros(odds.shape)
+    gap = np.zeros(len(odds))
+    iterations = 0
+    for start in range(0, len(odds), block_size):
+        block = slice(start, start + block_size)
+        full_kelly[block], block_iterations, gap[block] = _solve(
+            odds[block], patterns, class_probs[block], tol, max_iter)
+        iterations = max(iterations, block_iterations)
+    full_kelly[full_kelly < MIN_STAKE] = 0
+
+    stakes = fraction * full_kelly
+    if max_exposure is not None and stakes.sum() > max_exposure:
+        stakes *= max_exposure / stakes.sum()
+    return {
+        "stakes": stakes,
+        "full_kelly": full_kelly,
+        "growth": _growth(stakes, odds, patterns, class_probs),
+        "ev": odds * (class_probs @ patterns.T),
+        "gap": gap,
+        "iterations": iterations,
+    }
+
+
+def expected_growth(probs, odds, markets, stakes):
+    """Returns the (N,) expected log growth of the bankroll from (N, B) stakes on the markets."""
+    odds, patterns, class_probs = _prepare(probs, odds, markets)
+    return _growth(np.asarray(stakes, dtype=float), odds, patterns, class_probs)
+
+
+def slate_probs(home_xg, away_xg, epsilon=engine.DEFAULT_EPSILON, first_half_share=htft.FIRST_HALF_SHARE):
+    """Returns the (N, 3, G, G) joint probabilities on one grid wide enough for every fixture."""
+    home_xg = np.atleast_1d(np.asarray(home_xg, dtype=float))
+    away_xg = np.atleast_1d(np.asarray(away_xg, dtype=float))
+    max_goals = int(engine.adaptive_max_goals(home_xg, away_xg, epsilon).max(initial=0))
+    return htft.ht_ft_scores(home_xg, away_xg, max_goals, first_half_share)
+
+
+def market_of(column):
+    """Returns the market an odds column prices, or None.
+
+    Besides the slate columns (odds_home, odds_over_2_5, odds_btts_gg, ...) this reads
+    odds_cs_<home>_<away> correct scores and odds_htft_<ht>_<ft> with 1, x or 2.
+    """
+    parts = column.split("_")
+    if parts[0] != "odds" or len(parts) < 2:
+        return None
+    kind, rest = parts[1], parts[2:]
+    if kind in ("home", "draw", "away") and not rest:
+        return {"home": "1", "draw": "X", "away": "2"}[kind]
+    if kind in ("over", "under") and len(rest) == 2 and rest[0].isdigit() and rest[1] == "5":
+        return f"{kind.title()} {rest[0]}.5"
+    if kind == "btts" and rest in (["gg"], ["ng"]):
+        return rest[0].upper()
+    if kind == "cs" and len(rest) == 2 and all(part.isdigit() for part in rest):
+        return f"{int(rest[0])}-{int(rest[1])}"
+    if kind == "htft" and len(rest) == 2 and all(part in ("1", "x", "2") for part in rest):
+        return "/".join(rest).upper()
+    return None
+
+
+def stake_fixtures(fixtures, fraction=DEFAULT_FRACTION, max_exposure=DEFAULT_MAX_EXPOSURE):
+    """Returns the fixtures DataFrame with a stake_* column per odds_* column and the slate totals.
+
+    Expected goals come from expected_goals_A/B if present, else the team averages. The
+    added kelly_exposure and kelly_growth columns are each fixture's total stake and
+    expected log growth, after capping the whole slate at max_exposure.
+    """
+    from correct_score.slate import STAT_COLUMNS
+
+    columns = [column for column in fixtures.columns if market_of(column) is not None]
+    if not columns:
+        raise ValueError("No odds columns to stake (odds_home, odds_over_2_5, odds_cs_2_1, odds_htft_1_x, ...)")
+    if "expected_goals_A" in fixtures.columns and "expected_goals_B" in fixtures.columns:
+        home_xg = fixtures["expected_goals_A"].to_numpy(dtype=float)
+        away_xg = fixtures["expected_goals_B"].to_numpy(dtype=float)
+    else:
+        missing = [column for column in STAT_COLUMNS if column not in fixtures.columns]
+        if missing:
+            raise ValueError(f"Missing fixture columns: {', '.join(missing)}")
+        home_xg, away_xg = engine.expected_goals(*(fixtures[column].to_numpy(dtype=float) for column in STAT_COLUMNS))
+    markets = [market_of(column) for column in columns]
+    odds = fixtures[columns].to_numpy(dtype=float)
+
+    blocks = [slice(start, start + DEFAULT_BLOCK_SIZE) for start in range(0, len(odds), DEFAULT_BLOCK_SIZE)]
+    stakes = np.zeros(odds.shape)
+    growth = np.zeros(len(odds))
+    # Joint probabilities are built a block at a time too; they are the largest array here
+    for block in blocks:
+        result = optimize(slate_probs(home_xg[block], away_xg[block]), odds[block], markets, fraction=fraction,
+                          max_exposure=None)
+        stakes[block] = result["stakes"]
+        growth[block] = result["growth"]
+    if max_exposure is not None and stakes.sum() > max_exposure:
+        stakes *= max_exposure / stakes.sum()
+        for block in blocks:
+            growth[block] = expected_growth(
+                slate_probs(home_xg[block], away_xg[block]), odds[block], markets, stakes[block])
+
+    staked = fixtures.copy()
+    for b, column in enumerate(columns):
+        staked[f"stake_{column[len('odds_'):]}"] = stakes[:, b]
+    staked["kelly_exposure"] = stakes.sum(axis=1)
+    staked["kelly_growth"] = growth
+    return staked
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Size fractional-Kelly stakes for a slate of fixtures.")
+    parser.add_argument("input", help="CSV or Parquet file of fixtures with odds_* columns")
+    parser.add_argument("output", help="CSV or Parquet file to write the fixtures and stakes to")
+    parser.add_argument("--fraction", type=float, default=DEFAULT_FRACTION, help="share of full Kelly to stake")
+    parser.add_argument("--max-exposure", type=float, default=DEFAULT_MAX_EXPOSURE,
+                        help="cap on the slate's total stake, as a bankroll fraction")
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    from correct_score import slate
+
+    start = time.perf_counter()
+    fixtures = pd.concat(slate.read_chunks(args.input), ignore_index=True)
+    staked = stake_fixtures(fixtures, args.fraction, args.max_exposure)
+    writer = slate._ChunkWriter(args.output)
+    try:
+        writer.write(staked)
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - start
+    bets = int((staked.filter(like="stake_").to_numpy() > 0).sum())
+    print(f"Staked {bets} bets on {len(staked)} fixtures ({staked['kelly_exposure'].sum():.1%} of bankroll) "
+          f"in {seconds:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
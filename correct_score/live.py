@@ -0,0 +1,284 @@
+# In-play repricing from the current score and minute
+#
+# Goals still to come are Poisson with the pre-match expected goals scaled by the
+# share of scoring left after the current minute. Scoring intensity rises linearly
+# through a match, at the slope that puts FIRST_HALF_SHARE of the goals before half
+# time, and REMAINING_SHARE tabulates what is left at every minute.
+#
+# A LiveBook builds, once per match, per-minute tables of the remaining goals for
+# each team, the remaining goal difference CDF, the remaining total goals CDF and the
+# most likely remaining scorelines. Each event (a goal or a new minute) then only
+# indexes those tables at the new minute and shifts by the current score, so every
+# market is repriced without recomputing any distribution.
+#
+#   python -m correct_score.live simulate feed.jsonl --matches 500
+#   python -m correct_score.live replay feed.jsonl
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from correct_score import engine, poisson
+from correct_score.htft import FIRST_HALF_SHARE
+
+MINUTES = 90
+
+# Remaining goals per team beyond this are lumped into the last bucket
+DEFAULT_MAX_REMAINING = 12
+
+# Matches whose tables are built in one vectorized pass
+_BUILD_CHUNK = 256
+
+
+def remaining_share(first_half_share=FIRST_HALF_SHARE, minutes=MINUTES):
+    """Returns the (minutes + 1,) share of a match's expected goals still to come after each minute.
+
+    Intensity is 1 + k * t, with k chosen so that first_half_share of it falls before half time.
+    """
+    half = minutes / 2
+    k = (half - minutes * first_half_share) / (first_half_share * minutes ** 2 / 2 - half ** 2 / 2)
+    t = np.arange(minutes + 1)
+    cumulative = t + k * t ** 2 / 2
+    return 1 - cumulative / cumulative[-1]
+
+
+REMAINING_SHARE = remaining_share()
+
+
+def _remaining_pmf(expected_goals, max_remaining):
+    """Returns (..., max_remaining + 1) PMFs with the tail lumped into the last bucket."""
+    lam = np.asarray(expected_goals, dtype=float)
+    pmf = poisson.pmf(lam.ravel(), max_remaining - 1)
+    pmf = np.concatenate([pmf, 1 - pmf.sum(axis=1, keepdims=True)], axis=1)
+    return pmf.reshape(lam.shape + (max_remaining + 1,))
+
+
+class LiveBook:
+    """Per-minute pricing tables for many live matches, repriced on every event."""
+
+    def __init__(self, max_remaining=DEFAULT_MAX_REMAINING, top_k=5, ou_lines=engine.DEFAULT_OU_LINES,
+                 share=REMAINING_SHARE):
+        self.max_remaining = max_remaining
+        self.top_k = top_k
+        self.ou_lines = tuple(ou_lines)
+        self.share = share
+        self._count = 0
+        self._tables = {}
+
+    def __len__(self):
+        return self._count
+
+    def __getattr__(self, name):
+        # Table views over the filled part of the preallocated buffers
+        tables = self.__dict__.get("_tables", {})
+        if name in tables:
+            return tables[name][:self._count]
+        raise AttributeError(name)
+
+    def add_matches(self, home_xg, away_xg):
+        """Builds the tables for new matches and returns their ids."""
+        home_xg = np.atleast_1d(np.asarray(home_xg, dtype=float))
+        away_xg = np.atleast_1d(np.asarray(away_xg, dtype=float))
+        first = self._count
+        for i in range(0, len(home_xg), _BUILD_CHUNK):
+            block = self._build(home_xg[i:i + _BUILD_CHUNK], away_xg[i:i + _BUILD_CHUNK])
+            added = len(block["home_pmf"])
+            for name, table in block.items():
+                buffer = self._tables.get(name)
+                if buffer is None or len(buffer) < self._count + added:
+                    # Double the capacity so adding matches one at a time stays linear overall
+                    grown = np.empty((max(2 * self._count, self._count + added, 16),) + table.shape[1:], table.dtype)
+                    if buffer is not None:
+                        grown[:self._count] = buffer[:self._count]
+                    self._tables[name] = buffer = grown
+                buffer[self._count:self._count + added] = table
+            self._count += added
+        return np.arange(first, self._count)
+
+    def _build(self, home_xg, away_xg):
+        n, minutes, size = len(home_xg), len(self.share), self.max_remaining + 1
+        home_pmf = _remaining_pmf(home_xg[:, None] * self.share, self.max_remaining)
+        away_pmf = _remaining_pmf(away_xg[:, None] * self.share, self.max_remaining)
+        flat_home = home_pmf.reshape(-1, size)
+        flat_away = away_pmf.reshape(-1, size)
+
+        # Remaining difference x - y sits at index (x - y) + max_remaining
+        diff = np.zeros((n * minutes, 2 * size - 1))
+        total = np.zeros((n * minutes, 2 * size - 1))
+        for x in range(size):
+            diff[:, x:x + size] += flat_home[:, x, None] * flat_away[:, ::-1]
+            total[:, x:x + size] += flat_home[:, x, None] * flat_away
+
+        remaining = flat_home[:, :, None] * flat_away[:, None, :]
+        top_idx, top_probs = engine.top_scorelines(remaining, self.top_k)
+        return {
+            "home_pmf": home_pmf,
+            "away_pmf": away_pmf,
+            "diff_cdf": np.cumsum(diff, axis=1).reshape(n, minutes, -1),
+            "total_cdf": np.cumsum(total, axis=1).reshape(n, minutes, -1),
+            "top_home": (top_idx // size).astype(np.int8).reshape(n, minutes, -1),
+            "top_away": (top_idx % size).astype(np.int8).reshape(n, minutes, -1),
+            "top_probs": top_probs.reshape(n, minutes, -1),
+        }
+
+    def reprice(self, matches, minutes, home_goals, away_goals):
+        """Returns every market for matches in the given states as arrays.
+
+        Keys are "1x2" (N, 3), "over_under" {"Over x.5"/"Under x.5": (N,)}, "gg", "ng",
+        and the most likely final scores as "top_home_goals", "top_away_goals" and
+        "top_probs" (N, top_k). Minutes past full time count as full time.
+        """
+        matches = np.asarray(matches, dtype=np.intp)
+        rows = np.clip(np.asarray(minutes, dtype=np.intp), 0, len(self.share) - 1)
+        home_goals = np.asarray(home_goals, dtype=np.intp)
+        away_goals = np.asarray(away_goals, dtype=np.intp)
+        last = 2 * self.max_remaining
+
+        # Home wins when the remaining difference beats the current deficit (away - home)
+        diff_cdf = self.diff_cdf[matches, rows]
+        deficit = away_goals - home_goals + self.max_remaining
+        index = np.arange(len(matches))
+        at_most = np.where(deficit >= 0, diff_cdf[index, np.clip(deficit, 0, last)], 0.0)
+        at_most = np.where(deficit > last, 1.0, at_most)
+        below = np.where(deficit >= 1, diff_cdf[index, np.clip(deficit - 1, 0, last)], 0.0)
+        below = np.where(deficit - 1 > last, 1.0, below)
+        match_odds = np.stack([1 - at_most, at_most - below, below], axis=1)
+
+        total_cdf = self.total_cdf[matches, rows]
+        scored = home_goals + away_goals
+        over_under = {}
+        for line in self.ou_lines:
+            needed = int(np.floor(line)) - scored  # Over needs more than this many more goals
+            under = np.where(needed >= 0, total_cdf[index, np.clip(needed, 0, last)], 0.0)
+            over_under[f"Over {line}"] = 1 - under
+            over_under[f"Under {line}"] = under
+
+        home_blank = np.where(home_goals > 0, 0.0, self.home_pmf[matches, rows, 0])
+        away_blank = np.where(away_goals > 0, 0.0, self.away_pmf[matches, rows, 0])
+        gg = (1 - home_blank) * (1 - away_blank)
+        return {
+            "1x2": match_odds,
+            "over_under": over_under,
+            "gg": gg,
+            "ng": 1 - gg,
+            "top_home_goals": self.top_home[matches, rows] + home_goals[:, None],
+            "top_away_goals": self.top_away[matches, rows] + away_goals[:, None],
+            "top_probs": self.top_probs[matches, rows],
+        }
+
+    def score_matrix(self, match, minute, home_goals, away_goals, max_goals=3):
+        """Returns the (max_goals + 1, max_goals + 1) final-score matrix with "max+" tail buckets."""
+        row = min(max(int(minute), 0), len(self.share) - 1)
+        remaining = np.outer(self.home_pmf[match, row], self.away_pmf[match, row])
+        final = np.zeros((max_goals + 1, max_goals + 1))
+        home = np.minimum(home_goals + np.arange(self.max_remaining + 1), max_goals)
+        away = np.minimum(away_goals + np.arange(self.max_remaining + 1), max_goals)
+        np.add.at(final, (home[:, None], away[None, :]), remaining)
+        return final
+
+
+def reprice(home_xg, away_xg, minute, home_goals, away_goals):
+    """Returns every market for one match in play; see LiveBook.reprice."""
+    book = LiveBook()
+    book.add_matches(home_xg, away_xg)
+    markets = book.reprice([0], [minute], [home_goals], [away_goals])
+    markets["matrix"] = book.score_matrix(0, minute, home_goals, away_goals)
+    return markets
+
+
+# Simulated feed and replay
+
+
+def simulate_feed(n_matches=500, seed=0, kickoff_spread=30.0):
+    """Returns a time-ordered list of feed events for n_matches simulated matches.
+
+    Each match has a "kickoff" event with its expected goals, then a "minute" event per
+    minute and a "goal" event per goal, carrying the score after it. "t" is the match
+    clock in minutes since the first kickoff.
+    """
+    rng = np.random.default_rng(seed)
+    home_xg = rng.uniform(0.6, 2.4, n_matches)
+    away_xg = rng.uniform(0.4, 2.0, n_matches)
+    kickoff = np.sort(rng.uniform(0, kickoff_spread, n_matches))
+    per_minute = -np.diff(REMAINING_SHARE)
+    home_goals = rng.poisson(home_xg[:, None] * per_minute)
+    away_goals = rng.poisson(away_xg[:, None] * per_minute)
+
+    events = []
+    for match in range(n_matches):
+        t0 = float(kickoff[match])
+        events.append({"t": t0, "match": match, "kind": "kickoff",
+                       "home_xg": round(float(home_xg[match]), 3), "away_xg": round(float(away_xg[match]), 3)})
+        home = away = 0
+        for minute in range(1, MINUTES + 1):
+            for _ in range(home_goals[match, minute - 1]):
+                home += 1
+                events.append({"t": t0 + minute - 0.5, "match": match, "kind": "goal", "minute": minute - 1,
+                               "home": home, "away": away})
+            for _ in range(away_goals[match, minute - 1]):
+                away += 1
+                events.append({"t": t0 + minute - 0.5, "match": match, "kind": "goal", "minute": minute - 1,
+                               "home": home, "away": away})
+            events.append({"t": t0 + minute, "match": match, "kind": "minute", "minute": minute,
+                           "home": home, "away": away})
+    events.sort(key=lambda event: event["t"])
+    return events
+
+
+def replay(lines, book=None):
+    """Feeds JSON-lines events through a LiveBook and returns latency statistics.
+
+    Latency is per event, from the raw line to repriced markets, JSON parsing included.
+    """
+    book = book or LiveBook()
+    ids = {}
+    latencies = []
+    build_seconds = 0.0
+    for line in lines:
+        start = time.perf_counter()
+        event = json.loads(line)
+        if event["kind"] == "kickoff":
+            ids[event["match"]] = int(book.add_matches(event["home_xg"], event["away_xg"])[0])
+            build_seconds += time.perf_counter() - start
+            continue
+        book.reprice([ids[event["match"]]], [event["minute"]], [event["home"]], [event["away"]])
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies)
+    return {
+        "matches": len(ids),
+        "events": len(latencies),
+        "events_per_second": len(latencies) / latencies.sum() if len(latencies) else None,
+        "build_ms_per_match": build_seconds / len(ids) * 1000 if ids else None,
+        **{f"p{q}_us": float(np.percentile(latencies, q) * 1e6) if len(latencies) else None for q in (50, 90, 99)},
+        "max_us": float(latencies.max() * 1e6) if len(latencies) else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate or replay in-play event feeds.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    simulate = commands.add_parser("simulate", help="write a simulated feed as JSON lines")
+    simulate.add_argument("output")
+    simulate.add_argument("--matches", type=int, default=500)
+    simulate.add_argument("--seed", type=int, default=0)
+    replay_parser = commands.add_parser("replay", help="replay a recorded feed and report latency")
+    replay_parser.add_argument("input")
+    args = parser.parse_args(argv)
+
+    if args.command == "simulate":
+        events = simulate_feed(args.matches, args.seed)
+        with open(args.output, "w") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+        print(f"Wrote {len(events)} events for {args.matches} matches", file=sys.stderr)
+    else:
+        engine.score_matrix(1.0, 1.0)  # Warm up the model before timing
+        with open(args.input) as f:
+            print(json.dumps(replay(f), indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
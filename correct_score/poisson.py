@@ -0,0 +1,49 @@
+# Poisson terms in plain NumPy
+#
+# The model only ever needs P(X = k) for small k, so there is no need to load
+# scipy.stats for it. The PMF follows the recurrence P(0) = exp(-lam),
+# P(k) = P(k - 1) * lam / k, evaluated for every lambda at once with cumprod.
+import numpy as np
+
+# Smallest tail probability truncation() accepts; 1 - cdf is only good to about 1e-15
+MIN_EPSILON = 1e-12
+
+
+def pmf(expected_goals, max_goals):
+    """Returns an (N, max_goals + 1) array of P(X = k) for k = 0..max_goals."""
+    lam = np.atleast_1d(np.asarray(expected_goals, dtype=float))
+    ratios = np.empty((lam.shape[0], max_goals + 1))
+    ratios[:, 0] = np.exp(-lam)
+    ratios[:, 1:] = lam[:, None] / np.arange(1, max_goals + 1)
+    return np.cumprod(ratios, axis=1)
+
+
+def cdf(expected_goals, max_goals):
+    """Returns an (N, max_goals + 1) array of P(X <= k) for k = 0..max_goals."""
+    return np.cumsum(pmf(expected_goals, max_goals), axis=1)
+
+
+def truncation(expected_goals, epsilon):
+    """Returns the smallest k per lambda with P(X > k) < epsilon.
+
+    Lambdas that are NaN, infinite or negative (a blank input row, say) get 0 and don't
+    affect the others. Raises ValueError when epsilon is too small for 1 - cdf to resolve
+    in double precision, or when a lambda is too large for its pmf to be represented at all.
+    """
+    if not MIN_EPSILON <= epsilon < 1:
+        raise ValueError(f"epsilon must be in [{MIN_EPSILON:g}, 1), got {epsilon!r}")
+    lam = np.atleast_1d(np.asarray(expected_goals, dtype=float))
+    result = np.zeros(lam.shape[0], dtype=np.intp)
+    valid = np.isfinite(lam) & (lam >= 0)
+    if not valid.any():
+        return result
+    lam = lam[valid]
+    # Far enough into the tail for the largest lambda; the cdf is then searched row by row
+    peak = float(lam.max())
+    limit = int(peak + 12 * np.sqrt(peak) + 12)
+    reached = cdf(lam, limit) > 1 - epsilon
+    found = reached.any(axis=1)
+    if not found.all():  # exp(-lam) underflows to 0 from about lam = 745, so the cdf never gets there
+        raise ValueError(f"Cannot truncate the goal distribution for expected goals {lam[~found][0]:g}")
+    result[valid] = np.argmax(reached, axis=1)
+    return result
@@ -0,0 +1,258 @@
+# Opt-in per-stage instrumentation for the model pipeline
+#
+# The pipeline marks its stages (expected goals, score matrix, market aggregation,
+# HT/FT, value scan and render) with @staged(name) or `with stage(name)`. Outside a
+# recorded run these are a context-variable lookup and nothing else. Inside one, each
+# stage adds up its calls, wall time and net allocated blocks; with memory=True it also
+# tracks traced bytes and peak memory through tracemalloc, and with cprofile=True the
+# whole run is captured by cProfile. Stages nest: a stage's time and allocations exclude
+# the stages it calls, and whatever no stage claims is booked to the run's root stage.
+#
+# Memory counters are process-wide: allocated blocks include whatever other threads
+# allocate meanwhile, and tracemalloc's peak has one reset for the whole process. So
+# only one profile at a time tracks memory; a profile started while another holds it
+# runs with memory=False (check memory_unavailable).
+#
+#   with profiling.record(memory=True) as profile:
+#       markets = engine.price_markets_adaptive(home_xg, away_xg)
+#   print(profile.to_prometheus())
+import contextlib
+import contextvars
+import functools
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+STAGES = ("expected_goals", "score_matrix", "markets", "ht_ft", "value_scan", "render")
+DEFAULT_ROOT = "other"
+
+_active = contextvars.ContextVar("correct_score_profile", default=None)
+_NOOP = contextlib.nullcontext()
+# Held by the one profile tracking memory
+_memory_lock = threading.Lock()
+
+# Prometheus metric -> (record field, type, help)
+_METRICS = {
+    "correct_score_stage_calls_total": ("calls", "counter", "Times each pipeline stage ran."),
+    "correct_score_stage_seconds_total": (
+        "seconds", "counter", "Wall time in each pipeline stage, excluding nested stages.",
+    ),
+    "correct_score_stage_allocated_blocks": (
+        "allocated_blocks", "gauge", "Net Python memory blocks allocated process-wide during each stage.",
+    ),
+    "correct_score_stage_allocated_bytes": (
+        "allocated_bytes", "gauge", "Net traced bytes allocated by each stage (tracemalloc runs only).",
+    ),
+    "correct_score_stage_peak_bytes": (
+        "peak_bytes", "gauge", "Largest traced memory rise during one call of each stage (tracemalloc runs only).",
+    ),
+}
+
+
+class _Frame:
+    __slots__ = ("name", "start", "blocks", "traced", "peak", "child_seconds", "child_blocks", "child_traced")
+
+    def __init__(self, name, memory):
+        self.name = name
+        self.child_seconds = 0.0
+        self.child_blocks = 0
+        self.child_traced = 0
+        self.blocks = sys.getallocatedblocks()
+        self.traced = self.peak = tracemalloc.get_traced_memory()[0] if memory else 0
+        self.start = time.perf_counter()
+
+
+class StageProfile:
+    """Per-stage calls, self time and allocations for one recorded run."""
+
+    def __init__(self, memory=False, cprofile=False, root=DEFAULT_ROOT):
+        self.memory = memory
+        self.root = root
+        self.stats = {}
+        self.cprofile = None
+        self._cprofile = cprofile
+        self._stack = []
+        self._token = None
+        self._started_tracing = False
+        self._holds_memory = False
+        self.memory_unavailable = False
+        self.seconds = None
+
+    def _enter(self, name):
+        if self.memory and self._stack:
+            # Fold the parent's peak so far in before the child resets it
+            parent = self._stack[-1]
+            parent.peak = max(parent.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stack.append(_Frame(name, self.memory))
+
+    def _exit(self):
+        end = time.perf_counter()
+        blocks = sys.getallocatedblocks()
+        frame = self._stack.pop()
+        seconds = end - frame.start
+        allocated = blocks - frame.blocks
+        stats = self.stats.get(frame.name)
+        if stats is None:
+            stats = self.stats[frame.name] = {"calls": 0, "seconds": 0.0, "allocated_blocks": 0}
+            if self.memory:
+                stats.update(allocated_bytes=0, peak_bytes=0)
+        stats["calls"] += 1
+        stats["seconds"] += seconds - frame.child_seconds
+        stats["allocated_blocks"] += allocated - frame.child_blocks
+        traced = 0
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            frame.peak = max(frame.peak, peak)
+            traced = current - frame.traced
+            stats["allocated_bytes"] += traced - frame.child_traced
+            stats["peak_bytes"] = max(stats["peak_bytes"], frame.peak - frame.traced)
+            tracemalloc.reset_peak()
+        if self._stack:
+            parent = self._stack[-1]
+            parent.child_seconds += seconds
+            parent.child_blocks += allocated
+            parent.child_traced += traced
+            if self.memory:
+                parent.peak = max(parent.peak, frame.peak)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Times the block as one call of the named stage."""
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def start(self):
+        """Makes this the active profile for the current context and starts the root stage."""
+        if self.memory:
+            self._holds_memory = _memory_lock.acquire(blocking=False)
+            if not self._holds_memory:  # Another profile is tracking memory; its peaks would be reset under it
+                self.memory = False
+                self.memory_unavailable = True
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self._cprofile:
+            import cProfile
+
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self._token = _active.set(self)
+        self._enter(self.root)
+        return self
+
+    def stop(self):
+        """Closes any open stages and the root stage, and deactivates the profile."""
+        started = self._stack[0].start if self._stack else None
+        while self._stack:
+            self._exit()
+        if started is not None:
+            self.seconds = time.perf_counter() - started
+        if self._token is not None:
+            try:
+                _active.reset(self._token)
+            except ValueError:  # Stopped from another context, e.g. a later Streamlit rerun
+                _active.set(None)
+            self._token = None
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if self._holds_memory:
+            _memory_lock.release()
+            self._holds_memory = False
+        return self
+
+    def records(self):
+        """Returns one dict per stage: the pipeline stages in order, then any others."""
+        names = [name for name in STAGES if name in self.stats]
+        names += [name for name in self.stats if name not in STAGES]
+        return [{"stage": name, **self.stats[name]} for name in names]
+
+    def to_json_lines(self, **labels):
+        """Returns one JSON object per stage and line, stamped with the time and any labels."""
+        timestamp = time.time()
+        return "".join(
+            json.dumps({"timestamp": timestamp, **labels, **record}) + "\n" for record in self.records()
+        )
+
+    def to_prometheus(self, **labels):
+        """Returns the stage records in the Prometheus text exposition format."""
+        extra = "".join(f',{key}="{_escape(value)}"' for key, value in sorted(labels.items()))
+        lines = []
+        for metric, (field, kind, help_text) in _METRICS.items():
+            records = [record for record in self.records() if field in record]
+            if not records:
+                continue
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            lines += [f'{metric}{{stage="{_escape(record["stage"])}"{extra}}} {record[field]}' for record in records]
+        return "\n".join(lines) + "\n"
+
+    def cprofile_text(self, limit=30, sort="cumulative"):
+        """Returns cProfile's top functions for the run as text, or "" if it wasn't captured."""
+        if self.cprofile is None:
+            return ""
+        import io
+        import pstats
+
+        out = io.StringIO()
+        pstats.Stats(self.cprofile, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def write(self, path, fmt="jsonl", **labels):
+        """Appends JSON lines to path, or writes Prometheus text with fmt="prometheus"."""
+        if fmt == "prometheus":
+            with open(path, "w") as out:
+                out.write(self.to_prometheus(**labels))
+        elif fmt == "jsonl":
+            with open(path, "a") as out:
+                out.write(self.to_json_lines(**labels))
+        else:
+            raise ValueError(f"Unknown profile format {fmt!r}")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def active():
+    """Returns the StageProfile recording in this context, or None."""
+    return _active.get()
+
+
+def stage(name):
+    """Returns a context manager timing the block as the named stage when a run is recorded."""
+    profile = _active.get()
+    return _NOOP if profile is None else profile.stage(name)
+
+
+def staged(name):
+    """Decorator recording every call of the function as the named stage."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _active.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            with profile.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+@contextlib.contextmanager
+def record(memory=False, cprofile=False, root=DEFAULT_ROOT):
+    """Records every stage run inside the block and yields the StageProfile."""
+    profile = StageProfile(memory=memory, cprofile=cprofile, root=root).start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
@@ -0,0 +1,109 @@
+# Recommendation rules shown in the app
+#
+# These are the app's betting rules as plain functions so the page, the CLI and any
+# replay of past fixtures all apply exactly the same logic. Scorelines are "i-j"
+# labels and probabilities are fractions unless a function says otherwise.
+import numpy as np
+
+
+def is_value(probability, odds):
+    """A bet has value when probability * odds > 1; works on scalars and arrays."""
+    return np.asarray(probability) * np.asarray(odds) > 1
+
+
+def over_under_pick(over_2_5):
+    """Returns "Over" when Over 2.5 is more likely than not, else "Under"."""
+    return np.where(np.asarray(over_2_5) > 0.5, "Over", "Under")
+
+
+def gg_pick(gg):
+    """Returns "GG" when both teams scoring is more likely than not, else "NG"."""
+    return np.where(np.asarray(gg) > 0.5, "GG", "NG")
+
+
+def best_correct_score(scoreline_probs, threshold=0.052):
+    """Returns the most likely (scoreline, prob) at or above threshold, else (None, None)."""
+    filtered_scores = {
+        scoreline: prob for scoreline, prob in scoreline_probs.items() if prob >= threshold
+    }
+    if filtered_scores:
+        best_scoreline = max(filtered_scores, key=filtered_scores.get)
+        return best_scoreline, filtered_scores[best_scoreline]
+    return None, None
+
+
+def _goals(scoreline):
+    home, away = scoreline.split("-")
+    return int(home), int(away)
+
+
+def combined_recommendation(over_2_5, under_2_5, gg, ng, sorted_scorelines):
+    """Returns (combined bet, correct score) from the Over/Under 2.5 and GG/NG calls.
+
+    sorted_scorelines is a list of (scoreline, prob), most likely first. The correct
+    score is the most likely scoreline consistent with the combined bet.
+    """
+    if over_2_5 > 0.5 and gg > 0.5:
+        score = next((s for s, _ in sorted_scorelines if _goals(s)[0] > 1 and _goals(s)[1] > 0), "2-1")
+        return "Over 2.5 & GG", score
+    if under_2_5 > 0.5 and ng > 0.5:
+        score = next(
+            (s for s, _ in sorted_scorelines if sum(_goals(s)) <= 2 and 0 in _goals(s)), "1-0"
+        )
+        return "Under 2.5 & NG", score
+    return "No Clear Combined Option", sorted_scorelines[0][0]
+
+
+def combined_picks(matrix, over_2_5, under_2_5, gg, ng):
+    """Vectorized combined_recommendation() over an (N, G, G) slate.
+
+    Returns (combined bet labels, flat scoreline indices into the (G, G) grid). Ties
+    between equally likely scorelines go to the lower index.
+    """
+    matrix = np.asarray(matrix)
+    size = matrix.shape[-1]
+    home, away = np.meshgrid(np.arange(size), np.arange(size), indexing="ij")
+    flat = matrix.reshape(len(matrix), -1)
+
+    def most_likely(allowed, fallback):
+        masked = np.where(allowed.ravel(), flat, -1.0)
+        best = masked.argmax(axis=1)
+        return np.where(masked[np.arange(len(flat)), best] >= 0, best, fallback)
+
+    over_gg = (np.asarray(over_2_5) > 0.5) & (np.asarray(gg) > 0.5)
+    under_ng = ~over_gg & (np.asarray(under_2_5) > 0.5) & (np.asarray(ng) > 0.5)
+    labels = np.where(over_gg, "Over 2.5 & GG", np.where(under_ng, "Under 2.5 & NG", "No Clear Combined Option"))
+    scores = np.where(
+        over_gg,
+        most_likely((home > 1) & (away > 0), 2 * size + 1),
+        np.where(
+            under_ng,
+            most_likely((home + away <= 2) & ((home == 0) | (away == 0)), size),
+            flat.argmax(axis=1),
+        ),
+    )
+    return labels, scores
+
+
+def adjust_scorelines(scoreline_probs, scaling_factor):
+    """Scales scoreline probabilities and renormalizes them to percentages summing to 100."""
+    adjusted = {score: round(prob * scaling_factor, 2) for score, prob in scoreline_probs.items()}
+    total = sum(adjusted.values())
+    return {score: round(prob / total * 100, 2) for score, prob in adjusted.items()}
+
+
+def top_ev_scorelines(scoreline_probs, odds_for_scoreline, k=7):
+    """Returns up to k (scoreline, prob, odds, ev) tuples with the highest prob * odds."""
+    scoreline_ev = [
+        (scoreline, prob, odds_for_scoreline[scoreline], prob * odds_for_scoreline[scoreline])
+        for scoreline, prob in scoreline_probs.items()
+        if scoreline in odds_for_scoreline
+    ]
+    return sorted(scoreline_ev, key=lambda x: x[3], reverse=True)[:k]
+
+
+def matrix_recommendation(scoreline_percentages, adjustment_factor=1.10):
+    """Returns (scoreline, adjusted percentage) for the top scoreline after normalizing to 100%."""
+    total = sum(scoreline_percentages.values())
+    scoreline = max(scoreline_percentages, key=scoreline_percentages.get)
+    return scoreline, scoreline_percentages[scoreline] / total * 100 * adjustment_factor
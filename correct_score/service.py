@@ -0,0 +1,546 @@
+# Local HTTP prediction service
+#
+# A small asyncio HTTP/1.1 server (standard library only) exposing the model to other
+# tools:
+#
+#   POST /matrix   scoreline matrices
+#   POST /markets  1x2, Over/Under, GG/NG and top scorelines
+#   POST /value    value bets (prob * odds > 1) for the odds sent with each fixture
+#   GET  /metrics  request counts, batch sizes, queue depth and p50/p90/p99 latency
+#   GET  /health
+#
+# A body is {"fixtures": [...]} or a single fixture object. A fixture gives home_xg and
+# away_xg, or the four team averages the app asks for; for /value it also carries
+# "odds": {"1": 2.5, "Over 2.5": 1.9, "1-0": 7.0, ...}. Each fixture is priced on its own
+# exact grid, as in the app; "max_goals": 3 in the body asks for the fixed grid with a
+# "3+" tail bucket instead.
+#
+# Requests arriving within a few milliseconds of each other are coalesced into one
+# vectorized engine call. Pending requests sit in a bounded queue; when it is full the
+# service answers 503 with Retry-After instead of queueing without limit.
+#
+#   python -m correct_score.service serve --port 8765
+#   python -m correct_score.service load --requests 20000 --concurrency 256
+import argparse
+import asyncio
+import bisect
+import concurrent.futures
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+
+from correct_score import engine, value
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+DEFAULT_BATCH_WINDOW = 0.002
+DEFAULT_MAX_BATCH = 8192
+DEFAULT_QUEUE_SIZE = 2048
+MAX_FIXTURES_PER_REQUEST = 10_000
+# Exact grids grow with expected goals (about 28 goals a side at 10), so larger values are refused
+MAX_EXPECTED_GOALS = 10.0
+MAX_BODY_BYTES = 16 * 2 ** 20
+STAT_FIELDS = ["home_goals_scored", "away_goals_conceded", "away_goals_scored", "home_goals_conceded"]
+
+# Latency bucket upper bounds in seconds, 20 per decade from 10us to 100s
+LATENCY_BUCKETS = np.geomspace(1e-5, 100, 141).tolist()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class LatencyHistogram:
+    """Fixed log-spaced buckets, so recording is O(log buckets) and memory is constant."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+
+    def percentile(self, q):
+        """Returns the upper bound of the bucket holding the q-th percentile, in seconds."""
+        if not self.total:
+            return None
+        rank = q / 100 * self.total
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return LATENCY_BUCKETS[min(bucket, len(LATENCY_BUCKETS) - 1)]
+        return LATENCY_BUCKETS[-1]
+
+    def snapshot(self):
+        return {
+            "count": self.total,
+            "mean_ms": self.sum / self.total * 1000 if self.total else None,
+            **{f"p{q}_ms": (self.percentile(q) or 0) * 1000 for q in (50, 90, 99)},
+        }
+
+
+def _market_names(max_goals, ou_lines=engine.DEFAULT_OU_LINES):
+    names = ["1", "X", "2"]
+    for line in ou_lines:
+        names += [f"Over {line}", f"Under {line}"]
+    return names + ["GG", "NG"] + engine.scoreline_labels(max_goals).tolist()
+
+
+def _is_scoreline(name):
+    home, _, away = name.partition("-")
+    return home.isdigit() and away.isdigit()
+
+
+def _market_probs(markets):
+    """Returns an (N, markets) array in _market_names() order."""
+    columns = [markets["1x2"]]
+    for name, probs in markets["over_under"].items():
+        columns.append(probs[:, None])
+    columns += [markets["gg"][:, None], markets["ng"][:, None], markets["matrix"].reshape(len(markets["gg"]), -1)]
+    return np.concatenate(columns, axis=1)
+
+
+def _request_rows(counts):
+    bounds = np.cumsum([0, *counts])
+    return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def _take_rows(markets, rows):
+    """Returns the markets dict (nested dicts of per-fixture arrays) restricted to rows."""
+    if isinstance(markets, dict):
+        return {key: _take_rows(item, rows) for key, item in markets.items()}
+    return markets[rows]
+
+
+def _price_fixed(home_xg, away_xg, counts, max_goals):
+    """Returns price_markets() output split into one dict per request of counts[i] fixtures."""
+    markets = engine.price_markets(home_xg, away_xg, max_goals=max_goals, top_k=5)
+    return [_take_rows(markets, rows) for rows in _request_rows(counts)]
+
+
+def _price_exact(home_xg, away_xg, counts):
+    """Returns price_markets_adaptive() output split per request, as _price_fixed().
+
+    Each request's exact grids are zero-padded into one "matrix" only as large as its own
+    largest grid, so a response never depends on the requests batched with it.
+    """
+    # Asian totals aren't served, and splitting their many arrays per request would dominate
+    markets = engine.price_markets_adaptive(
+        home_xg, away_xg, ou_lines=engine.DEFAULT_OU_LINES, asian_lines=(), top_k=5
+    )
+    groups = markets.pop("groups")
+    results = []
+    for rows in _request_rows(counts):
+        result = _take_rows(markets, rows)
+        size = int(result["max_goals"].max(initial=0)) + 1
+        matrix = np.zeros((rows.stop - rows.start, size, size))
+        for group_rows, group in groups:
+            first, last = np.searchsorted(group_rows, (rows.start, rows.stop))
+            if last > first:
+                matrix[group_rows[first:last] - rows.start, :group.shape[1], :group.shape[2]] = group[first:last]
+        result["matrix"] = matrix
+        results.append(result)
+    return results
+
+
+class _Batcher:
+    """Coalesces concurrent pricing requests for one grid (max_goals, or None for exact) into single engine calls."""
+
+    def __init__(self, max_goals, executor, window, max_batch, queue_size, metrics):
+        self.max_goals = max_goals
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue(queue_size)
+        self.metrics = metrics
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, home_xg, away_xg):
+        """Returns the markets for this request's fixtures."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((home_xg, away_xg, future))
+        except asyncio.QueueFull:
+            self.metrics["rejected"] += 1
+            raise HTTPError(503, "Service overloaded, retry later", {"Retry-After": "1"}) from None
+        return await future
+
+    def _price(self, home_xg, away_xg, counts):
+        if self.max_goals is None:
+            return _price_exact(home_xg, away_xg, counts)
+        return _price_fixed(home_xg, away_xg, counts, self.max_goals)
+
+    def _price_alone(self, pending):
+        """Prices each request on its own, so one that fails can't fail the others."""
+        for item_home, item_away, future in pending:
+            try:
+                markets = self._price(item_home, item_away, [len(item_home)])[0]
+            except Exception as exc:
+                markets, error = None, exc
+            else:
+                error = None
+            yield future, markets, error
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            fixtures = len(pending[0][0])
+            deadline = loop.time() + self.window
+            while fixtures < self.max_batch:
+                if self.queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        pending.append(await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    pending.append(self.queue.get_nowait())
+                fixtures += len(pending[-1][0])
+
+            home_xg = np.concatenate([item[0] for item in pending])
+            away_xg = np.concatenate([item[1] for item in pending])
+            counts = [len(item[0]) for item in pending]
+            try:
+                priced = await loop.run_in_executor(self.executor, self._price, home_xg, away_xg, counts)
+                outcomes = [(future, markets, None) for (*_, future), markets in zip(pending, priced)]
+            except Exception:  # Retry one by one so only the request that fails gets the error
+                outcomes = await loop.run_in_executor(self.executor, list, self._price_alone(pending))
+            self.metrics["batches"] += 1
+            self.metrics["batched_requests"] += len(pending)
+            self.metrics["fixtures"] += len(home_xg)
+            for future, markets, error in outcomes:
+                if future.done():  # The client may have disconnected
+                    continue
+                if error is None:
+                    future.set_result(markets)
+                else:
+                    future.set_exception(error)
+
+
+class PredictionService:
+    """The HTTP front end; call start() inside a running event loop."""
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, batch_window=DEFAULT_BATCH_WINDOW,
+                 max_batch=DEFAULT_MAX_BATCH, queue_size=DEFAULT_QUEUE_SIZE):
+        self.host = host
+        self.port = port
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.queue_size = queue_size
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.batchers = {}
+        self.metrics = {"rejected": 0, "batches": 0, "batched_requests": 0, "fixtures": 0, "connections": 0}
+        self.requests = {}
+        self.latency = {}
+        self.started = time.time()
+        self.server = None
+
+    async def start(self):
+        engine.score_matrix(1.0, 1.0)  # Warm up the model before the first request
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_BODY_BYTES)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for batcher in self.batchers.values():
+            batcher.task.cancel()
+        self.executor.shutdown(wait=False)
+
+    def _batcher(self, max_goals):
+        if max_goals not in self.batchers:
+            self.batchers[max_goals] = _Batcher(
+                max_goals, self.executor, self.batch_window, self.max_batch, self.queue_size, self.metrics
+            )
+        return self.batchers[max_goals]
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        self.metrics["connections"] += 1
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                start = time.perf_counter()
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = dict(
+                    (name.strip().lower(), item.strip())
+                    for name, _, item in (line.partition(":") for line in header_lines if line)
+                )
+                try:
+                    method, path, version = request_line.split(" ", 2)
+                    length = int(headers.get("content-length", 0))
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:  # Also a non-numeric or negative Content-Length, before reading any body
+                    self._respond(writer, 400, {"error": "Malformed request"}, {}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    status, body, extra = 413, {"error": "Request body too large"}, {}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                    status, body, extra = await self._dispatch(method, path.split("?")[0], body)
+                self._respond(writer, status, body, extra, keep_alive)
+                await writer.drain()
+                key = f"{method} {path.split('?')[0]} {status}"
+                self.requests[key] = self.requests.get(key, 0) + 1
+                self.latency.setdefault(path.split("?")[0], LatencyHistogram()).record(time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, writer, status, body, headers, keep_alive):
+        payload = json.dumps(body, separators=(",", ":")).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                  413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}[status]
+        lines = [f"HTTP/1.1 {status} {reason}", "Content-Type: application/json",
+                 f"Content-Length: {len(payload)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{name}: {item}" for name, item in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + payload)
+
+    async def _dispatch(self, method, path, body):
+        routes = {
+            "/matrix": ("POST", self._matrix),
+            "/markets": ("POST", self._markets),
+            "/value": ("POST", self._value),
+            "/metrics": ("GET", self._metrics),
+            "/health": ("GET", self._health),
+        }
+        if path not in routes:
+            return 404, {"error": f"No endpoint {path}"}, {}
+        expected, handler = routes[path]
+        if method != expected:
+            return 405, {"error": f"Use {expected} for {path}"}, {"Allow": expected}
+        try:
+            if method == "GET":
+                return 200, handler(), {}
+            request = json.loads(body or b"{}")
+            fixtures = request.get("fixtures", [request]) if isinstance(request, dict) else request
+            max_goals = request.get("max_goals") if isinstance(request, dict) else None
+            if not isinstance(fixtures, list) or not fixtures:
+                raise HTTPError(400, "Expected a fixture object or a non-empty 'fixtures' list")
+            if len(fixtures) > MAX_FIXTURES_PER_REQUEST:
+                raise HTTPError(413, f"At most {MAX_FIXTURES_PER_REQUEST} fixtures per request")
+            if max_goals is not None:
+                max_goals = int(max_goals)
+                if not 1 <= max_goals <= 15:
+                    raise HTTPError(400, "max_goals must be between 1 and 15")
+            home_xg, away_xg = _expected_goals(fixtures)
+            markets = await self._batcher(max_goals).submit(home_xg, away_xg)
+            return 200, {"fixtures": handler(fixtures, markets, max_goals)}, {}
+        except HTTPError as exc:
+            return exc.status, {"error": str(exc)}, exc.headers
+        except (ValueError, TypeError, KeyError, AttributeError, OverflowError) as exc:
+            return 400, {"error": f"Invalid request: {exc}"}, {}
+        except Exception:  # Answer the client and keep the connection; the traceback goes to the log
+            logger.exception("Failed to handle %s %s", method, path)
+            return 500, {"error": "Internal server error"}, {}
+
+    # Endpoints
+
+    def _matrix(self, fixtures, markets, max_goals):
+        if max_goals is not None:
+            return [{"matrix": matrix} for matrix in markets["matrix"].tolist()]
+        # Exact grids are trimmed back from the request's padding to the fixture's own size
+        sizes = markets["max_goals"] + 1
+        return [{"matrix": matrix[:size, :size].tolist()} for matrix, size in zip(markets["matrix"], sizes)]
+
+    def _markets(self, fixtures, markets, max_goals):
+        match = markets["1x2"].tolist()
+        over_under = {name: probs.tolist() for name, probs in markets["over_under"].items()}
+        gg, ng = markets["gg"].tolist(), markets["ng"].tolist()
+        top = markets["top_scorelines"].tolist()
+        top_probs = markets["top_probs"].tolist()
+        return [
+            {
+                "1x2": dict(zip(("1", "X", "2"), match[i])),
+                "over_under": {name: probs[i] for name, probs in over_under.items()},
+                "gg": gg[i],
+                "ng": ng[i],
+                "top_scorelines": {label: prob for label, prob in zip(top[i], top_probs[i]) if label},
+            }
+            for i in range(len(match))
+        ]
+
+    def _value(self, fixtures, markets, max_goals):
+        names = _market_names(markets["matrix"].shape[-1] - 1)
+        index = {name: column for column, name in enumerate(names)}
+        probs = _market_probs(markets)
+        odds = np.full(probs.shape, np.nan)
+        for row, fixture in enumerate(fixtures):
+            for name, price in (fixture.get("odds") or {}).items():
+                if name not in index:
+                    if max_goals is None and _is_scoreline(name):
+                        continue  # Beyond every exact grid in the request, so less likely than epsilon
+                    raise HTTPError(400, f"Unknown market {name!r}")
+                odds[row, index[name]] = float(price)
+        ev, edge = value.expected_value(probs, odds)
+        results = []
+        for row in range(len(fixtures)):
+            found = np.flatnonzero(ev[row] > 1)
+            found = found[np.argsort(-ev[row, found], kind="stable")]
+            results.append({
+                "value_bets": [
+                    {"market": names[column], "prob": float(probs[row, column]), "odds": float(odds[row, column]),
+                     "ev": float(ev[row, column]), "edge": float(edge[row, column])}
+                    for column in found
+                ]
+            })
+        return results
+
+    def _metrics(self):
+        batches = self.metrics["batches"]
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "requests": self.requests,
+            **self.metrics,
+            "mean_batch_requests": self.metrics["batched_requests"] / batches if batches else None,
+            "mean_batch_fixtures": self.metrics["fixtures"] / batches if batches else None,
+            "queue_depth": {
+                "exact" if goals is None else str(goals): batcher.queue.qsize() for goals, batcher in self.batchers.items()
+            },
+            "latency": {path: histogram.snapshot() for path, histogram in self.latency.items()},
+        }
+
+    def _health(self):
+        return {"status": "ok"}
+
+
+def _expected_goals(fixtures):
+    """Returns (home_xg, away_xg) arrays from fixtures giving xG or the app's team averages."""
+    if all("home_xg" in fixture for fixture in fixtures):
+        home_xg = np.array([fixture["home_xg"] for fixture in fixtures], dtype=float)
+        away_xg = np.array([fixture["away_xg"] for fixture in fixtures], dtype=float)
+    else:
+        stats = np.array([[fixture[field] for field in STAT_FIELDS] for fixture in fixtures], dtype=float)
+        home_xg, away_xg = engine.expected_goals(*stats.T)
+    for xg in (home_xg, away_xg):
+        if not (np.isfinite(xg) & (xg >= 0) & (xg <= MAX_EXPECTED_GOALS)).all():
+            raise HTTPError(400, f"Expected goals must be between 0 and {MAX_EXPECTED_GOALS:g}")
+    return home_xg, away_xg
+
+
+# Load generator
+
+
+async def _client(host, port, path, payloads, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_BODY_BYTES)
+    try:
+        for payload in payloads:
+            request = (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                       f"Content-Length: {len(payload)}\r\n\r\n").encode() + payload
+            start = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            length = next(int(line.split(":")[1]) for line in lines if line.lower().startswith("content-length"))
+            await reader.readexactly(length)
+            latencies.record(time.perf_counter() - start)
+            status = int(lines[0].split(" ")[1])
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, requests=10_000, concurrency=256, fixtures_per_request=1, path="/markets", seed=0):
+    """Fires requests over `concurrency` keep-alive connections and returns throughput and latency."""
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for _ in range(requests):
+        fixtures = [
+            {"home_xg": round(float(h), 3), "away_xg": round(float(a), 3),
+             "odds": {"1": 2.5, "X": 3.3, "2": 2.9, "Over 2.5": 1.9, "GG": 1.8, "1-1": 6.5}}
+            for h, a in zip(rng.uniform(0.5, 2.5, fixtures_per_request), rng.uniform(0.4, 2.0, fixtures_per_request))
+        ]
+        payloads.append(json.dumps({"fixtures": fixtures}).encode())
+    latencies, statuses = LatencyHistogram(), {}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, path, payloads[i::concurrency], latencies, statuses)
+        for i in range(min(concurrency, requests))
+    ))
+    seconds = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "seconds": seconds,
+        "requests_per_second": requests / seconds,
+        "fixtures_per_second": requests * fixtures_per_request / seconds,
+        "statuses": statuses,
+        "latency": latencies.snapshot(),
+    }
+
+
+async def _serve(args):
+    service = await PredictionService(args.host, args.port, args.batch_window / 1000, args.max_batch,
+                                      args.queue_size).start()
+    print(f"Serving on http://{service.host}:{service.port}", file=sys.stderr)
+    async with service.server:
+        await service.server.serve_forever()
+
+
+async def _load(args):
+    service = None
+    host, port = args.host, args.port
+    if not args.external:  # Fully offline: run the service in this process on a free port
+        service = await PredictionService(args.host, 0, args.batch_window / 1000, args.max_batch,
+                                          args.queue_size).start()
+        port = service.port
+    try:
+        result = await load_test(host, port, args.requests, args.concurrency, args.fixtures, args.path)
+        if service is not None:
+            result["server"] = service._metrics()
+    finally:
+        if service is not None:
+            await service.close()
+    print(json.dumps(result, indent=1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the model over HTTP or load-test the service.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the service")
+    load = commands.add_parser("load", help="run the load generator")
+    for command in (serve, load):
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=DEFAULT_PORT)
+        command.add_argument("--batch-window", type=float, default=DEFAULT_BATCH_WINDOW * 1000,
+                             help="milliseconds to wait for more requests before pricing a batch")
+        command.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="fixtures per engine call")
+        command.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                             help="pending requests before the service answers 503")
+    load.add_argument("--external", action="store_true", help="load an already running service at --host/--port")
+    load.add_argument("--requests", type=int, default=10_000)
+    load.add_argument("--concurrency", type=int, default=256, help="keep-alive connections")
+    load.add_argument("--fixtures", type=int, default=1, help="fixtures per request")
+    load.add_argument("--path", default="/markets", choices=["/matrix", "/markets", "/value"])
+    args = parser.parse_args(argv)
+
+    asyncio.run(_serve(args) if args.command == "serve" else _load(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# Monte Carlo simulation of whole slates
+#
+# Each simulation draws one scoreline per fixture from its (G, G) score matrix, so
+# a slate simulation is a joint outcome of every fixture and every bet on it. Legs
+# are bets defined as 0/1 masks over a fixture's score grid (see market_mask()), and
+# together they form one accumulator as well as a set of singles.
+#
+# Simulations are split into a fixed number of shards, each with its own
+# numpy Generator spawned from one SeedSequence, so results are reproducible for a
+# seed whatever the number of worker processes. Shards run batch by batch and only
+# keep running totals and histograms, so memory stays flat as n_sims grows.
+import os
+import time
+
+import numpy as np
+
+DEFAULT_SHARDS = 64
+# Simulated matches (simulations x fixtures) held in memory at once per shard
+DEFAULT_BATCH_SIZE = 2_000_000
+
+
+def market_mask(market, max_goals):
+    """Returns a (G, G) 0/1 mask of the scorelines that win a market.
+
+    market is "1", "X", "2", "GG", "NG", "Over x.5", "Under x.5" or a scoreline "i-j".
+    """
+    goals = np.arange(max_goals + 1)
+    home, away = np.meshgrid(goals, goals, indexing="ij")
+    total = home + away
+    if market == "1":
+        return home > away
+    if market == "X":
+        return home == away
+    if market == "2":
+        return home < away
+    if market == "GG":
+        return (home > 0) & (away > 0)
+    if market == "NG":
+        return (home == 0) | (away == 0)
+    if market.startswith("Over "):
+        return total > float(market[len("Over "):])
+    if market.startswith("Under "):
+        return total < float(market[len("Under "):])
+    i, j = map(int, market.split("-"))
+    return (home == i) & (away == j)
+
+
+def _sample_scores(rng, offset_cdf, n_fixtures, n):
+    """Returns (n, N) flat scoreline indices by inverse-CDF sampling.
+
+    offset_cdf is every fixture's CDF shifted by its fixture index and laid end to
+    end, which keeps it sorted, so one searchsorted call samples all fixtures at once.
+    """
+    offsets = np.arange(n_fixtures)
+    u = rng.random((n, n_fixtures)) + offsets
+    cells_per_fixture = len(offset_cdf) // n_fixtures
+    cells = np.searchsorted(offset_cdf, u, side="right") - offsets * cells_per_fixture
+    return np.minimum(cells, cells_per_fixture - 1)  # Guards u + offset rounding up to the next fixture
+
+
+def _run_shard(matrices, legs, n_sims, seed, batch_size, rounds, bankroll):
+    """Simulates n_sims slates with one Generator and returns running totals."""
+    rng = np.random.default_rng(seed)
+    n_fixtures, size, _ = matrices.shape
+    flat = matrices.reshape(n_fixtures, -1)
+    cdf = np.cumsum(flat / flat.sum(axis=1, keepdims=True), axis=1)
+    cdf[:, -1] = 1.0
+    offset_cdf = (cdf + np.arange(n_fixtures)[:, None]).ravel()
+    goals_per_cell = (np.arange(size)[:, None] + np.arange(size)[None, :]).ravel()
+
+    fixture, masks, odds, stakes = legs
+    flat_masks = masks.reshape(len(fixture), size * size)
+    stats = {
+        "simulations": 0,
+        "total_goals": np.zeros(n_fixtures * (2 * size - 2) + 1, dtype=np.int64),
+        "leg_hits": np.zeros(len(fixture), dtype=np.int64),
+        "acca_hits": 0,
+        "pnl_sum": 0.0,
+        "pnl_sq_sum": 0.0,
+        "losing_rounds": 0,
+        "paths": 0,
+        "final_bankroll_sum": 0.0,
+        "max_drawdown_sum": 0.0,
+        "ruined_paths": 0,
+    }
+
+    # Whole bankroll paths per batch so no path straddles two batches
+    paths_per_batch = max(1, batch_size // (rounds * n_fixtures))
+    remaining = n_sims // rounds
+    while remaining > 0:
+        paths = min(paths_per_batch, remaining)
+        n = paths * rounds
+        cells = _sample_scores(rng, offset_cdf, n_fixtures, n)
+
+        totals = goals_per_cell[cells].sum(axis=1)
+        stats["total_goals"] += np.bincount(totals, minlength=len(stats["total_goals"]))
+
+        if len(fixture):
+            hits = np.take_along_axis(flat_masks[None, :, :], cells[:, fixture, None], axis=2)[:, :, 0]
+            stats["leg_hits"] += hits.sum(axis=0)
+            stats["acca_hits"] += int(hits.all(axis=1).sum())
+
+            pnl = np.where(hits, stakes * (odds - 1), -stakes).sum(axis=1)
+            stats["pnl_sum"] += float(pnl.sum())
+            stats["pnl_sq_sum"] += float((pnl ** 2).sum())
+            stats["losing_rounds"] += int((pnl < 0).sum())
+
+            path = bankroll + np.cumsum(pnl.reshape(paths, rounds), axis=1)
+            peak = np.maximum.accumulate(np.maximum(path, bankroll), axis=1)
+            stats["final_bankroll_sum"] += float(path[:, -1].sum())
+            stats["max_drawdown_sum"] += float((peak - path).max(axis=1).sum())
+            stats["ruined_paths"] += int((path <= 0).any(axis=1).sum())
+        stats["paths"] += paths
+        stats["simulations"] += n
+        remaining -= paths
+    return stats
+
+
+def _merge(results):
+    merged = results[0]
+    for result in results[1:]:
+        for key, value in result.items():
+            merged[key] = merged[key] + value
+    return merged
+
+
+def simulate_slate(matrices, legs=(), n_sims=1_000_000, seed=0, workers=None, shards=DEFAULT_SHARDS,
+                   batch_size=DEFAULT_BATCH_SIZE, rounds=1, bankroll=100.0):
+    """Simulates the slate n_sims times and returns aggregate statistics.
+
+    legs is a sequence of (fixture index, market, odds, stake) bets, with market as
+    accepted by market_mask(). Consecutive groups of `rounds` simulations form one
+    bankroll path starting at `bankroll`. workers=1 runs in-process; otherwise shards
+    are spread over a process pool. Raises ValueError if n_sims can't fill one path.
+    """
+    if rounds < 1 or n_sims < rounds:
+        raise ValueError(f"n_sims ({n_sims}) must be at least rounds ({rounds}), and rounds at least 1")
+    matrices = np.asarray(matrices, dtype=float)
+    size = matrices.shape[-1]
+    leg_arrays = (
+        np.array([leg[0] for leg in legs], dtype=np.intp),
+        np.array([market_mask(leg[1], size - 1) for leg in legs], dtype=bool).reshape(len(legs), size, size),
+        np.array([leg[2] for leg in legs], dtype=float),
+        np.array([leg[3] for leg in legs], dtype=float),
+    )
+
+    shards = max(1, min(shards, n_sims // rounds))
+    paths = n_sims // rounds
+    shard_paths = [paths // shards + (i < paths % shards) for i in range(shards)]
+    seeds = np.random.SeedSequence(seed).spawn(shards)
+    args = [
+        (matrices, leg_arrays, count * rounds, child, batch_size, rounds, bankroll)
+        for count, child in zip(shard_paths, seeds)
+    ]
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = [_run_shard(*arg) for arg in args]
+    else:
+        import concurrent.futures
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            results = list(pool.map(_run_shard, *zip(*args)))
+    seconds = time.perf_counter() - start
+
+    stats = _merge(results)
+    n = stats["simulations"]
+    pnl_mean = stats["pnl_sum"] / n
+    summary = {
+        "simulations": n,
+        "seconds": seconds,
+        "simulations_per_second": n / seconds if seconds else float("inf"),
+        "matches_per_second": n * len(matrices) / seconds if seconds else float("inf"),
+        "total_goals": stats["total_goals"] / n,
+        "leg_hit_rate": stats["leg_hits"] / n,
+        "acca_hit_rate": stats["acca_hits"] / n,
+        "acca_odds": float(np.prod(leg_arrays[2])) if len(legs) else None,
+    }
+    if len(legs):
+        summary.update({
+            "pnl_mean": pnl_mean,
+            "pnl_std": float(np.sqrt(max(stats["pnl_sq_sum"] / n - pnl_mean ** 2, 0.0))),
+            "loss_rate": stats["losing_rounds"] / n,
+            "final_bankroll_mean": stats["final_bankroll_sum"] / stats["paths"],
+            "max_drawdown_mean": stats["max_drawdown_sum"] / stats["paths"],
+            "ruin_rate": stats["ruined_paths"] / stats["paths"],
+        })
+    return summary
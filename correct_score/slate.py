@@ -0,0 +1,204 @@
+# Headless bulk slate pricing
+#
+# Streams a CSV or Parquet file of fixtures through the engine in fixed-size
+# chunks and writes every market probability and value-bet flag to an output file.
+#
+#   python -m correct_score.slate fixtures.csv priced.csv --chunk-size 100000
+#   python -m correct_score.slate fixtures.csv priced.csv --profile stages.prom --tracemalloc
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from correct_score import engine, fitting, profiling
+
+# Same inputs the app asks for; the odds columns are optional
+STAT_COLUMNS = ["home_goals_scored", "away_goals_conceded", "away_goals_scored", "home_goals_conceded"]
+
+# With fitted team strengths, fixtures name the teams instead
+TEAM_COLUMNS = ["home_team", "away_team"]
+
+# Odds column -> the market probability column it is checked against
+ODDS_MARKETS = {
+    "odds_home": "prob_home",
+    "odds_draw": "prob_draw",
+    "odds_away": "prob_away",
+    "odds_over_1_5": "prob_over_1_5",
+    "odds_under_1_5": "prob_under_1_5",
+    "odds_over_2_5": "prob_over_2_5",
+    "odds_under_2_5": "prob_under_2_5",
+    "odds_btts_gg": "prob_gg",
+    "odds_btts_ng": "prob_ng",
+}
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def price_fixtures(fixtures, max_goals=None, strengths=None, epsilon=engine.DEFAULT_EPSILON):
+    """Returns a DataFrame with the input columns plus every market probability and value flag.
+
+    Expected goals come from the team averages, or from fitted TeamStrengths if given.
+    Each fixture is priced on its own exact grid (see engine.price_markets_adaptive());
+    an integer max_goals uses the fixed grid with a "max_goals+" tail bucket instead.
+    """
+    required = TEAM_COLUMNS if strengths is not None else STAT_COLUMNS
+    missing = [column for column in required if column not in fixtures.columns]
+    if missing:
+        raise ValueError(f"Missing fixture columns: {', '.join(missing)}")
+
+    if strengths is not None:
+        home_xg, away_xg = strengths.expected_goals(*(fixtures[column].to_numpy(str) for column in TEAM_COLUMNS))
+        rho = strengths.rho
+    else:
+        home_xg, away_xg = engine.expected_goals(*(fixtures[column].to_numpy() for column in STAT_COLUMNS))
+        rho = 0.0
+    if max_goals is None:
+        markets = engine.price_markets_adaptive(
+            home_xg, away_xg, epsilon=epsilon, ou_lines=engine.DEFAULT_OU_LINES, top_k=1, rho=rho
+        )
+    else:
+        markets = engine.price_markets(home_xg, away_xg, max_goals=max_goals, top_k=1, rho=rho)
+    ou = markets["over_under"]
+
+    priced = fixtures.copy()
+    priced["expected_goals_A"] = home_xg
+    priced["expected_goals_B"] = away_xg
+    priced["prob_home"] = markets["1x2"][:, 0]
+    priced["prob_draw"] = markets["1x2"][:, 1]
+    priced["prob_away"] = markets["1x2"][:, 2]
+    for line in engine.DEFAULT_OU_LINES:
+        suffix = str(line).replace(".", "_")
+        priced[f"prob_over_{suffix}"] = ou[f"Over {line}"]
+        priced[f"prob_under_{suffix}"] = ou[f"Under {line}"]
+    priced["prob_gg"] = markets["gg"]
+    priced["prob_ng"] = markets["ng"]
+    priced["top_scoreline"] = markets["top_scorelines"][:, 0]
+    priced["top_scoreline_prob"] = markets["top_probs"][:, 0]
+
+    # Same test as calculate_value(): probability * odds > 1
+    with profiling.stage("value_scan"):
+        for odds_column, prob_column in ODDS_MARKETS.items():
+            if odds_column in fixtures.columns:
+                priced[f"value_{odds_column[len('odds_'):]}"] = (
+                    priced[prob_column].to_numpy() * fixtures[odds_column].to_numpy(dtype=float) > 1
+                )
+    return priced
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields DataFrames of at most chunk_size rows without loading the whole file.
+
+    path may also be a ColumnStore directory, read one league season at a time.
+    """
+    if os.path.isdir(path):
+        from correct_score.store import ColumnStore
+
+        store = ColumnStore(path)
+        names = store.columns()
+        frames, rows = [], 0
+        for league, season in store.partitions():
+            frames.append(pd.DataFrame(store.select(league, season, columns=names, decode=True)))
+            rows += len(frames[-1])
+            if rows >= chunk_size:
+                chunk = pd.concat(frames, ignore_index=True)
+                for start in range(0, len(chunk) - chunk_size + 1, chunk_size):
+                    yield chunk.iloc[start:start + chunk_size]
+                frames, rows = [chunk.iloc[len(chunk) - len(chunk) % chunk_size:]], len(chunk) % chunk_size
+        if rows:
+            yield pd.concat(frames, ignore_index=True)
+    elif _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class _ChunkWriter:
+    """Appends priced chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = _is_parquet(path)
+        self._writer = None
+        self._header = True
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def price_file(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, max_goals=None, strengths=None,
+               epsilon=engine.DEFAULT_EPSILON):
+    """Prices every fixture in input_path chunk by chunk and returns (rows, seconds)."""
+    start = time.perf_counter()
+    rows = 0
+    writer = _ChunkWriter(output_path)
+    try:
+        for chunk in read_chunks(input_path, chunk_size):
+            priced = price_fixtures(chunk, max_goals=max_goals, strengths=strengths, epsilon=epsilon)
+            with profiling.stage("render"):  # Writing the priced rows is the headless render
+                writer.write(priced)
+            rows += len(chunk)
+    finally:
+        writer.close()
+    return rows, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price a slate of fixtures from a CSV or Parquet file.")
+    parser.add_argument("input", help="CSV or Parquet file of fixtures")
+    parser.add_argument("output", help="CSV or Parquet file to write priced fixtures to")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows priced per chunk")
+    parser.add_argument("--epsilon", type=float, default=engine.DEFAULT_EPSILON,
+                        help="probability each fixture's exact grid may leave out")
+    parser.add_argument("--max-goals", type=int,
+                        help="price on a fixed grid with this many goals per team before a tail bucket")
+    parser.add_argument("--strengths", help="fitted team strengths .npz; fixtures then need home_team/away_team")
+    parser.add_argument("--profile", help="record per-stage timings and allocations to this file "
+                                          "(Prometheus text if it ends in .prom, else appended JSON lines)")
+    parser.add_argument("--tracemalloc", action="store_true", help="with --profile, also trace bytes and peaks")
+    parser.add_argument("--cprofile", help="capture the run with cProfile and dump the stats to this file")
+    args = parser.parse_args(argv)
+
+    strengths = fitting.TeamStrengths.load(args.strengths) if args.strengths else None
+    profile = None
+    if args.profile or args.cprofile:
+        profile = profiling.StageProfile(memory=args.tracemalloc, cprofile=bool(args.cprofile)).start()
+    try:
+        rows, seconds = price_file(args.input, args.output, args.chunk_size, args.max_goals, strengths, args.epsilon)
+    finally:
+        if profile is not None:
+            profile.stop()
+    if args.profile:
+        profile.write(args.profile, "prometheus" if args.profile.endswith(".prom") else "jsonl",
+                      command="slate", input=os.path.basename(args.input))
+    if args.cprofile:
+        profile.cprofile.dump_stats(args.cprofile)
+    rate = rows / seconds if seconds else float("inf")
+    print(f"Priced {rows} fixtures in {seconds:.2f}s ({rate:,.0f} rows/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+# Memory-mapped columnar store of historical matches, odds and predictions
+#
+# Matches are partitioned by league and season. Every column of a partition is a
+# raw binary file read back with np.memmap, so selecting a league season, or a date
+# range inside one (rows are kept in date order), returns views without copying or
+# parsing anything. League, season and team names are dictionary-encoded to int32
+# codes. Any other numeric column (closing odds, model probabilities) is stored as
+# float64, so one store feeds fitting, backtesting and bulk pricing.
+#
+# The store is append-only: each ingested batch of matchdays is appended to the
+# column files and committed by atomically replacing meta.json, which records the
+# row counts readers trust. One writer at a time; any number of readers.
+#
+# On ingestion every match also gets the inputs the app asks for: the home team's
+# average goals scored and conceded in its last `window` home matches and the away
+# team's in its last `window` away matches, before kick-off. They come from per-team
+# ring buffers saved with the store and updated incrementally, never recomputed.
+#
+#   python -m correct_score.store history_dir results.csv [more.csv ...]
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+DEFAULT_WINDOW = 10
+
+# Column -> dictionary it is encoded with
+CATEGORY_COLUMNS = {"league": "league", "season": "season", "home_team": "team", "away_team": "team"}
+GOAL_COLUMNS = ["home_goals", "away_goals"]
+REQUIRED_COLUMNS = list(CATEGORY_COLUMNS) + ["date"] + GOAL_COLUMNS
+
+# (rolling column, venue, goals column of that venue's team, goals column of its opponent)
+ROLLING = [
+    ("home_goals_scored", "home", "home_goals", "away_goals"),
+    ("home_goals_conceded", "home", "away_goals", "home_goals"),
+    ("away_goals_scored", "away", "away_goals", "home_goals"),
+    ("away_goals_conceded", "away", "home_goals", "away_goals"),
+]
+ROLLING_COLUMNS = [name for name, *_ in ROLLING]
+
+_DTYPES = {"date": "datetime64[D]", "home_goals": "int16", "away_goals": "int16"}
+
+
+def _partition_key(league, season):
+    return f"{league}_{season}"
+
+
+def _window_averages(buffers, teams, goals, window):
+    """Returns pre-match window averages for each row and the updated ring buffers.
+
+    buffers is (n_teams, window) with each team's latest values last and NaN where it
+    has fewer matches. Rows are in match order; teams may repeat within the batch.
+    """
+    order = np.argsort(teams, kind="stable")
+    sorted_teams = teams[order]
+    group_teams, starts, sizes = np.unique(sorted_teams, return_index=True, return_counts=True)
+
+    # Each group is laid out as its team's buffer followed by its new goals
+    extended_starts = starts + np.arange(len(group_teams)) * window
+    extended = np.empty(len(teams) + len(group_teams) * window)
+    buffer_slots = (extended_starts[:, None] + np.arange(window)).ravel()
+    extended[buffer_slots] = buffers[group_teams].ravel()
+    position = np.arange(len(teams)) - np.repeat(starts, sizes)
+    goal_slots = np.repeat(extended_starts, sizes) + window + position
+    extended[goal_slots] = goals[order]
+
+    valid = ~np.isnan(extended)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, extended, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+    # The window before a match is the `window` slots just before its own slot
+    end, begin = goal_slots, goal_slots - window
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = (sums[end] - sums[begin]) / (counts[end] - counts[begin])
+
+    updated = buffers.copy()
+    last = (extended_starts + window + sizes)[:, None] - window + np.arange(window)
+    updated[group_teams] = extended[last]
+    result = np.empty(len(teams))
+    result[order] = averages
+    return result, updated
+
+
+class ColumnStore:
+    """Append-only, memory-mapped store partitioned by league and season."""
+
+    def __init__(self, path, window=DEFAULT_WINDOW):
+        self.path = path
+        self._memmaps = {}
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                self.meta = json.load(f)
+        except FileNotFoundError:
+            self.meta = {
+                "window": window,
+                "generation": 0,
+                "last_date": None,
+                "dictionaries": {"league": [], "season": [], "team": []},
+                "partitions": {},
+            }
+        self.window = self.meta["window"]
+        self._codes = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in self.meta["dictionaries"].items()
+        }
+
+    # Dictionaries
+
+    def dictionary(self, name):
+        """Returns the array of names that codes of a dictionary ("league", "season", "team") index."""
+        return np.array(self.meta["dictionaries"][name], dtype=object)
+
+    def encode(self, name, values, add=False):
+        """Returns int32 codes for values, adding unseen ones to the dictionary if add is set."""
+        codes = self._codes[name]
+        uniques, inverse = np.unique(np.asarray(values).astype(str), return_inverse=True)
+        for value in uniques:
+            if value not in codes:
+                if not add:
+                    raise KeyError(f"Unknown {name}: {value}")
+                codes[value] = len(codes)
+                self.meta["dictionaries"][name].append(value)
+        return np.array([codes[value] for value in uniques], dtype=np.int32)[inverse.ravel()]
+
+    def decode(self, name, codes):
+        return self.dictionary(name)[codes]
+
+    # Reading
+
+    def partitions(self, league=None, season=None):
+        """Returns the (league, season) names stored, optionally filtered by name."""
+        leagues, seasons = self.dictionary("league"), self.dictionary("season")
+        return [(leagues[l], seasons[s]) for l, s in self._partition_codes(league, season)]
+
+    def _partition_codes(self, league=None, season=None):
+        league = None if league is None else self._codes["league"].get(str(league), -1)
+        season = None if season is None else self._codes["season"].get(str(season), -1)
+        return [
+            (part["league"], part["season"])
+            for part in self.meta["partitions"].values()
+            if league in (None, part["league"]) and season in (None, part["season"])
+        ]
+
+    def _column(self, key, name):
+        part = self.meta["partitions"][key]
+        rows = part["rows"]
+        if name not in part["columns"]:
+            return np.full(rows, np.nan)  # Column added after this partition was written
+        cache_key = (key, name, rows)
+        if cache_key not in self._memmaps:
+            dtype = np.dtype(part["columns"][name])
+            path = os.path.join(self.path, key, f"{name}.bin")
+            self._memmaps[cache_key] = (
+                np.memmap(path, dtype=dtype, mode="r", shape=(rows,)) if rows else np.empty(0, dtype)
+            )
+        return self._memmaps[cache_key]
+
+    def columns(self):
+        """Returns every column name stored in any partition."""
+        names = dict.fromkeys(REQUIRED_COLUMNS)
+        for part in self.meta["partitions"].values():
+            names.update(dict.fromkeys(part["columns"]))
+        return list(names)
+
+    def partition(self, league, season, start=None, end=None, columns=None):
+        """Returns {column: memmap view} for one league season, rows with start <= date < end.
+
+        Nothing is copied; category columns hold dictionary codes.
+        """
+        return self._slice(_partition_key(self._codes["league"][str(league)], self._codes["season"][str(season)]),
+                           start, end, columns)
+
+    def _slice(self, key, start, end, columns):
+        dates = self._column(key, "date")
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "D"))
+        hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(end, "D"))
+        names = columns or list(self.meta["partitions"][key]["columns"])
+        return {name: self._column(key, name)[lo:hi] for name in names}
+
+    def select(self, league=None, season=None, start=None, end=None, columns=None, decode=False):
+        """Returns {column: array} over every matching partition.
+
+        A single partition is returned as views; several are concatenated. With decode,
+        category columns hold names instead of codes.
+        """
+        names = columns or self.columns()
+        parts = [
+            self._slice(_partition_key(l, s), start, end, names) for l, s in self._partition_codes(league, season)
+        ]
+        if len(parts) == 1:
+            selected = parts[0]
+        else:
+            selected = {
+                name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0)
+                for name in names
+            }
+        if decode:
+            for name, dictionary in CATEGORY_COLUMNS.items():
+                if name in selected:
+                    selected[name] = self.decode(dictionary, selected[name])
+        return selected
+
+    def __len__(self):
+        return sum(part["rows"] for part in self.meta["partitions"].values())
+
+    # Rolling averages
+
+    def _state_path(self, generation):
+        return os.path.join(self.path, f"rolling.{generation}.npz")
+
+    def _load_state(self):
+        n_teams = len(self.meta["dictionaries"]["team"])
+        state = {name: np.full((0, self.window), np.nan) for name, *_ in ROLLING}
+        if self.meta["generation"]:
+            with np.load(self._state_path(self.meta["generation"])) as data:
+                state = {name: data[name] for name in state}
+        return {name: np.vstack([buffer, np.full((n_teams - len(buffer), self.window), np.nan)])
+                for name, buffer in state.items()}
+
+    def current_averages(self, home_teams, away_teams):
+        """Returns the app's team-average inputs for upcoming fixtures from the latest rolling windows."""
+        state = self._load_state()
+        teams = {"home": self.encode("team", home_teams), "away": self.encode("team", away_teams)}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # Teams without matches at a venue get NaN
+            return {name: np.nanmean(state[name][teams[venue]], axis=1) for name, venue, *_ in ROLLING}
+
+    # Writing
+
+    def append(self, matches):
+        """Appends a batch of matches given as {column: array} and returns the rows added.
+
+        Batches must not start before the latest date already stored. Rows are sorted by
+        date; the rolling team averages are computed here and need not be given.
+        """
+        missing = [column for column in REQUIRED_COLUMNS if column not in matches]
+        if missing:
+            raise ValueError(f"Missing match columns: {', '.join(missing)}")
+        dates = np.asarray(matches["date"]).astype("datetime64[D]")
+        order = np.argsort(dates, kind="stable")
+        dates = dates[order]
+        if not len(dates):
+            return 0
+        last_date = self.meta["last_date"]
+        if last_date is not None and dates[0] < np.datetime64(last_date, "D"):
+            raise ValueError(f"Batch starts at {dates[0]}, before the stored history ends ({last_date})")
+
+        columns = {"date": dates}
+        for name, dictionary in CATEGORY_COLUMNS.items():
+            columns[name] = self.encode(dictionary, np.asarray(matches[name])[order], add=True)
+        for name in GOAL_COLUMNS:
+            columns[name] = np.asarray(matches[name])[order].astype(_DTYPES[name])
+        for name, values in matches.items():
+            if name not in columns and name not in ROLLING_COLUMNS and np.asarray(values).dtype.kind in "biuf":
+                columns[name] = np.asarray(values, dtype=float)[order]
+
+        state = self._load_state()
+        for name, venue, for_column, _ in ROLLING:
+            averages, state[name] = _window_averages(
+                state[name], columns[f"{venue}_team"], columns[for_column].astype(float), self.window
+            )
+            columns[name] = averages
+
+        os.makedirs(self.path, exist_ok=True)
+        partition_codes = columns["league"].astype(np.int64) * (len(self.meta["dictionaries"]["season"]) + 1) \
+            + columns["season"]
+        for code in np.unique(partition_codes):
+            rows = np.flatnonzero(partition_codes == code)
+            league, season = int(columns["league"][rows[0]]), int(columns["season"][rows[0]])
+            self._append_partition(league, season, {name: values[rows] for name, values in columns.items()})
+
+        generation = self.meta["generation"] + 1
+        with open(self._state_path(generation), "wb") as f:
+            np.savez(f, **state)
+        previous_state = self._state_path(self.meta["generation"]) if self.meta["generation"] else None
+        self.meta["generation"] = generation
+        self.meta["last_date"] = str(dates[-1])
+        self._commit()
+        if previous_state:
+            os.remove(previous_state)
+        return len(dates)
+
+    def _append_partition(self, league, season, columns):
+        key = _partition_key(league, season)
+        part = self.meta["partitions"].setdefault(
+            key, {"league": league, "season": season, "rows": 0, "columns": {}}
+        )
+        os.makedirs(os.path.join(self.path, key), exist_ok=True)
+        # Stored columns this batch doesn't carry (only the float extras can be missing) get NaN,
+        # keeping every column file as long as the partition
+        missing = [name for name in part["columns"] if name not in columns]
+        columns = {**columns, **{name: np.full(len(columns["date"]), np.nan) for name in missing}}
+        for name, values in columns.items():
+            dtype = np.dtype(part["columns"].get(name, _DTYPES.get(name, values.dtype.str)))
+            path = os.path.join(self.path, key, f"{name}.bin")
+            with open(path, "ab") as f:
+                # Drop bytes from an append that never reached meta.json, then back-fill a new column
+                f.truncate(part["rows"] * dtype.itemsize if name in part["columns"] else 0)
+                if name not in part["columns"]:
+                    np.full(part["rows"], np.nan, dtype=dtype).tofile(f)
+                values.astype(dtype).tofile(f)
+            part["columns"][name] = dtype.str
+        part["rows"] += len(columns["date"])
+
+    def _commit(self):
+        path = os.path.join(self.path, "meta.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, path)
+        self._memmaps.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append CSV or Parquet files of matches to a column store.")
+    parser.add_argument("store", help="store directory (created if missing)")
+    parser.add_argument("inputs", nargs="+", help="CSV or Parquet files in date order")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                        help="matches in the rolling home/away averages of a new store")
+    args = parser.parse_args(argv)
+
+    from correct_score.slate import read_chunks
+
+    store = ColumnStore(args.store, window=args.window)
+    start = time.perf_counter()
+    rows = 0
+    for path in args.inputs:
+        for chunk in read_chunks(path):
+            rows += store.append({column: chunk[column].to_numpy() for column in chunk.columns})
+    print(f"Appended {rows} matches in {time.perf_counter() - start:.2f}s ({len(store)} stored)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# Bulk value-bet scanner
+#
+# Odds come in as (fixtures, bookmakers, outcomes) arrays, one per market, with NaN
+# where a book doesn't price an outcome. Model probabilities are (fixtures, outcomes)
+# and are broadcast across bookmakers. A price is a value bet when prob * odds > 1,
+# the same test calculate_value() applies in the app.
+import numpy as np
+
+from correct_score import profiling
+
+
+def _broadcast_probs(probs, odds):
+    probs = np.asarray(probs, dtype=float)
+    if probs.ndim == odds.ndim - 1:
+        probs = probs[:, None, :]  # Same model probability for every bookmaker
+    return np.broadcast_to(probs, odds.shape)
+
+
+def expected_value(probs, odds):
+    """Returns (ev, edge) arrays: ev = prob * odds and edge = prob - 1 / odds."""
+    odds = np.asarray(odds, dtype=float)
+    probs = _broadcast_probs(probs, odds)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return probs * odds, probs - 1 / odds
+
+
+def best_prices(odds):
+    """Returns (best_odds, bookmaker) arrays of shape (fixtures, outcomes) across books."""
+    odds = np.asarray(odds, dtype=float)
+    filled = np.where(np.isnan(odds), -np.inf, odds)
+    bookmaker = filled.argmax(axis=1)
+    best = np.take_along_axis(odds, bookmaker[:, None, :], axis=1)[:, 0, :]
+    return best, bookmaker
+
+
+def _top_k(scores, k):
+    """Returns indices of the k highest scores along the last axis, best first."""
+    k = min(k, scores.shape[-1])
+    top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(top, order, axis=-1)
+
+
+@profiling.staged("value_scan")
+def scan(probs, odds, k=10, min_ev=1.0, per_fixture=False):
+    """Returns the top-k value bets in one market, ranked by EV.
+
+    The result is a dict of equal-length arrays: fixture, bookmaker, outcome, prob,
+    odds, ev and edge. Only prices with ev > min_ev are kept, so fewer than k rows
+    may come back. With per_fixture=True the top k are chosen within each fixture.
+    """
+    odds = np.asarray(odds, dtype=float)
+    n_fixtures, n_books, n_outcomes = odds.shape
+    probs = _broadcast_probs(probs, odds)
+    ev, edge = expected_value(probs, odds)
+    scores = np.where(ev > min_ev, ev, -np.inf)  # NaN odds compare False and drop out
+
+    if per_fixture:
+        flat_idx = _top_k(scores.reshape(n_fixtures, -1), k)
+        flat_idx = (flat_idx + np.arange(n_fixtures)[:, None] * n_books * n_outcomes).ravel()
+    else:
+        flat_idx = _top_k(scores.ravel(), k)
+    flat_idx = flat_idx[np.isfinite(scores.ravel()[flat_idx])]
+
+    fixture, bookmaker, outcome = np.unravel_index(flat_idx, odds.shape)
+    return {
+        "fixture": fixture,
+        "bookmaker": bookmaker,
+        "outcome": outcome,
+        "prob": probs[fixture, bookmaker, outcome],
+        "odds": odds.ravel()[flat_idx],
+        "ev": ev.ravel()[flat_idx],
+        "edge": edge.ravel()[flat_idx],
+    }
+
+
+def scan_markets(markets, k=10, min_ev=1.0, per_fixture=False):
+    """Runs scan() over a dict of market name -> (probs, odds) and returns name -> result."""
+    return {
+        name: scan(probs, odds, k=k, min_ev=min_ev, per_fixture=per_fixture)
+        for name, (probs, odds) in markets.items()
+    }
+
+
+@profiling.staged("value_scan")
+def best_value_outcome(outcomes, probs, odds):
+    """Returns (outcome, prob) for the most likely outcome with prob * odds > 1, else (None, None).
+
+    This is the single-fixture, single-bookmaker rule the app uses for HT/FT and correct
+    score value bets. odds may be missing (NaN) for some outcomes.
+    """
+    probs = np.asarray(probs, dtype=float)
+    with np.errstate(invalid="ignore"):
+        is_value = probs * np.asarray(odds, dtype=float) > 1
+    if not is_value.any():
+        return None, None
+    best = np.flatnonzero(is_value)[probs[is_value].argmax()]
+    return outcomes[best], float(probs[best])
@@ -1,7 +1,30 @@
 # Importing required libraries
-import streamlit as st
+import os
+
+import altair as alt
 import numpy as np
-from scipy.stats import poisson
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from correct_score import engine, htft, kelly, live, profiling, recommend
+from correct_score.cache import PredictionCache
+from correct_score.value import best_value_outcome, expected_value
+
+# Opt-in instrumentation: ticking "Profile pipeline stages" in the debug panel at the
+# bottom (or setting CORRECT_SCORE_PROFILE to a .jsonl or .prom path for headless runs)
+# times every model stage of the run; whatever no stage claims is Streamlit rendering
+PROFILE_PATH = os.environ.get("CORRECT_SCORE_PROFILE")
+stale_profile = profiling.active()
+if stale_profile is not None:  # A previous run was interrupted (rerun, st.stop) before closing it
+    stale_profile.stop()
+run_profile = None
+if st.session_state.get("profile_stages") or PROFILE_PATH:
+    run_profile = profiling.StageProfile(
+        memory=st.session_state.get("profile_memory", False),
+        cprofile=st.session_state.get("profile_cprofile", False),
+        root="render",
+    ).start()
 
 # Title
 st.title("💯💯💯🤖🤖🤖🔑🔑🔑⚽⚽⚽ 🎁Rabiotic Deep Advanced Football Match ✅Correct score Outcome Analysis Predictor")
@@ -11,12 +34,12 @@ st.header("Team Statistics")
 st.write("Provide the average goals scored and conceded for each team.")
 
 # Team A (Home) statistics
-home_goals_scored = st.number_input("Team A Average Goals Scored at Home (e.g., 1.5)", value=1.5)
-away_goals_conceded = st.number_input("Team B Average Goals Conceded Away (e.g., 1.2)", value=1.2)
+home_goals_scored = st.number_input("Team A Average Goals Scored at Home (e.g., 1.5)", value=1.5, min_value=0.0)
+away_goals_conceded = st.number_input("Team B Average Goals Conceded Away (e.g., 1.2)", value=1.2, min_value=0.0)
 
 # Team B (Away) statistics
-away_goals_scored = st.number_input("Team B Average Goals Scored Away (e.g., 1.3)", value=1.3)
-home_goals_conceded = st.number_input("Team A Average Goals Conceded at Home (e.g., 1.1)", value=1.1)
+away_goals_scored = st.number_input("Team B Average Goals Scored Away (e.g., 1.3)", value=1.3, min_value=0.0)
+home_goals_conceded = st.number_input("Team A Average Goals Conceded at Home (e.g., 1.1)", value=1.1, min_value=0.0)
 
 # Team Form Percentages
 st.header("Team Form Percentage")
@@ -38,40 +61,172 @@ odds_under_2_5 = st.number_input("Odds for Under 2.5 Goals", value=1.8)
 odds_btts_gg = st.number_input("Odds for Both Teams to Score (GG)", value=1.8)
 odds_btts_ng = st.number_input("Odds for Both Teams Not to Score (NG)", value=2.0)
 
+# Inputs the model runs on; they only change when "Submit Prediction" is pressed,
+# so editing a widget re-renders from the cache instead of re-running the model
+current_inputs = {
+    "home_goals_scored": home_goals_scored,
+    "away_goals_conceded": away_goals_conceded,
+    "away_goals_scored": away_goals_scored,
+    "home_goals_conceded": home_goals_conceded,
+    "odds_home": odds_home,
+    "odds_draw": odds_draw,
+    "odds_away": odds_away,
+    "odds_over_1_5": odds_over_1_5,
+    "odds_under_1_5": odds_under_1_5,
+    "odds_over_2_5": odds_over_2_5,
+    "odds_under_2_5": odds_under_2_5,
+    "odds_btts_gg": odds_btts_gg,
+    "odds_btts_ng": odds_btts_ng,
+}
+
 # Add a submit button to the sidebar
 with st.sidebar:
     st.markdown("### Submit Prediction")
     if st.button("Submit Prediction"):
+        st.session_state["prediction_inputs"] = current_inputs
         st.success("Prediction submitted! Results will be displayed below.")
+    elif "prediction_inputs" not in st.session_state:
+        st.session_state["prediction_inputs"] = current_inputs
+    elif st.session_state["prediction_inputs"] != current_inputs:
+        st.info("Inputs changed. Press Submit Prediction to update the results.")
+
+prediction_inputs = {**current_inputs, **st.session_state["prediction_inputs"]}
+odds_home = prediction_inputs["odds_home"]
+odds_draw = prediction_inputs["odds_draw"]
+odds_away = prediction_inputs["odds_away"]
+odds_over_1_5 = prediction_inputs["odds_over_1_5"]
+odds_under_1_5 = prediction_inputs["odds_under_1_5"]
+odds_over_2_5 = prediction_inputs["odds_over_2_5"]
+odds_under_2_5 = prediction_inputs["odds_under_2_5"]
+odds_btts_gg = prediction_inputs["odds_btts_gg"]
+odds_btts_ng = prediction_inputs["odds_btts_ng"]
 
 # Calculate expected goals
-expected_goals_A = (home_goals_scored + away_goals_conceded) / 2
-expected_goals_B = (away_goals_scored + home_goals_conceded) / 2
+expected_goals_A, expected_goals_B = (
+    float(xg) for xg in engine.expected_goals(
+        prediction_inputs["home_goals_scored"], prediction_inputs["away_goals_conceded"],
+        prediction_inputs["away_goals_scored"], prediction_inputs["home_goals_conceded"],
+    )
+)
 
-st.subheader("Expected Goals")
-st.write(f"Expected Goals for Team A: **{expected_goals_A:.2f}**")
-st.write(f"Expected Goals for Team B: **{expected_goals_B:.2f}**")
+# Results are rendered as a few tables and one chart built straight from the model's
+# arrays: every st.* call is a separate message the browser has to process, so one
+# markdown table per market instead of one line per probability keeps reruns fast on
+# mobile (a markdown table is a fraction of the size of an Arrow dataframe message)
+VALUE_HIGHLIGHT = ":green-background[{}]"
+
+# Hide goal counts and scorelines that round to 0.00%
+MIN_DISPLAY_PROB = 0.00005
+
+def market_table(outcomes, probs, odds=None, label="Outcome"):
+    """Returns {column: values} with probabilities (%) and fair odds, plus odds and EV when odds are given."""
+    probs = np.asarray(probs, dtype=float)
+    with np.errstate(divide="ignore"):
+        table = {label: list(outcomes), "Probability (%)": probs * 100, "Fair odds": 1 / probs}
+    if odds is not None:
+        table["Odds"] = np.asarray(odds, dtype=float)
+        table["EV"] = expected_value(probs, table["Odds"])[0]
+    return table
+
+def _format_cell(value):
+    if isinstance(value, (float, np.floating)):
+        return "" if np.isnan(value) else f"{value:.2f}"
+    return str(value)
+
+def show_table(table):
+    """Renders {column: values} as one markdown table, highlighting the outcome and EV of value bets."""
+    columns = [[_format_cell(value) for value in values] for values in table.values()]
+    is_value = np.asarray(table["EV"]) > 1 if "EV" in table else np.zeros(len(columns[0]), dtype=bool)
+    rows = [
+        "| " + " | ".join(table) + " |",
+        "|:--|" + "--:|" * (len(table) - 1),
+    ]
+    for cells, value in zip(zip(*columns), is_value):
+        if value:
+            cells = (VALUE_HIGHLIGHT.format(cells[0]), *cells[1:-1], VALUE_HIGHLIGHT.format(cells[-1]))
+        rows.append("| " + " | ".join(cells) + " |")
+    st.markdown("\n".join(rows))
+
+def odds_editor(key, outcomes, label="Outcome"):
+    """Renders one editable odds column for the outcomes and returns {outcome: odds}."""
+    edited = st.data_editor(
+        pd.DataFrame({label: list(outcomes), "Odds": 10.0}),
+        key=key,
+        hide_index=True,
+        disabled=[label],
+        column_config={"Odds": st.column_config.NumberColumn(min_value=1.0, step=0.1, format="%.2f")},
+    )
+    return dict(zip(edited[label], edited["Odds"].astype(float)))
+
+# Altair builds and validates the scoreline heatmap's Vega-Lite spec once per process;
+# each rerun only attaches that fixture's cells (columns home, away and p in %)
+@st.cache_data(show_spinner=False)
+def scoreline_heatmap_spec():
+    # The axes are encoded once on the layer rather than repeated in both marks
+    spec = alt.layer(
+        alt.Chart().mark_rect().encode(color=alt.Color("p:Q", scale=alt.Scale(scheme="greens"), legend=None)),
+        alt.Chart().mark_text(fontSize=11).encode(text=alt.Text("p:Q", format=".1f")),
+        data=pd.DataFrame(columns=["home", "away", "p"]),
+    ).encode(
+        x=alt.X("away:O", title="Team B goals", axis=alt.Axis(orient="top")),
+        y=alt.Y("home:O", title="Team A goals"),
+    ).to_dict()
+    for key in ("data", "datasets", "config"):
+        spec.pop(key, None)
+    return spec
 
-# Generate Poisson distribution probabilities for 0 to 3+ goals
-def poisson_prob(expected_goals, max_goals=3):
-    """Returns probabilities of scoring 0, 1, 2, 3+ goals."""
-    probs = [poisson.pmf(i, expected_goals) for i in range(max_goals)]
-    probs.append(1 - sum(probs))  # 3+ goals
-    return probs
+st.subheader("Expected Goals")
+st.markdown(f"Team A: **{expected_goals_A:.2f}** | Team B: **{expected_goals_B:.2f}**")
+
+# Each fixture's grid grows until the scorelines it leaves out have less than this probability
+TAIL_EPSILON = engine.DEFAULT_EPSILON
+
+# One on-disk prediction cache per server process, shared with every other process
+# and surviving restarts, so a popular fixture is priced once for all sessions
+@st.cache_resource
+def prediction_cache():
+    return PredictionCache()
+
+# Price every market for one fixture; cached in memory per process and on disk across processes
+@st.cache_data(show_spinner=False)
+def predict_markets(expected_goals_A, expected_goals_B, epsilon=TAIL_EPSILON):
+    """Returns per-team goal probabilities, 1x2, Over/Under, Asian totals, GG/NG and sorted scorelines."""
+    return prediction_cache().get_or_compute(
+        {"stage": "markets", "home_xg": expected_goals_A, "away_xg": expected_goals_B, "epsilon": epsilon},
+        lambda: _price_markets(expected_goals_A, expected_goals_B, epsilon),
+    )
 
-probs_A = poisson_prob(expected_goals_A)
-probs_B = poisson_prob(expected_goals_B)
+def _price_markets(expected_goals_A, expected_goals_B, epsilon):
+    max_goals = int(engine.adaptive_max_goals(expected_goals_A, expected_goals_B, epsilon)[0])
+    markets = engine.price_markets_adaptive(
+        expected_goals_A, expected_goals_B, epsilon=epsilon, top_k=(max_goals + 1) ** 2
+    )
+    score_matrix = engine.fixture_matrix(markets, 0)
+    sorted_scorelines = [
+        (str(label), float(prob))
+        for label, prob in zip(markets["top_scorelines"][0], markets["top_probs"][0])
+    ]
+    return {
+        "probs_A": score_matrix.sum(axis=1).tolist(),
+        "probs_B": score_matrix.sum(axis=0).tolist(),
+        "1x2": markets["1x2"][0].tolist(),
+        "ou_probs": {key: float(value[0]) for key, value in markets["over_under"].items()},
+        "asian_totals": {key: float(settlement["fair_odds"][0]) for key, settlement in markets["asian_totals"].items()},
+        "gg_prob": float(markets["gg"][0]),
+        "ng_prob": float(markets["ng"][0]),
+        "sorted_scorelines": sorted_scorelines,
+        "scoreline_probs": dict(sorted_scorelines),
+    }
 
-# Display probabilities for each possible scoreline
-scoreline_probs = {}
-for i in range(4):  # Goals by Team A
-    for j in range(4):  # Goals by Team B
-        scoreline_probs[(i, j)] = probs_A[i] * probs_B[j]
+# Build the scoreline matrix (as many goals per team as the fixture needs) and its markets
+# Cache lookups are their own stage; on a miss the model stages inside are timed separately
+with profiling.stage("cache"):
+    markets = predict_markets(expected_goals_A, expected_goals_B)
+probs_A = markets["probs_A"]
+probs_B = markets["probs_B"]
 
 # Calculate probabilities for 1x2 outcomes
-home_win_prob = sum(prob for (i, j), prob in scoreline_probs.items() if i > j)
-draw_prob = sum(prob for (i, j), prob in scoreline_probs.items() if i == j)
-away_win_prob = sum(prob for (i, j), prob in scoreline_probs.items() if i < j)
+home_win_prob, draw_prob, away_win_prob = markets["1x2"]
 
 # Normalize probabilities to percentages
 total_prob = home_win_prob + draw_prob + away_win_prob
@@ -79,401 +234,341 @@ home_win_percent = (home_win_prob / total_prob) * 100
 draw_percent = (draw_prob / total_prob) * 100
 away_win_percent = (away_win_prob / total_prob) * 100
 
-# Display 1x2 probabilities
-st.subheader("1x2 Probability-Based Percentages")
-st.write(f"Probability of Home Win: **{home_win_percent:.2f}%**")
-st.write(f"Probability of Draw: **{draw_percent:.2f}%**")
-st.write(f"Probability of Away Win: **{away_win_percent:.2f}%**")
+# Over/Under, GG/NG and sorted scorelines
+ou_probs = markets["ou_probs"]
+gg_prob = markets["gg_prob"]
+ng_prob = markets["ng_prob"]
+sorted_scorelines = markets["sorted_scorelines"]
+
+# 1x2, the two main totals and GG/NG against the odds entered above
+st.subheader("Match Markets")
+show_table(market_table(
+    ["1", "X", "2", "Over 1.5", "Under 1.5", "Over 2.5", "Under 2.5", "GG", "NG"],
+    [home_win_percent / 100, draw_percent / 100, away_win_percent / 100,
+     ou_probs["Over 1.5"], ou_probs["Under 1.5"], ou_probs["Over 2.5"], ou_probs["Under 2.5"], gg_prob, ng_prob],
+    [odds_home, odds_draw, odds_away, odds_over_1_5, odds_under_1_5, odds_over_2_5, odds_under_2_5,
+     odds_btts_gg, odds_btts_ng],
+    label="Market",
+))
+st.markdown(
+    f"Recommendation: Bet on **{recommend.over_under_pick(ou_probs['Over 2.5'])} 2.5 Goals** "
+    f"and **{recommend.gg_pick(gg_prob)}**"
+)
 
-# Display deep analysis of team goals probabilities
+# Every Over/Under line next to the Asian total fair odds
+st.subheader("Over/Under & Asian Totals")
+asian_lines = [1.75, 2.0, 2.25, 2.5, 2.75, 3.0, 3.25]
+lines = sorted({float(key.split()[1]) for key in ou_probs} | set(asian_lines))
+show_table({
+    "Line": [f"{line:g}" for line in lines],
+    "Over (%)": [ou_probs.get(f"Over {line}", np.nan) * 100 for line in lines],
+    "Under (%)": [ou_probs.get(f"Under {line}", np.nan) * 100 for line in lines],
+    "Asian over odds": [markets["asian_totals"][f"Over {line}"] if line in asian_lines else np.nan for line in lines],
+    "Asian under odds": [markets["asian_totals"][f"Under {line}"] if line in asian_lines else np.nan for line in lines],
+})
+
+# Goals per team, hiding counts that round to 0.00% for both teams
 st.subheader("Deep Analysis of Team Goals Probability (%)")
-st.write("### Team A (Home)")
-for i, prob in enumerate(probs_A):
-    st.write(f"Probability of Team A scoring {i if i < 3 else '3+'} goals: **{prob * 100:.2f}%**")
-
-st.write("### Team B (Away)")
-for i, prob in enumerate(probs_B):
-    st.write(f"Probability of Team B scoring {i if i < 3 else '3+'} goals: **{prob * 100:.2f}%**")
-
-# Calculate Over/Under probabilities
-ou_probs = {
-    "Over 1.5": 1 - (probs_A[0] * probs_B[0] + probs_A[0] * probs_B[1] + probs_A[1] * probs_B[0]),
-    "Under 1.5": probs_A[0] * probs_B[0] + probs_A[0] * probs_B[1] + probs_A[1] * probs_B[0],
-    "Over 2.5": 1 - (probs_A[0] * probs_B[0] + probs_A[0] * probs_B[1] + probs_A[1] * probs_B[0] + probs_A[1] * probs_B[1]),
-    "Under 2.5": probs_A[0] * probs_B[0] + probs_A[0] * probs_B[1] + probs_A[1] * probs_B[0] + probs_A[1] * probs_B[1],
-}
-
-# Calculate GG/NG probabilities
-gg_prob = np.sum([probs_A[i] * probs_B[j] for i in range(1, len(probs_A)) for j in range(1, len(probs_B))])
-ng_prob = 1 - gg_prob
-
-# Scoreline calculation
-scoreline_probs = {}
-for i in range(4):  # Possible goals for Team A
-    for j in range(4):  # Possible goals for Team B
-        scoreline_probs[f"{i}-{j}"] = probs_A[i] * probs_B[j]
-
-# Sort scorelines by probability
-sorted_scorelines = sorted(scoreline_probs.items(), key=lambda x: x[1], reverse=True)
-
-# Display top 12 most likely scorelines
-st.subheader("Top 12 Most Likely Scorelines")
-for i, (scoreline, prob) in enumerate(sorted_scorelines[:12]):
-    st.write(f"{scoreline}: **{prob * 100:.2f}%**")
+shown = (np.asarray(probs_A) >= MIN_DISPLAY_PROB) | (np.asarray(probs_B) >= MIN_DISPLAY_PROB)
+show_table({
+    "Goals": np.flatnonzero(shown),
+    "Team A (%)": np.multiply(probs_A, 100)[shown],
+    "Team B (%)": np.multiply(probs_B, 100)[shown],
+})
+
+# Scoreline heatmap over the goal counts that are visible above
+st.subheader("Scoreline Probabilities")
+shown_goals = int(np.flatnonzero(shown).max()) + 1
+home, away = (goals.ravel() for goals in np.indices((shown_goals, shown_goals)))
+cell_probs = np.array([markets["scoreline_probs"].get(f"{i}-{j}", 0.0) for i, j in zip(home, away)]) * 100
+visible = cell_probs >= MIN_DISPLAY_PROB * 100
+# A bare Arrow table with compact dtypes carries no pandas metadata, keeping the payload small;
+# goal counts are only narrowed after indexing, as a grid can outgrow int8 products
+cells = pa.table({
+    "home": home[visible].astype(np.int16),
+    "away": away[visible].astype(np.int16),
+    "p": cell_probs[visible].astype(np.float32),
+})
+st.vega_lite_chart(cells, scoreline_heatmap_spec())
 
 # Top 5 most likely scorelines for recommendation
 top_5_scorelines = sorted_scorelines[:5]
-
-# Recommendation based on top scorelines
-st.subheader("Recommended Scoreline Bet")
-for scoreline, prob in top_5_scorelines:
-    st.write(f"Recommended Bet on Scoreline **{scoreline}** with probability **{prob * 100:.2f}%**")
-
-# Probabilities for most likely scorelines (adjustable to real calculations)
-scoreline_probs = {
-    "0-0": 0.062, "1-0": 0.058, "0-1": 0.057, "1-1": 0.061,
-    "2-0": 0.052, "0-2": 0.053, "2-1": 0.059, "1-2": 0.056,
-}
-
-# HT/FT probabilities (initially zero, calculated below)
-ht_ft_probs = {
-    "1/1": 0.0, "1/X": 0.0, "1/2": 0.0,
-    "X/1": 0.0, "X/X": 0.0, "X/2": 0.0,
-    "2/1": 0.0, "2/X": 0.0, "2/2": 0.0,
-}
+st.markdown("Recommended scoreline bets: " + ", ".join(
+    f"**{scoreline}** ({prob * 100:.2f}%)" for scoreline, prob in top_5_scorelines
+))
 
 # HT/FT odds input
 st.title("HT/FT & Correct Score Value Bet Calculator")
 st.subheader("Input Odds for HT/FT Outcomes")
-odds_for_ht_ft = {}
-for outcome in ht_ft_probs.keys():
-    odds_for_ht_ft[outcome] = st.number_input(
-        f"Odds for {outcome}:", min_value=1.0, value=10.0, step=0.1
+with st.form("ht_ft_odds"):
+    odds_for_ht_ft = odds_editor("ht_ft_odds_table", htft.HT_FT_OUTCOMES)
+    st.form_submit_button("Update HT/FT Odds")
+
+# Function to calculate HT/FT probabilities from first- and second-half score matrices
+@st.cache_data(show_spinner=False)
+def calculate_ht_ft_probs(expected_goals_A, expected_goals_B):
+    def compute():
+        probs = htft.ht_ft(expected_goals_A, expected_goals_B)["ht_ft"][0]
+        return {outcome: float(prob) for outcome, prob in zip(htft.HT_FT_OUTCOMES, probs)}
+
+    return prediction_cache().get_or_compute(
+        {"stage": "ht_ft", "home_xg": expected_goals_A, "away_xg": expected_goals_B}, compute
     )
 
-# Function to calculate HT/FT probabilities based on scorelines
-def calculate_ht_ft_probs(scoreline_probs):
-    ht_ft_probs = {
-        "1/1": 0.0, "1/X": 0.0, "1/2": 0.0,
-        "X/1": 0.0, "X/X": 0.0, "X/2": 0.0,
-        "2/1": 0.0, "2/X": 0.0, "2/2": 0.0,
-    }
-    for scoreline, prob in scoreline_probs.items():
-        ht, ft = map(int, scoreline.split("-"))
-
-        if ht > ft:  # HT Win
-            if ft > ht:  # FT Lose
-                ht_ft_probs["1/2"] += prob
-            elif ft == ht:  # FT Draw
-                ht_ft_probs["1/X"] += prob
-            else:  # FT Win
-                ht_ft_probs["1/1"] += prob
-        elif ht == ft:  # HT Draw
-            if ft > ht:  # FT Win
-                ht_ft_probs["X/1"] += prob
-            elif ft == ht:  # FT Draw
-                ht_ft_probs["X/X"] += prob
-            else:  # FT Lose
-                ht_ft_probs["X/2"] += prob
-        else:  # HT Lose
-            if ft > ht:  # FT Win
-                ht_ft_probs["2/1"] += prob
-            elif ft == ht:  # FT Draw
-                ht_ft_probs["2/X"] += prob
-            else:  # FT Lose
-                ht_ft_probs["2/2"] += prob
-
-    return ht_ft_probs
-
 # Calculate HT/FT probabilities
-ht_ft_probs = calculate_ht_ft_probs(scoreline_probs)
+with profiling.stage("cache"):
+    ht_ft_probs = calculate_ht_ft_probs(expected_goals_A, expected_goals_B)
 
-# Display HT/FT probabilities
+# Display HT/FT probabilities against the entered odds
 st.subheader("HT/FT Probabilities")
-for scenario, prob in ht_ft_probs.items():
-    st.write(f"{scenario}: **{prob * 100:.2f}%**")
+show_table(market_table(
+    list(ht_ft_probs), list(ht_ft_probs.values()),
+    [odds_for_ht_ft.get(outcome, np.nan) for outcome in ht_ft_probs],
+))
 
 # Find the best HT/FT value bet
 def find_best_ht_ft_value_bet(ht_ft_probs, odds_for_ht_ft):
-    value_bets = {
-        outcome: prob for outcome, prob in ht_ft_probs.items()
-        if outcome in odds_for_ht_ft and prob * odds_for_ht_ft[outcome] > 1
-    }
-    if value_bets:
-        best_outcome = max(value_bets, key=value_bets.get)
-        return best_outcome, value_bets[best_outcome]
-    return None, None
+    outcomes = list(ht_ft_probs)
+    return best_value_outcome(
+        outcomes,
+        [ht_ft_probs[outcome] for outcome in outcomes],
+        [odds_for_ht_ft.get(outcome, float("nan")) for outcome in outcomes],
+    )
 
 # Best HT/FT value bet
 best_ht_ft_outcome, best_ht_ft_prob = find_best_ht_ft_value_bet(ht_ft_probs, odds_for_ht_ft)
 
-# Display the best HT/FT value bet
-if best_ht_ft_outcome:
-    st.subheader("Best HT/FT Value Bet")
-    st.write(f"The best HT/FT value bet is: **{best_ht_ft_outcome}**")
-    st.write(f"Probability: **{best_ht_ft_prob * 100:.2f}%**")
-    st.write(f"Odds: **{odds_for_ht_ft[best_ht_ft_outcome]}**")
-    st.write(f"Expected Value (EV): **{best_ht_ft_prob * odds_for_ht_ft[best_ht_ft_outcome]:.2f}**")
-else:
-    st.subheader("Best HT/FT Value Bet")
-    st.write("No profitable HT/FT value bets found based on the given odds and probabilities.")
-
-# Function to calculate the best value bet for correct scores
-def calculate_best_correct_score(scoreline_probs, threshold=0.052):
-    """Filters scorelines with probabilities above the threshold."""
-    filtered_scores = {
-        scoreline: prob for scoreline, prob in scoreline_probs.items() if prob >= threshold
-    }
-    if filtered_scores:
-        best_scoreline = max(filtered_scores, key=filtered_scores.get)
-        return best_scoreline, filtered_scores[best_scoreline]
-    return None, None
-
 # Calculate the best correct score
-best_scoreline, best_score_prob = calculate_best_correct_score(scoreline_probs, threshold=0.052)
+best_scoreline, best_score_prob = recommend.best_correct_score(markets["scoreline_probs"], threshold=0.052)
 
-# Display the best correct score
+# Best HT/FT value bet, best correct score and the final recommendation
+summary = []
+if best_ht_ft_outcome:
+    summary.append(
+        f"- Best HT/FT value bet: **{best_ht_ft_outcome}** with probability **{best_ht_ft_prob * 100:.2f}%**, "
+        f"odds **{odds_for_ht_ft[best_ht_ft_outcome]}** and EV "
+        f"**{best_ht_ft_prob * odds_for_ht_ft[best_ht_ft_outcome]:.2f}**"
+    )
+else:
+    summary.append("- No profitable HT/FT value bets found based on the given odds and probabilities.")
 if best_scoreline:
-    st.subheader("Best Correct Score")
-    st.write(f"The most likely correct score: **{best_scoreline}**")
-    st.write(f"Probability: **{best_score_prob * 100:.2f}%**")
+    summary.append(f"- The most likely correct score: **{best_scoreline}** ({best_score_prob * 100:.2f}%)")
 else:
-    st.subheader("Best Correct Score")
-    st.write("No scoreline exceeds the probability threshold.")
-
-# Final recommendation based on the highest value bet
+    summary.append("- No scoreline exceeds the probability threshold.")
 if best_ht_ft_outcome and best_scoreline:
-    st.subheader("Final Recommendation")
-    st.write(f"Recommended HT/FT Outcome: **{best_ht_ft_outcome}**")
-    st.write(f"Recommended Correct Score: **{best_scoreline}**")
+    summary.append(
+        f"- Final Recommendation: HT/FT **{best_ht_ft_outcome}** and Correct Score **{best_scoreline}**"
+    )
 else:
-    st.subheader("Final Recommendation")
-    st.write("Not enough data for a confident recommendation.")
-
-# Value odds calculation
-def calculate_value(probability, odds):
-    return probability * odds > 1
-
-# Display odds verification
-st.subheader("Odds Value Verification")
-st.write(f"Over 1.5 Goals: {'Value Bet' if calculate_value(ou_probs['Over 1.5'], odds_over_1_5) else 'No Value'}")
-st.write(f"Under 1.5 Goals: {'Value Bet' if calculate_value(ou_probs['Under 1.5'], odds_under_1_5) else 'No Value'}")
-st.write(f"Over 2.5 Goals: {'Value Bet' if calculate_value(ou_probs['Over 2.5'], odds_over_2_5) else 'No Value'}")
-st.write(f"Under 2.5 Goals: {'Value Bet' if calculate_value(ou_probs['Under 2.5'], odds_under_2_5) else 'No Value'}")
-st.write(f"Both Teams to Score (GG): {'Value Bet' if calculate_value(gg_prob, odds_btts_gg) else 'No Value'}")
-st.write(f"Both Teams Not to Score (NG): {'Value Bet' if calculate_value(ng_prob, odds_btts_ng) else 'No Value'}")
-
-st.write("### Over/Under Recommendations")
-for key, value in ou_probs.items():
-    st.write(f"Probability of {key}: **{value * 100:.2f}%**")
-st.write(f"Recommendation: Bet on **{'Over' if ou_probs['Over 2.5'] > 0.5 else 'Under'} 2.5 Goals**")
-
-st.write("### GG/NG Recommendations")
-st.write(f"Probability of GG: **{gg_prob * 100:.2f}%**")
-st.write(f"Probability of NG: **{ng_prob * 100:.2f}%**")
-st.write(f"Recommendation: Bet on **{'GG' if gg_prob > 0.5 else 'NG'}**")
+    summary.append("- Final Recommendation: not enough data for a confident recommendation.")
+st.markdown("\n".join(summary))
 
 # Calculate value bets for correct scores
 def calculate_value_bet_correct_score(scoreline_probs, odds_for_scoreline):
     """Finds the highest probability correct score that is also a profitable value bet."""
-    value_bets = {
-        scoreline: prob for scoreline, prob in scoreline_probs.items()
-        if scoreline in odds_for_scoreline and prob * odds_for_scoreline[scoreline] > 1
-    }
-    if value_bets:
-        best_value_scoreline = max(value_bets, key=value_bets.get)
-        return best_value_scoreline, value_bets[best_value_scoreline]
-    else:
-        return None, None
-
-# Example probabilities for correct scores (Replace with actual calculations)
-scoreline_probs = {
-    "0-0": 0.08, "1-0": 0.12, "0-1": 0.10, "1-1": 0.15,
-    "2-0": 0.06, "0-2": 0.05, "2-1": 0.09, "1-2": 0.07,
-    "3-0": 0.03, "0-3": 0.02, "3-1": 0.04, "1-3": 0.03,
-    "2-2": 0.08, "3-2": 0.02, "2-3": 0.01, "4-0": 0.01,
-    "0-4": 0.01, "4-1": 0.01, "1-4": 0.01, "4-2": 0.01,
-    "2-4": 0.01, "4-3": 0.01, "3-4": 0.01, "4-4": 0.005,
-}
-
-# Initial probabilities for scorelines (replace with actual calculations or inputs)
-scoreline_probs = {
-    "0-0": 0.08, "1-0": 0.12, "0-1": 0.10, "1-1": 0.15,
-    "2-0": 0.06, "0-2": 0.05, "2-1": 0.09, "1-2": 0.07,
-    "3-0": 0.03, "0-3": 0.02, "3-1": 0.04, "1-3": 0.03,
-    "2-2": 0.08, "3-2": 0.02, "2-3": 0.01, "4-0": 0.01,
-    "0-4": 0.01, "4-1": 0.01, "1-4": 0.01, "4-2": 0.01,
-    "2-4": 0.01, "4-3": 0.01, "3-4": 0.01, "4-4": 0.005,
-}
+    scorelines = list(scoreline_probs)
+    return best_value_outcome(
+        scorelines,
+        [scoreline_probs[scoreline] for scoreline in scorelines],
+        [odds_for_scoreline.get(scoreline, float("nan")) for scoreline in scorelines],
+    )
 
+# Model probabilities for the correct-score odds grid (0-0 to 4-4)
+CORRECT_SCORE_GRID = [
+    "0-0", "1-0", "0-1", "1-1",
+    "2-0", "0-2", "2-1", "1-2",
+    "3-0", "0-3", "3-1", "1-3",
+    "2-2", "3-2", "2-3", "4-0",
+    "0-4", "4-1", "1-4", "4-2",
+    "2-4", "4-3", "3-4", "4-4",
+]
+scoreline_probs = {scoreline: markets["scoreline_probs"].get(scoreline, 0.0) for scoreline in CORRECT_SCORE_GRID}
 
-# HT/FT probabilities (adjust as needed)
-ht_ft_probabilities = {
-    "1/1": 40.0, "1/X": 10.0, "1/2": 5.0,
-    "X/1": 20.0, "X/X": 15.0, "X/2": 5.0,
-    "2/1": 5.0, "2/X": 5.0, "2/2": 10.0
-}
 # Streamlit app title and description
 st.title("Value Bet Correct Score & HT/FT Probabilities")
 st.write("Input the odds for correct scorelines from 0-0 to 4-4 to calculate the best value bet.")
 
 # Input section for odds
-odds_for_scoreline = {}
-for scoreline in scoreline_probs.keys():
-    odds_for_scoreline[scoreline] = st.number_input(
-        f"Odds for {scoreline}:", min_value=1.0, value=10.0, step=0.1
-    )
+with st.form("correct_score_odds"):
+    odds_for_scoreline = odds_editor("correct_score_odds_table", CORRECT_SCORE_GRID, label="Scoreline")
+    st.form_submit_button("Update Correct Score Odds")
 
-# Step 1: Adjust probabilities using a scaling factor
+# Step 1: Adjust probabilities using a scaling factor and normalize them to sum to 100%
 scaling_factor = 6.19 / 5.28  # Example adjustment
-adjusted_scorelines = {
-    score: round(prob * scaling_factor, 2) for score, prob in scoreline_probs.items()
-}
-
-# Step 2: Normalize adjusted probabilities to sum to 100%
-total_prob = sum(adjusted_scorelines.values())
-adjusted_scorelines = {
-    score: round(prob / total_prob * 100, 2) for score, prob in adjusted_scorelines.items()
-}
+adjusted_scorelines = recommend.adjust_scorelines(scoreline_probs, scaling_factor)
 
-# Step 3: Combine HT/FT probabilities with adjusted scoreline probabilities
+# Step 2: Combine the adjusted scoreline probabilities with the model's HT/FT probability
+# of the scoreline's result holding at half-time as well (e.g. 2-1 with "1/1")
 combined_probabilities = {}
 for score, score_prob in adjusted_scorelines.items():
-    ht_key = "1/1" if score in ["1:0", "2:0", "3:1"] else "X/X"  # Example mapping
-    ht_prob = ht_ft_probabilities.get(ht_key, 0)
-    combined_probabilities[score] = round(score_prob * (ht_prob / 100), 2)
-
-# Step 4: Calculate value bets for correct scores
-def calculate_value_bet_correct_score(scoreline_probs, odds_for_scoreline):
-    value_bets = {
-        scoreline: prob for scoreline, prob in scoreline_probs.items()
-        if scoreline in odds_for_scoreline and prob * odds_for_scoreline[scoreline] > 1
-    }
-    if value_bets:
-        best_value_scoreline = max(value_bets, key=value_bets.get)
-        return best_value_scoreline, value_bets[best_value_scoreline]
-    return None, None
+    home_goals, away_goals = map(int, score.split("-"))
+    result = "1" if home_goals > away_goals else "2" if home_goals < away_goals else "X"
+    combined_probabilities[score] = round(score_prob * ht_ft_probs[f"{result}/{result}"], 2)
 
-# Find the best value bet correct score
+# Step 3: Find the best value bet correct score
 best_value_scoreline, best_value_prob = calculate_value_bet_correct_score(
     adjusted_scorelines, odds_for_scoreline
 )
 
-# Step 5: Display results
-st.subheader("Adjusted Scoreline Probabilities")
-st.write(adjusted_scorelines)
-
-st.subheader("Combined Probabilities")
-st.write(combined_probabilities)
+# Step 4: Display the grid's model, adjusted and combined probabilities with EV in one table
+st.subheader("Correct Score Probabilities")
+correct_scores = market_table(
+    CORRECT_SCORE_GRID, list(scoreline_probs.values()),
+    [odds_for_scoreline[scoreline] for scoreline in CORRECT_SCORE_GRID], label="Scoreline",
+)
+show_table({
+    "Scoreline": CORRECT_SCORE_GRID,
+    "Probability (%)": correct_scores["Probability (%)"],
+    "Adjusted (%)": [adjusted_scorelines[scoreline] for scoreline in CORRECT_SCORE_GRID],
+    "Combined": [combined_probabilities[scoreline] for scoreline in CORRECT_SCORE_GRID],
+    **{column: correct_scores[column] for column in ("Fair odds", "Odds", "EV")},
+})
 
 st.subheader("Value Bet Correct Score")
 if best_value_scoreline:
-    st.write(f"**Best Value Bet Correct Score:** {best_value_scoreline}")
-    st.write(f"**Probability:** {best_value_prob:.2f}%")
-    st.write(f"**Odds:** {odds_for_scoreline[best_value_scoreline]}")
-    st.write(f"**Expected Value (EV):** {best_value_prob * odds_for_scoreline[best_value_scoreline]:.2f}")
+    st.markdown(
+        f"**Best Value Bet Correct Score:** {best_value_scoreline} | **Probability:** {best_value_prob:.2f}% | "
+        f"**Odds:** {odds_for_scoreline[best_value_scoreline]} | "
+        f"**Expected Value (EV):** {best_value_prob * odds_for_scoreline[best_value_scoreline]:.2f}"
+    )
 else:
     st.write("No profitable value bets for the given scorelines and odds.")
 
-    # Sort by Expected Value (EV) in descending order
-    scoreline_ev = sorted(scoreline_ev, key=lambda x: x[3], reverse=True)
-
-    # Select the top 7 scorelines
-    top_7_scorelines = scoreline_ev[:7]
-
-    # Display the results
-    for i, (scoreline, prob, odds, ev) in enumerate(top_7_scorelines, start=1):
-        st.write(f"**#{i} Scoreline:** {scoreline}")
-        st.write(f"   - **Probability:** {prob * 100:.2f}%")
-        st.write(f"   - **Odds:** {odds}")
-        st.write(f"   - **Expected Value (EV):** {ev:.2f}")
-        st.write("---")  # Add a separator between scorelines
+    # Top 7 scorelines by Expected Value (EV)
+    top_7_scorelines = recommend.top_ev_scorelines(scoreline_probs, odds_for_scoreline, k=7)
+    show_table(market_table(
+        [scoreline for scoreline, _, _, _ in top_7_scorelines],
+        [prob for _, prob, _, _ in top_7_scorelines],
+        [odds for _, _, odds, _ in top_7_scorelines],
+        label="Scoreline",
+    ))
 
 # Find the Top 7 most likely scorelines best value bet correct score
 best_value_scoreline, best_value_prob = calculate_value_bet_correct_score(scoreline_probs, odds_for_scoreline)
 
-# Display the best value bet correct score
-if best_value_scoreline:
-    st.subheader("Value Bet Correct Score")
-    st.write(f"The correct score with the highest probability that is also a value bet: **{best_value_scoreline}**")
-    st.write(f"Probability: **{best_value_prob * 100:.2f}%**")
-    st.write(f"Odds: **{odds_for_scoreline[best_value_scoreline]}**")
-    st.write(f"Expected Value (EV): **{best_value_prob * odds_for_scoreline[best_value_scoreline]:.2f}**")
-else:
-    st.subheader("Value Bet Correct Score")
-    st.write("No profitable value bet for correct scores based on the given odds.")
-
 # Determine final correct score based on combined recommendations
-st.subheader("Combined Recommendations (Over/Under 2.5 & GG/NG)")
-if ou_probs["Over 2.5"] > 0.5 and gg_prob > 0.5:
-    combined_recommendation = "Over 2.5 & GG"
-    final_correct_score = next((scoreline for scoreline, prob in sorted_scorelines if int(scoreline.split("-")[0]) > 1 and int(scoreline.split("-")[1]) > 0), "2-1")
-elif ou_probs["Under 2.5"] > 0.5 and ng_prob > 0.5:
-    combined_recommendation = "Under 2.5 & NG"
-    final_correct_score = next((scoreline for scoreline, prob in sorted_scorelines if int(scoreline.split("-")[0]) + int(scoreline.split("-")[1]) <= 2 and (int(scoreline.split("-")[0]) == 0 or int(scoreline.split("-")[1]) == 0)), "1-0")
-else:
-    combined_recommendation = "No Clear Combined Option"
-    final_correct_score = sorted_scorelines[0][0]
-
-st.write(f"Recommendation: Bet on **{combined_recommendation}**")
-st.write(f"Final 1x2 Probability-Based Percentages Correct Score Prediction: **{final_correct_score}**")
-# Step 1: Define the original probabilities for the top 12 scorelines
-scoreline_probabilities = [
-    {"scoreline": "1:0", "probability": 5.28},
-    {"scoreline": "1:1", "probability": 6.19},
-    {"scoreline": "2:1", "probability": 4.75},
-    {"scoreline": "0:0", "probability": 3.84},
-    {"scoreline": "2:0", "probability": 3.65},
-    {"scoreline": "0:1", "probability": 3.21},
-    {"scoreline": "1:2", "probability": 3.15},
-    {"scoreline": "3:1", "probability": 2.89},
-    {"scoreline": "1:3", "probability": 2.45},
-    {"scoreline": "2:2", "probability": 2.31},
-    {"scoreline": "0:2", "probability": 2.14},
-    {"scoreline": "3:0", "probability": 1.97},
-]
-
-# Step 2: Normalize probabilities to ensure they sum to 100%
-total_prob = sum(item["probability"] for item in scoreline_probabilities)
-for item in scoreline_probabilities:
-    item["normalized_probability"] = (item["probability"] / total_prob) * 100
-
-# Step 3: Apply matrix weighting adjustment
-# Define the adjustment factor (e.g., +10%)
-adjustment_factor = 1.10  # This increases probabilities by 10%
-
-adjusted_probabilities = []
-for item in scoreline_probabilities:
-    adjusted_probability = item["normalized_probability"] * adjustment_factor
-    adjusted_probabilities.append({
-        "scoreline": item["scoreline"],
-        "adjusted_probability": adjusted_probability
-    })
+combined_recommendation, final_correct_score = recommend.combined_recommendation(
+    ou_probs["Over 2.5"], ou_probs["Under 2.5"], gg_prob, ng_prob, sorted_scorelines
+)
 
-# Step 4: Find the matrix-recommended correct score
-matrix_recommendation = max(adjusted_probabilities, key=lambda x: x["adjusted_probability"])
+# Model probabilities (%) for the top 12 scorelines
+scoreline_percentages = {scoreline: prob * 100 for scoreline, prob in sorted_scorelines[:12]}
 
-# Define the Final 1x2 Prediction (example values)
-final_1x2_prediction = {
-    "1": 45,  # Home win percentage
-    "X": 30,  # Draw percentage
-    "2": 25   # Away win percentage
-}
+# Matrix-recommended correct score after normalizing and a +10% weighting adjustment
+matrix_scoreline, matrix_probability = recommend.matrix_recommendation(scoreline_percentages, adjustment_factor=1.10)
 
-# Step 5: Output the results
-final_output = {
-    "Final 1x2 Prediction": final_1x2_prediction,
-    "Matrix Recommendation": {
-        "Correct Score": matrix_recommendation["scoreline"],
-        "Probability": round(matrix_recommendation["adjusted_probability"], 2)
-    }
-}
+# Final recommendations
+st.subheader("Final Recommendations")
+summary = []
+if best_value_scoreline:
+    summary.append(
+        f"- The correct score with the highest probability that is also a value bet: **{best_value_scoreline}** "
+        f"({best_value_prob * 100:.2f}%, odds **{odds_for_scoreline[best_value_scoreline]}**, EV "
+        f"**{best_value_prob * odds_for_scoreline[best_value_scoreline]:.2f}**)"
+    )
+else:
+    summary.append("- No profitable value bet for correct scores based on the given odds.")
+summary += [
+    f"- Combined Recommendations (Over/Under 2.5 & GG/NG): Bet on **{combined_recommendation}**, "
+    f"correct score **{final_correct_score}**",
+    f"- Final 1x2 Prediction: 1: **{home_win_percent:.2f}%** | X: **{draw_percent:.2f}%** | "
+    f"2: **{away_win_percent:.2f}%**",
+    f"- Matrix Recommendation: Correct Score **{matrix_scoreline}** ({matrix_probability:.2f}%)",
+]
+st.markdown("\n".join(summary))
 
-# Display the results
-print("Final 1x2 Prediction:")
-for result, percentage in final_output["Final 1x2 Prediction"].items():
-    print(f"  {result}: {percentage}%")
+# Stakes for every bet entered above at once, sized over their joint outcomes
+@st.cache_data(show_spinner=False)
+def kelly_stakes(expected_goals_A, expected_goals_B, markets, odds, fraction):
+    result = kelly.optimize(
+        kelly.slate_probs(expected_goals_A, expected_goals_B), [odds], list(markets), fraction=fraction
+    )
+    return result["stakes"][0], result["ev"][0], float(result["growth"][0])
 
-print("\nMatrix Recommendation:")
-print(f"  Correct Score: {final_output['Matrix Recommendation']['Correct Score']}")
-print(f"  Probability: {final_output['Matrix Recommendation']['Probability']}%")
+st.subheader("Stake Sizing (fractional Kelly)")
+kelly_fraction = st.number_input(
+    "Kelly fraction", min_value=0.05, max_value=1.0, value=kelly.DEFAULT_FRACTION, step=0.05
+)
+stake_markets = (
+    "1", "X", "2", "Over 1.5", "Under 1.5", "Over 2.5", "Under 2.5", "GG", "NG",
+    *htft.HT_FT_OUTCOMES, *CORRECT_SCORE_GRID,
+)
+stake_odds = (
+    odds_home, odds_draw, odds_away, odds_over_1_5, odds_under_1_5, odds_over_2_5, odds_under_2_5,
+    odds_btts_gg, odds_btts_ng,
+    *(odds_for_ht_ft.get(outcome, np.nan) for outcome in htft.HT_FT_OUTCOMES),
+    *(odds_for_scoreline[scoreline] for scoreline in CORRECT_SCORE_GRID),
+)
+stakes, stake_ev, stake_growth = kelly_stakes(
+    expected_goals_A, expected_goals_B, stake_markets, tuple(map(float, stake_odds)), kelly_fraction
+)
+staked = np.flatnonzero(stakes > 0)
+if len(staked):
+    show_table({
+        "Bet": [stake_markets[b] for b in staked],
+        "Odds": [float(stake_odds[b]) for b in staked],
+        "Stake (% of bankroll)": stakes[staked] * 100,
+        "EV": stake_ev[staked],
+    })
+    st.caption(
+        f"Total stake {stakes.sum() * 100:.2f}% of bankroll, expected log growth {stake_growth * 100:.3f}%. "
+        "Bets are sized together over the half-time result and final score, so a bet with EV below 1 "
+        "can still get a stake when it hedges the others."
+    )
+else:
+    st.write("No stakes: none of the entered odds improve expected bankroll growth.")
+
+# Live mode: reprice every market from the current score and minute
+with st.expander("Live Repricing (in-play)"):
+    live_minute = st.slider("Minutes played", min_value=0, max_value=live.MINUTES, value=0)
+    live_home_goals = st.number_input("Team A goals so far", min_value=0, value=0, step=1)
+    live_away_goals = st.number_input("Team B goals so far", min_value=0, value=0, step=1)
+    live_markets = live.reprice(
+        expected_goals_A, expected_goals_B, live_minute, int(live_home_goals), int(live_away_goals)
+    )
+    live_scores = [
+        f"{home}-{away}" for home, away in zip(live_markets["top_home_goals"][0], live_markets["top_away_goals"][0])
+    ]
+    show_table(market_table(
+        ["1", "X", "2", *live_markets["over_under"], "GG", "NG", *(f"Final {score}" for score in live_scores)],
+        [*live_markets["1x2"][0], *(prob[0] for prob in live_markets["over_under"].values()),
+         live_markets["gg"][0], live_markets["ng"][0], *live_markets["top_probs"][0]],
+        label="Market",
+    ))
+
+# Close the run's profile before drawing the debug panel so the panel isn't counted
+if run_profile is not None:
+    run_profile.stop()
+    if PROFILE_PATH:
+        run_profile.write(PROFILE_PATH, "prometheus" if PROFILE_PATH.endswith(".prom") else "jsonl", source="app")
+
+with st.expander("Debug: pipeline stages"):
+    st.checkbox("Profile pipeline stages", key="profile_stages")
+    st.checkbox("Track allocations (tracemalloc)", key="profile_memory")
+    st.checkbox("Capture cProfile", key="profile_cprofile")
+    if run_profile is not None:
+        stage_stats = {record["stage"]: record for record in run_profile.records()}
+        stage_names = [*profiling.STAGES, *(name for name in stage_stats if name not in profiling.STAGES)]
+        stage_table = {
+            "Stage": stage_names,
+            "Calls": [stage_stats.get(name, {}).get("calls", 0) for name in stage_names],
+            "Time (ms)": [stage_stats.get(name, {}).get("seconds", 0.0) * 1000 for name in stage_names],
+            "Allocated blocks (process)": [stage_stats.get(name, {}).get("allocated_blocks", 0)
+                                           for name in stage_names],
+        }
+        if run_profile.memory:
+            stage_table["Allocated (KB)"] = [stage_stats.get(name, {}).get("allocated_bytes", 0) / 1024
+                                             for name in stage_names]
+            stage_table["Peak (KB)"] = [stage_stats.get(name, {}).get("peak_bytes", 0) / 1024 for name in stage_names]
+        show_table(stage_table)
+        st.caption(
+            f"Run took {run_profile.seconds * 1000:.1f} ms. Model stages with no calls were served from the cache "
+            "(the cache row is the lookups); render is everything else the script did, mostly building "
+            "Streamlit elements. Memory columns are process-wide and include other sessions' work meanwhile."
+            + (" Allocation tracking was skipped: another run is tracking allocations."
+               if run_profile.memory_unavailable else "")
+        )
+        st.download_button("Download JSON lines", run_profile.to_json_lines(source="app"), "stages.jsonl")
+        st.download_button("Download Prometheus text", run_profile.to_prometheus(source="app"), "stages.prom")
+        if run_profile.cprofile is not None:
+            st.code(run_profile.cprofile_text(), language=None)
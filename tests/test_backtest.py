@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from correct_score import backtest
+
+
+def _fixtures(n=400, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "league": "EPL",
+        "season": "2023",
+        "date": rng.permutation(pd.date_range("2023-01-01", periods=n)),
+        "expected_goals_A": rng.uniform(0.8, 2.2, n),
+        "expected_goals_B": rng.uniform(0.6, 1.8, n),
+        "home_goals": rng.poisson(1.4, n),
+        "away_goals": rng.poisson(1.1, n),
+        "odds_home": rng.uniform(1.8, 3.5, n),
+        "odds_draw": 3.4,
+        "odds_away": rng.uniform(2.0, 4.5, n),
+        "odds_over_2_5": 1.9,
+        "odds_under_2_5": 1.95,
+        "odds_btts_gg": 1.85,
+        "odds_btts_ng": 1.95,
+    })
+
+
+def test_group_drawdown_follows_order_column():
+    results = backtest.backtest(_fixtures(), order_column="date", workers=1)
+    summary = results["summary"].set_index("strategy")["max_drawdown"]
+    groups = results["groups"].set_index("strategy")["max_drawdown"]
+    pd.testing.assert_series_equal(groups.loc[summary.index], summary)
+
+
+def test_empty_input_gives_empty_results():
+    results = backtest.backtest(_fixtures().iloc[:0], order_column="date", workers=1)
+    assert all(table.empty for table in results.values())
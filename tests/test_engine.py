@@ -0,0 +1,13 @@
+import numpy as np
+
+from correct_score import engine
+
+
+def test_adaptive_pricing_leaves_invalid_rows_out():
+    markets = engine.price_markets_adaptive([1.5, np.nan, -1.0, 2.0], [1.1, 1.0, 1.0, np.inf])
+    alone = engine.price_markets_adaptive([1.5], [1.1])
+    np.testing.assert_array_equal(markets["1x2"][0], alone["1x2"][0])
+    assert markets["max_goals"][0] == alone["max_goals"][0]
+    for key in ("1x2", "gg", "ng", "tail_mass", "top_probs"):
+        assert np.isnan(markets[key][1:]).all(), key
+    assert (markets["top_scorelines"][1:] == "").all()
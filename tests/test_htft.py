@@ -0,0 +1,9 @@
+import numpy as np
+
+from correct_score import engine, htft
+
+
+def test_ht_ft_leaves_out_less_than_epsilon():
+    xg = np.array([0.3, 1.5, 3.2, 6.0])
+    probs = htft.ht_ft(xg, xg[::-1])["ht_ft"]
+    assert (1 - probs.sum(axis=1) < engine.DEFAULT_EPSILON).all()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from correct_score import kelly
+
+MARKETS = ["1", "X", "2", "Over 2.5", "Under 2.5", "GG", "NG", "1/1", "X/1", "2-1", "1-1", "0-0", "1-0"]
+
+
+def test_single_bet_matches_closed_form():
+    probs = kelly.slate_probs([1.5], [1.0])
+    max_goals = probs.shape[-1] - 1
+    p_home = float((kelly.payoff_masks(["1"], max_goals)[0] * probs[0]).sum())
+    result = kelly.optimize(probs, [[2.2]], ["1"], fraction=1)
+    assert result["full_kelly"][0, 0] == pytest.approx((p_home * 2.2 - 1) / 1.2, abs=1e-6)
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")  # SLSQP probes stakes that can lose the bankroll
+def test_joint_stakes_match_slsqp():
+    optimize = pytest.importorskip("scipy.optimize")
+    rng = np.random.default_rng(0)
+    home_xg = rng.uniform(0.6, 2.5, 10)
+    away_xg = rng.uniform(0.5, 2.0, 10)
+    probs = kelly.slate_probs(home_xg, away_xg)
+    masks = kelly.payoff_masks(MARKETS, probs.shape[-1] - 1).reshape(len(MARKETS), -1)
+    true = probs.reshape(len(probs), -1) @ masks.T
+    odds = 1 / true * rng.lognormal(-0.03, 0.08, true.shape)
+    result = kelly.optimize(probs, odds, MARKETS, fraction=1, max_exposure=None)
+
+    for i in range(len(probs)):
+        def loss(stakes):
+            return -kelly.expected_growth(probs[i:i + 1], odds[i:i + 1], MARKETS, stakes[None])[0]
+
+        reference = optimize.minimize(
+            loss, np.full(len(MARKETS), 0.01), method="SLSQP", bounds=[(0, 1)] * len(MARKETS),
+            constraints=[{"type": "ineq", "fun": lambda stakes: 1 - stakes.sum()}],
+            options={"ftol": 1e-12, "maxiter": 500},
+        )
+        assert result["growth"][i] >= -reference.fun - 1e-9
+
+
+def test_slate_exposure_capped_at_one_bankroll():
+    rng = np.random.default_rng(1)
+    probs = kelly.slate_probs(rng.uniform(0.8, 2.2, 200), rng.uniform(0.6, 1.8, 200))
+    odds = np.full((200, 3), 3.5)
+    stakes = kelly.optimize(probs, odds, ["1", "X", "2"])["stakes"]
+    assert stakes.sum() == pytest.approx(kelly.DEFAULT_MAX_EXPOSURE)
+    assert kelly.optimize(probs, odds, ["1", "X", "2"], max_exposure=None)["stakes"].sum() > 1
@@ -0,0 +1,20 @@
+import numpy as np
+
+from correct_score import engine, recommend
+
+
+def test_combined_picks_matches_combined_recommendation():
+    rng = np.random.default_rng(0)
+    n, max_goals = 3000, 8
+    matrix = engine.score_matrix(rng.uniform(0.2, 3.5, n), rng.uniform(0.2, 3.0, n), max_goals, tail=False)
+    over, gg = rng.uniform(0.2, 0.8, n), rng.uniform(0.2, 0.8, n)
+    # Drawn independently of the matrix so all three combined calls come up
+    labels, scores = recommend.combined_picks(matrix, over, 1 - over, gg, 1 - gg)
+
+    names = [f"{i}-{j}" for i in range(max_goals + 1) for j in range(max_goals + 1)]
+    for k in range(n):
+        flat = matrix[k].ravel()
+        order = np.argsort(-flat, kind="stable")  # Ties to the lower index, as combined_picks
+        sorted_scorelines = [(names[i], flat[i]) for i in order]
+        expected = recommend.combined_recommendation(over[k], 1 - over[k], gg[k], 1 - gg[k], sorted_scorelines)
+        assert (labels[k], names[scores[k]]) == expected
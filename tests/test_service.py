@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from correct_score import service
+
+
+def test_exact_pricing_does_not_depend_on_the_batch():
+    home_xg, away_xg = np.array([1.5, 9.9, 0.4, 2.0]), np.array([1.1, 1.1, 0.3, 2.5])
+    batched = service._price_exact(home_xg, away_xg, [1, 2, 1])
+    alone = [service._price_exact(home_xg[rows], away_xg[rows], [rows.stop - rows.start])[0]
+             for rows in service._request_rows([1, 2, 1])]
+    for together, apart in zip(batched, alone):
+        np.testing.assert_array_equal(together["matrix"], apart["matrix"])
+        np.testing.assert_array_equal(together["1x2"], apart["1x2"])
+
+
+@pytest.mark.parametrize("xg", [-0.1, 10.5, 800, float("nan")])
+def test_expected_goals_out_of_range_is_a_bad_request(xg):
+    with pytest.raises(service.HTTPError) as error:
+        service._expected_goals([{"home_xg": xg, "away_xg": 1.0}])
+    assert error.value.status == 400
@@ -0,0 +1,58 @@
+import numpy as np
+
+from correct_score.store import ColumnStore
+
+
+def _matches(n, seed=0):
+    rng = np.random.default_rng(seed)
+    teams = np.array([f"team {i}" for i in range(12)])
+    home, away = rng.choice(len(teams), size=(2, n))
+    away = np.where(away == home, (home + 1) % len(teams), away)
+    return {
+        "league": rng.choice(["EPL", "Serie A"], n),
+        "season": rng.choice(["2022", "2023"], n),
+        "date": np.sort(np.datetime64("2023-08-01") + rng.integers(0, 200, n)),
+        "home_team": teams[home],
+        "away_team": teams[away],
+        "home_goals": rng.poisson(1.5, n),
+        "away_goals": rng.poisson(1.1, n),
+        "odds_home": rng.uniform(1.5, 4.0, n),
+    }
+
+
+def test_two_appends_equal_one(tmp_path):
+    matches = _matches(400)
+    whole = ColumnStore(str(tmp_path / "whole"))
+    whole.append(matches)
+    split = ColumnStore(str(tmp_path / "split"))
+    for batch in (slice(0, 173), slice(173, None)):
+        split.append({name: values[batch] for name, values in matches.items()})
+
+    split = ColumnStore(str(tmp_path / "split"))  # Read back from disk
+    assert len(split) == len(whole) == 400
+    assert sorted(split.columns()) == sorted(whole.columns())
+    for league, season in (("EPL", "2022"), ("Serie A", "2023")):
+        expected = whole.select(league, season, decode=True)
+        actual = split.select(league, season, decode=True)
+        for name in whole.columns():
+            np.testing.assert_array_equal(actual[name], expected[name], err_msg=name)
+
+    teams = ["team 0", "team 5"], ["team 3", "team 11"]
+    for name, values in whole.current_averages(*teams).items():
+        np.testing.assert_array_equal(split.current_averages(*teams)[name], values, err_msg=name)
+
+
+def test_batches_with_different_extra_columns(tmp_path):
+    matches = _matches(300)
+    store = ColumnStore(str(tmp_path / "store"))
+    store.append({name: values[:100] for name, values in matches.items()})
+    store.append({name: values[100:200] for name, values in matches.items() if name != "odds_home"})
+    store.append({name: values[200:] for name, values in matches.items()})
+
+    store = ColumnStore(str(tmp_path / "store"))
+    selected = store.select(columns=["date", "odds_home"])
+    expected = matches["odds_home"].copy()
+    expected[100:200] = np.nan
+    # Partitions come back one after another, not in date order, so compare sorted values
+    assert np.isnan(selected["odds_home"]).sum() == 100
+    np.testing.assert_array_equal(np.sort(selected["odds_home"]), np.sort(expected))